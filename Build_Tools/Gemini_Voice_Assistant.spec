@@ -70,12 +70,22 @@ a = Analysis(
         'app.services.everything_models', 'app.services.everything_gemini',
         'app.services.everything_match', 'app.services.everything_es',
         'app.services.everything_file_filters',
+        'app.services.everything_local_query',
+        'app.services.everything_backends',
+        'app.services.everything_local_index',
+        'app.services.process_inspector',
+        'app.services.everything_result_cache',
         'app.core.app_config', 'app.audio.audio_utils',
-        'app.utils.logging_utils', 'app.ui.ui_dialogs',
+        'app.utils.logging_utils', 'app.utils.log_tail', 'app.ui.ui_dialogs',
         'app.core.settings_store', 'app.core.gemini_client',
+        'app.core.gemini_context_cache', 'app.core.gemini_request_coalescer',
+        'app.core.gemini_thinking_policy', 'app.core.gemini_telemetry',
         'app.core.voice_assistant_audio', 'app.core.voice_assistant_commands',
-        'app.core.voice_assistant_output',
+        'app.core.voice_assistant_output', 'app.core.history_store',
         'app.speech.whisper_engine', 'app.commands.command_router',
+        'app.commands.intent_router', 'app.commands.command_index',
+        'app.commands.command_safety',
+        'app.commands.alias_store', 'app.commands.speculative_resolver',
         'app.speech.onnxruntime_preload', 'app.ui.window_snap',
         'app.core.voice_assistant', 'app.ui.main_window',
         'subprocess', 'socket', 'urllib.parse',
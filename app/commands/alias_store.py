@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Выученные алиасы голосовых команд: фразы, которые Gemini успешно разрешил
+в URL или команду запуска. Следующие такие же команды обходятся без сети.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+from app.core.app_config import ALIASES_FILE
+from app.utils.logging_utils import log_message
+
+ALIASES_FORMAT_VERSION = 1
+MAX_ALIASES = 500
+ALIAS_KINDS = ("website", "launch")
+# Обновления счётчиков (touch) копятся и пишутся одним сохранением
+SAVE_DELAY_S = 5.0
+
+
+def _normalize_phrase(text: str) -> str:
+    return " ".join((text or "").lower().replace("ё", "е").split())
+
+
+class LearnedAliasStore:
+    """
+    JSON-хранилище {вид: {фраза: {value, count, last_used}}}.
+    При превышении max_items вытесняются записи с наименьшим числом
+    использований, а среди равных - самые давние.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = ALIASES_FILE,
+        max_items: int = MAX_ALIASES,
+        log_func=log_message,
+    ) -> None:
+        self.path = path
+        self.max_items = max_items
+        self.log = log_func
+        self._lock = threading.Lock()
+        # Сохранения идут по одному: снимок и запись файла не перемешиваются
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._entries: Dict[str, Dict[str, dict]] = {kind: {} for kind in ALIAS_KINDS}
+        # Растёт при каждом изменении: по нему пересобираются индексы команд
+        self.version = 0
+        self._load()
+
+    def mapping(self, kind: str) -> Dict[str, str]:
+        with self._lock:
+            return {
+                phrase: entry["value"]
+                for phrase, entry in self._entries.get(kind, {}).items()
+            }
+
+    def record(self, kind: str, phrase: str, value: str) -> None:
+        """Запоминает успешное разрешение фразы (вызывать только после успеха)."""
+        phrase = _normalize_phrase(phrase)
+        if kind not in self._entries or not phrase or not value:
+            return
+        now = time.time()
+        with self._lock:
+            entry = self._entries[kind].get(phrase)
+            if entry is not None and entry["value"] == value:
+                entry["count"] += 1
+                entry["last_used"] = now
+            else:
+                self._entries[kind][phrase] = {
+                    "value": value,
+                    "count": 1,
+                    "last_used": now,
+                }
+            self._evict_locked(keep=(kind, phrase))
+            self.version += 1
+        self.log(f"Алиас запомнен ({kind}): '{phrase}' -> '{value}'")
+        self.flush()
+
+    def touch(self, kind: str, phrase: str) -> None:
+        """Отмечает использование уже выученной фразы; файл пишется с задержкой."""
+        phrase = _normalize_phrase(phrase)
+        with self._lock:
+            entry = self._entries.get(kind, {}).get(phrase)
+            if entry is None:
+                return
+            entry["count"] += 1
+            entry["last_used"] = time.time()
+            if self._save_timer is None and self.path:
+                self._save_timer = threading.Timer(SAVE_DELAY_S, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def forget(self, kind: str, phrase: str) -> bool:
+        phrase = _normalize_phrase(phrase)
+        with self._lock:
+            if self._entries.get(kind, {}).pop(phrase, None) is None:
+                return False
+            self.version += 1
+        self.flush()
+        return True
+
+    def export_to(self, path: str) -> int:
+        """Сохраняет все алиасы в переносимый JSON. Возвращает их количество."""
+        with self._lock:
+            snapshot = self._snapshot_locked()
+        _write_json(path, snapshot)
+        return len(snapshot["aliases"])
+
+    def import_from(self, path: str, accept=None) -> int:
+        """
+        Добавляет алиасы из файла экспорта. accept(kind, value) может отклонить
+        запись (например, опасную команду). Возвращает число принятых записей.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        imported = 0
+        with self._lock:
+            for item in _iter_items(data):
+                kind, phrase, value = item["kind"], item["phrase"], item["value"]
+                if accept is not None and not accept(kind, value):
+                    continue
+                current = self._entries[kind].get(phrase)
+                if current is not None and current["value"] == value:
+                    current["count"] = max(current["count"], item["count"])
+                    current["last_used"] = max(current["last_used"], item["last_used"])
+                else:
+                    self._entries[kind][phrase] = {
+                        "value": value,
+                        "count": item["count"],
+                        "last_used": item["last_used"],
+                    }
+                imported += 1
+            self._evict_locked()
+            self.version += 1
+        self.flush()
+        self.log(f"Импортировано алиасов: {imported}")
+        return imported
+
+    def _evict_locked(self, keep=None) -> None:
+        # keep - только что записанная пара (вид, фраза): новая запись с count=1
+        # не должна вытесняться сразу, иначе заполненное хранилище перестанет учиться
+        total = sum(len(items) for items in self._entries.values())
+        overflow = total - self.max_items
+        if overflow <= 0:
+            return
+        ranked = sorted(
+            (
+                (entry["count"], entry["last_used"], kind, phrase)
+                for kind, items in self._entries.items()
+                for phrase, entry in items.items()
+                if (kind, phrase) != keep
+            )
+        )
+        for _count, _last_used, kind, phrase in ranked[:overflow]:
+            self._entries[kind].pop(phrase, None)
+
+    def _snapshot_locked(self) -> dict:
+        aliases = [
+            {
+                "kind": kind,
+                "phrase": phrase,
+                "value": entry["value"],
+                "count": entry["count"],
+                "last_used": entry["last_used"],
+            }
+            for kind, items in self._entries.items()
+            for phrase, entry in items.items()
+        ]
+        return {"format": ALIASES_FORMAT_VERSION, "aliases": aliases}
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for item in _iter_items(data):
+                self._entries[item["kind"]][item["phrase"]] = {
+                    "value": item["value"],
+                    "count": item["count"],
+                    "last_used": item["last_used"],
+                }
+            self._evict_locked()
+            self.version += 1
+        except Exception as e:
+            self.log(f"Не удалось загрузить выученные алиасы: {e}")
+
+    def flush(self) -> None:
+        """Сразу сохраняет текущее состояние (в том числе отложенные touch)."""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                snapshot = self._snapshot_locked()
+            try:
+                _write_json(self.path, snapshot)
+            except Exception as e:
+                self.log(f"Не удалось сохранить выученные алиасы: {e}")
+
+
+def _write_json(path: str, data: dict) -> None:
+    # Пишем в уникальный временный файл рядом и подменяем, чтобы не оставить
+    # битый JSON и не столкнуться с параллельной записью
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f"{os.path.basename(path)}.",
+        suffix=".tmp",
+        dir=os.path.dirname(path) or ".",
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _iter_items(data):
+    items = data.get("aliases", []) if isinstance(data, dict) else []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        kind = item.get("kind")
+        phrase = _normalize_phrase(item.get("phrase", ""))
+        value = item.get("value")
+        if kind not in ALIAS_KINDS or not phrase or not isinstance(value, str) or not value:
+            continue
+        try:
+            count = max(1, int(item.get("count", 1)))
+            last_used = float(item.get("last_used", 0.0))
+        except (TypeError, ValueError):
+            continue
+        yield {
+            "kind": kind,
+            "phrase": phrase,
+            "value": value,
+            "count": count,
+            "last_used": last_used,
+        }
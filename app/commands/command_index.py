@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Нечёткий поиск по словарям сайтов и команд запуска (триграммный индекс).
+Позволяет разрешать <ютубчик> или опечатки Whisper локально, без Gemini.
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Mapping, Optional
+
+# Ниже этого значения совпадение считается ненадёжным и уходит в Gemini
+FUZZY_MATCH_THRESHOLD = 0.72
+# Бонус, если слова запроса отличаются от слов ключа только окончанием
+# или уменьшительным суффиксом (<калькулятора>, <ютубчик>)
+PREFIX_BONUS = 0.15
+MIN_PREFIX_LEN = 3
+INFLECTION_ENDINGS = frozenset(
+    (
+        "а", "я", "у", "ю", "е", "и", "ы", "о", "ь", "s",
+        "ом", "ем", "ой", "ей", "ою", "ею", "ам", "ям", "ах", "ях", "ов", "ев",
+        "ами", "ями",
+        "ик", "ика", "ику", "иком", "чик", "чика", "чику", "чиком",
+    )
+)
+# Слово запроса считается покрытым ключом с этой схожести триграмм
+TOKEN_MATCH_MIN = 0.5
+
+
+@dataclass(frozen=True)
+class FuzzyMatch:
+    key: str
+    value: str
+    score: float
+    exact: bool = False
+
+
+def normalize_phrase(text: str) -> str:
+    return " ".join((text or "").lower().replace("ё", "е").split())
+
+
+def _word_trigrams(word: str) -> FrozenSet[str]:
+    padded = f"##{word}#"
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def _trigrams(text: str) -> FrozenSet[str]:
+    grams = set()
+    for word in text.split():
+        grams |= _word_trigrams(word)
+    return frozenset(grams)
+
+
+def _dice(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return 2.0 * len(left & right) / (len(left) + len(right))
+
+
+def _is_inflection(word: str, other: str) -> bool:
+    """Одно слово продолжает другое окончанием из INFLECTION_ENDINGS."""
+    shorter, longer = sorted((word, other), key=len)
+    if len(shorter) < MIN_PREFIX_LEN or not longer.startswith(shorter):
+        return False
+    return longer[len(shorter):] in INFLECTION_ENDINGS
+
+
+def _prefix_bonus(query_words: List[str], key_words: List[str]) -> float:
+    """
+    Бонус только при том же числе слов, когда каждое слово совпадает с
+    соответствующим словом ключа или отличается от него окончанием.
+    Лишнее слово (<яндекс диск>, <youtube music>) бонуса не даёт.
+    """
+    if len(query_words) != len(key_words):
+        return 0.0
+    inflected = False
+    for query_word, key_word in zip(query_words, key_words):
+        if query_word == key_word:
+            continue
+        if not _is_inflection(query_word, key_word):
+            return 0.0
+        inflected = True
+    return PREFIX_BONUS if inflected else 0.0
+
+
+def _coverage(query_words: List[str], key_words: List[str]) -> float:
+    """
+    Доля символов запроса в словах, которым нашлась пара в ключе. Слово,
+    которого нет в ключе (<диск> в <гугл диск>), снижает оценку.
+    """
+    key_grams = [_word_trigrams(word) for word in key_words]
+    covered = 0
+    total = 0
+    for word in query_words:
+        total += len(word)
+        grams = _word_trigrams(word)
+        if any(
+            word == key_word
+            or _is_inflection(word, key_word)
+            or _dice(grams, key_word_grams) >= TOKEN_MATCH_MIN
+            for key_word, key_word_grams in zip(key_words, key_grams)
+        ):
+            covered += len(word)
+    return covered / total if total else 0.0
+
+
+class FuzzyCommandIndex:
+    """
+    Инвертированный индекс триграмм по ключам словаря. Кандидаты отбираются по
+    общим триграммам, оценка - коэффициент Дайса, умноженный на долю слов
+    запроса, нашедших пару в ключе, плюс бонус за словоформу.
+    Индекс неизменяемый: при смене словарей строится новый.
+    """
+
+    def __init__(
+        self,
+        *sources: Mapping[str, str],
+        threshold: float = FUZZY_MATCH_THRESHOLD,
+    ) -> None:
+        self.threshold = threshold
+        self._values: Dict[str, str] = {}
+        # Более поздние источники (пользовательские алиасы) перекрывают ранние
+        for source in sources:
+            for key, value in (source or {}).items():
+                norm = normalize_phrase(key)
+                if norm and value:
+                    self._values[norm] = value
+        self._keys: List[str] = list(self._values)
+        self._grams: List[FrozenSet[str]] = [_trigrams(key) for key in self._keys]
+        self._postings: Dict[str, List[int]] = {}
+        for index, grams in enumerate(self._grams):
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(index)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def lookup(self, phrase: str) -> Optional[FuzzyMatch]:
+        """Лучшее совпадение не ниже порога или None."""
+        query = normalize_phrase(phrase)
+        if not query:
+            return None
+        value = self._values.get(query)
+        if value is not None:
+            return FuzzyMatch(query, value, 1.0, exact=True)
+
+        query_grams = _trigrams(query)
+        if not query_grams:
+            return None
+        shared = Counter()
+        for gram in query_grams:
+            for index in self._postings.get(gram, ()):
+                shared[index] += 1
+
+        query_words = query.split()
+        best: Optional[FuzzyMatch] = None
+        for index, common in shared.items():
+            key = self._keys[index]
+            key_words = key.split()
+            dice = 2.0 * common / (len(query_grams) + len(self._grams[index]))
+            score = dice * _coverage(query_words, key_words)
+            score = min(1.0, score + _prefix_bonus(query_words, key_words))
+            if best is None or score > best.score:
+                best = FuzzyMatch(key, self._values[key], score)
+        if best is None or best.score < self.threshold:
+            return None
+        return best
+
+
+# --- Проверка на контрольных фразах ---
+
+# Фразы, которые лишь начинаются как известный ключ: должны уходить в Gemini
+NEGATIVE_PHRASES = {
+    "website": ("яндекс диск", "гугл диск", "youtube music", "ютуб музыка"),
+    "launch": ("word pad", "пейнтбол", "кодек", "хромакей"),
+}
+# Словоформы и опечатки, которые должны разрешаться локально: (фраза, ключ)
+POSITIVE_PHRASES = {
+    "website": (
+        ("ютубчик", "ютуб"),
+        ("гитхабе", "гитхаб"),
+        ("яндекс почту", "яндекс почта"),
+    ),
+    "launch": (
+        ("калькулятора", "калькулятор"),
+        ("калькулятр", "калькулятор"),
+        ("блокнотик", "блокнот"),
+    ),
+}
+
+
+def check_phrases(indexes: Mapping[str, "FuzzyCommandIndex"]) -> List[str]:
+    """Прогоняет контрольные фразы; возвращает описания расхождений."""
+    problems = []
+    for kind, phrases in NEGATIVE_PHRASES.items():
+        for phrase in phrases:
+            match = indexes[kind].lookup(phrase)
+            if match is not None:
+                problems.append(
+                    f"{kind}: '{phrase}' -> '{match.key}' ({match.score:.3f}), "
+                    "ожидалось без совпадения"
+                )
+    for kind, pairs in POSITIVE_PHRASES.items():
+        for phrase, expected in pairs:
+            match = indexes[kind].lookup(phrase)
+            if match is None or match.key != expected:
+                found = f"'{match.key}'" if match else "нет совпадения"
+                problems.append(f"{kind}: '{phrase}' -> {found}, ожидалось '{expected}'")
+    return problems
+
+
+if __name__ == "__main__":
+    import sys
+
+    from app.core.app_config import LAUNCH_COMMANDS, WEBSITE_URLS
+
+    problems = check_phrases(
+        {
+            "website": FuzzyCommandIndex(WEBSITE_URLS),
+            "launch": FuzzyCommandIndex(LAUNCH_COMMANDS),
+        }
+    )
+    for problem in problems:
+        print(problem)
+    print("OK" if not problems else f"Расхождений: {len(problems)}")
+    sys.exit(1 if problems else 0)
@@ -4,66 +4,224 @@
 """
 
 import os
-import re
 import subprocess
 import threading
-import traceback
 import webbrowser
 
 from PySide6.QtWidgets import QMessageBox
 
+from app.commands.alias_store import LearnedAliasStore
+from app.commands.command_index import FUZZY_MATCH_THRESHOLD, FuzzyCommandIndex
+from app.commands.command_safety import find_danger
+from app.commands.intent_router import (
+    INTENT_LAUNCH,
+    INTENT_SEARCH,
+    INTENT_WEBSITE,
+    Intent,
+    IntentRouter,
+)
+from app.commands.speculative_resolver import SpeculativeResolver
 from app.core.app_config import (
     COLORS,
-    DANGEROUS_COMMAND_PATTERNS,
     LAUNCH_COMMANDS,
     WEBSITE_URLS,
 )
-from app.utils.logging_utils import log_message
+from app.utils.logging_utils import log_debug, log_message, log_traceback
+
+ADMIN_MARKERS = (
+    "от имени администратора",
+    "админ",
+    "админка",
+    "администратор",
+    "с правами админа",
+    "с правами администратора",
+)
+# Сколько ждать URL от Gemini, прежде чем открыть поиск в Яндексе
+URL_RESOLVE_DEADLINE_S = 2.5
+LAUNCH_RESOLVE_DEADLINE_S = 4.0
+# Сколько ждать кода возврата оболочки, прежде чем выучить команду запуска
+LAUNCH_VERIFY_S = 3.0
+
+
+def _split_admin_request(command_body):
+    """Убирает из тела команды упоминания прав администратора."""
+    admin_requested = False
+    for marker in ADMIN_MARKERS:
+        if marker in command_body:
+            admin_requested = True
+            command_body = command_body.replace(marker, " ")
+    return " ".join(command_body.split()), admin_requested
 
 
 class CommandRouter:
-    def __init__(self, assistant, log_func=log_message):
+    def __init__(self, assistant, log_func=log_message, alias_store=None):
         self.assistant = assistant
         self.log = log_func
+        self.alias_store = alias_store or LearnedAliasStore(log_func=log_func)
+        self.intent_router = IntentRouter()
+        self._command_indexes = {}
+        self.url_resolver = SpeculativeResolver(
+            self._resolve_url_with_gemini, log_func=log_func
+        )
+        self.command_resolver = SpeculativeResolver(
+            self._resolve_command_with_gemini, log_func=log_func
+        )
+
+    def classify(self, text) -> Intent:
+        """Определяет намерение фразы за один проход по скомпилированным триггерам."""
+        return self.intent_router.classify(text, self.assistant.settings)
+
+    def dispatch(self, text, intent: Intent = None):
+        """Выполняет команду по намерению; для обычной диктовки возвращает False."""
+        intent = intent or self.classify(text)
+        if intent.kind == INTENT_WEBSITE:
+            return self.handle_website_command(text, intent)
+        if intent.kind == INTENT_LAUNCH:
+            return self.handle_launch_command(text, intent)
+        if intent.kind == INTENT_SEARCH:
+            return self.handle_everything_search(text, intent)
+        return False
 
-    def handle_website_command(self, text):
+    def prefetch(self, text):
         """
-        Проверяет, является ли текст командой открытия сайта.
-        Если да - открывает сайт и возвращает True.
+        Упреждающе разрешает команду из промежуточного сегмента, если её нет
+        в словарях: к моменту финальной фразы ответ Gemini уже может быть готов.
         """
-        self.log(f"DEBUG: Проверка на команду сайта. Входной текст: '{text}'")
-
-        text_lower = text.strip().lower()
-        # Заменяем любую пунктуацию на пробелы и нормализуем пробелы
-        # "Открой, гугл!" -> "открой гугл"
-        text_lower = re.sub(r"[^\w\s]", " ", text_lower)
-        text_lower = " ".join(text_lower.split())
+        if not self.assistant.settings.get("speculative_resolve_enabled", True):
+            return False
+        intent = self.classify(text)
+        if intent.kind == INTENT_WEBSITE:
+            resolver, phrase = self.url_resolver, intent.body
+        elif intent.kind == INTENT_LAUNCH:
+            resolver = self.command_resolver
+            phrase, _admin = _split_admin_request(intent.body)
+        else:
+            return False
+        if not phrase or self._get_command_index(intent.kind).lookup(phrase):
+            return False
+        cancel_seq = self.assistant._get_cancel_seq()
+        return resolver.prefetch(
+            phrase, cancel_check=lambda: self.assistant._is_cancelled(cancel_seq)
+        )
 
-        self.log(f"DEBUG: Очищенный текст: '{text_lower}'")
+    def _resolve_deadline(self, key, default):
+        try:
+            value = float(self.assistant.settings.get(key, default))
+        except (TypeError, ValueError):
+            value = default
+        return value if value > 0 else None
 
-        # Ключевые слова для навигации - только формы слова "открой"
-        triggers = ["открой", "открыть", "откроем", "открывай"]
+    def _url_resolve_deadline(self):
+        return self._resolve_deadline("url_resolve_deadline_s", URL_RESOLVE_DEADLINE_S)
 
-        triggered = False
-        command_body = ""
+    def _launch_resolve_deadline(self):
+        return self._resolve_deadline(
+            "launch_resolve_deadline_s", LAUNCH_RESOLVE_DEADLINE_S
+        )
 
-        for trigger in triggers:
-            if text_lower.startswith(trigger + " "):
-                triggered = True
-                command_body = text_lower[len(trigger) :].strip()
-                self.log(
-                    f"DEBUG: Сработал триггер '{trigger}'. Тело команды: '{command_body}'"
-                )
-                break
+    def _learning_enabled(self):
+        return bool(self.assistant.settings.get("learned_aliases_enabled", True))
+
+    def _learned_aliases(self, kind):
+        if not self._learning_enabled():
+            return {}
+        learned = self.alias_store.mapping(kind)
+        if kind == INTENT_LAUNCH:
+            # Опасные команды никогда не выполняются из выученных алиасов
+            learned = {
+                phrase: command
+                for phrase, command in learned.items()
+                if not self._is_dangerous_command(command)
+            }
+        return learned
+
+    def _remember_alias(self, kind, phrase, value):
+        """Запоминает ответ Gemini, который привёл к успешному действию."""
+        if not self._learning_enabled():
+            return
+        if kind == INTENT_LAUNCH and self._is_dangerous_command(value):
+            return
+        self.alias_store.record(kind, phrase, value)
+
+    def _remember_alias_after_launch(self, proc, phrase, command):
+        """
+        cmd.exe сразу завершается с ненулевым кодом (9009), если команда не
+        найдена, а GUI-программу запускает и выходит с кодом 0. Процесс, ещё
+        работающий к концу проверки, считаем успешно запущенной программой.
+        """
+        try:
+            returncode = proc.wait(timeout=LAUNCH_VERIFY_S)
+        except subprocess.TimeoutExpired:
+            returncode = None
+        except Exception as e:
+            self.log(f"Не удалось проверить запуск '{command}': {e}")
+            return
+        if returncode not in (None, 0):
+            self.log(
+                f"Команда '{command}' завершилась с кодом {returncode} - "
+                "алиас не запоминается"
+            )
+            return
+        self._remember_alias(INTENT_LAUNCH, phrase, command)
 
-        # Логируем для отладки, если не сработало, но похоже на команду
-        if not triggered:
-            self.log(f"DEBUG: Триггер не сработал. Проверял триггеры: {triggers}")
-            if any(t in text_lower for t in triggers):
-                self.log(f"Похоже на команду, но не сработало: '{text_lower}'")
+    def _get_command_index(self, kind) -> FuzzyCommandIndex:
+        """
+        Индекс словаря, выученных алиасов и алиасов пользователя;
+        пересобирается при их смене.
+        """
+        settings = self.assistant.settings
+        aliases = settings.get("command_aliases") or {}
+        user_aliases = aliases.get(kind) if isinstance(aliases, dict) else None
+        if not isinstance(user_aliases, dict):
+            user_aliases = {}
+        try:
+            threshold = float(
+                settings.get("fuzzy_command_threshold", FUZZY_MATCH_THRESHOLD)
+            )
+        except (TypeError, ValueError):
+            threshold = FUZZY_MATCH_THRESHOLD
+        learning = self._learning_enabled()
+        key = (
+            tuple(sorted(user_aliases.items())),
+            threshold,
+            self.alias_store.version if learning else None,
+        )
+        cached = self._command_indexes.get(kind)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        base = WEBSITE_URLS if kind == INTENT_WEBSITE else LAUNCH_COMMANDS
+        index = FuzzyCommandIndex(
+            base, self._learned_aliases(kind), user_aliases, threshold=threshold
+        )
+        self._command_indexes[kind] = (key, index)
+        return index
+
+    def _lookup_local(self, kind, phrase):
+        """Точное или нечёткое совпадение в словаре; None - нужен Gemini."""
+        match = self._get_command_index(kind).lookup(phrase)
+        if match is None:
+            return None
+        if self._learning_enabled():
+            self.alias_store.touch(kind, match.key)
+        if not match.exact:
+            self.log(
+                f"Нечёткое совпадение '{phrase}' -> '{match.key}' "
+                f"(оценка {match.score:.2f})"
+            )
+        return match.value
 
-        if not triggered:
+    def handle_website_command(self, text, intent: Intent = None):
+        """
+        Проверяет, является ли текст командой открытия сайта.
+        Если да - открывает сайт и возвращает True.
+        """
+        intent = intent or self.classify(text)
+        if intent.kind != INTENT_WEBSITE:
             return False
+        command_body = intent.body
+        log_debug(
+            f"Сработал триггер '{intent.trigger}'. Тело команды: '{command_body}'"
+        )
 
         cancel_seq = self.assistant._get_cancel_seq()
         if self.assistant._is_cancelled(cancel_seq):
@@ -72,12 +230,11 @@ class CommandRouter:
 
         self.log(f"Распознана команда навигации: '{command_body}'")
 
-        url = None
         site_name = command_body
 
-        # 1. Прямой поиск в словаре
-        if site_name in WEBSITE_URLS:
-            url = WEBSITE_URLS[site_name]
+        # 1. Поиск в словаре и алиасах (точный или нечёткий)
+        url = self._lookup_local(INTENT_WEBSITE, site_name)
+        learned_url = None
 
         # 2. Если не нашли в словаре - спрашиваем у Gemini
         if not url:
@@ -85,7 +242,18 @@ class CommandRouter:
                 f"Сайт '{site_name}' не найден в словаре. Спрашиваю у Gemini..."
             )
             self.assistant.show_status("Поиск адреса...", COLORS["accent"], True)
-            url = self._resolve_url_with_gemini(site_name)
+            deadline_s = self._url_resolve_deadline()
+            url, timed_out = self.url_resolver.resolve(
+                site_name,
+                deadline_s=deadline_s,
+                cancel_check=lambda: self.assistant._is_cancelled(cancel_seq),
+            )
+            if timed_out:
+                self.log(
+                    f"Gemini не ответил за {deadline_s:.1f}с, открываю поиск: {site_name}"
+                )
+            if url and url != "SEARCH":
+                learned_url = url
 
         if self.assistant._is_cancelled(cancel_seq):
             self.log("Команда открытия сайта отменена пользователем.")
@@ -103,6 +271,8 @@ class CommandRouter:
         try:
             self.log(f"Открываю URL: {url}")
             webbrowser.open(url)
+            if learned_url:
+                self._remember_alias(INTENT_WEBSITE, site_name, learned_url)
             self.assistant.show_status(f"Открываю: {site_name}", COLORS["accent"], False)
             self.assistant.play_sound("start")  # Звук успеха
 
@@ -125,46 +295,18 @@ class CommandRouter:
             self.assistant.show_status("Ошибка браузера", COLORS["btn_warning"], False)
             return False
 
-    def handle_launch_command(self, text):
+    def handle_launch_command(self, text, intent: Intent = None):
         """
         Проверяет, является ли текст командой запуска программы/команды.
         Если да - выполняет команду и возвращает True.
         """
-        self.log(f"DEBUG: Проверка на команду запуска. Входной текст: '{text}'")
-
-        text_lower = text.strip().lower()
-        # Заменяем любую пунктуацию на пробелы и нормализуем пробелы
-        text_lower = re.sub(r"[^\w\s]", " ", text_lower)
-        text_lower = " ".join(text_lower.split())
-
-        self.log(f"DEBUG: Очищенный текст: '{text_lower}'")
-
-        # Ключевые слова для запуска программ - только формы слова "запусти"
-        triggers = [
-            "запусти",
-            "запустить",
-            "запуск",
-            "запустим",
-            "запускай",
-            "запускаю",
-        ]
-
-        triggered = False
-        command_body = ""
-        admin_requested = False
-
-        for trigger in triggers:
-            if text_lower.startswith(trigger + " "):
-                triggered = True
-                command_body = text_lower[len(trigger) :].strip()
-                self.log(
-                    f"DEBUG: Сработал триггер '{trigger}'. Тело команды: '{command_body}'"
-                )
-                break
-
-        if not triggered:
-            self.log(f"DEBUG: Триггер не сработал. Проверял триггеры: {triggers}")
+        intent = intent or self.classify(text)
+        if intent.kind != INTENT_LAUNCH:
             return False
+        command_body = intent.body
+        log_debug(
+            f"Сработал триггер '{intent.trigger}'. Тело команды: '{command_body}'"
+        )
 
         cancel_seq = self.assistant._get_cancel_seq()
         if self.assistant._is_cancelled(cancel_seq):
@@ -172,32 +314,18 @@ class CommandRouter:
             return True
 
         # Проверяем запрос на запуск с правами администратора
-        admin_markers = [
-            "от имени администратора",
-            "админ",
-            "админка",
-            "администратор",
-            "с правами админа",
-            "с правами администратора",
-        ]
-        for marker in admin_markers:
-            if marker in command_body:
-                admin_requested = True
-                command_body = command_body.replace(marker, " ")
-        command_body = " ".join(command_body.split())
+        command_body, admin_requested = _split_admin_request(command_body)
 
         self.log(
             f"Распознан запрос запуска: '{command_body}', admin={admin_requested}"
         )
 
-        command = None
-        command = None
-        command = None
         program_name = command_body
 
-        # 1. Прямой поиск в словаре
-        if program_name in LAUNCH_COMMANDS:
-            command = LAUNCH_COMMANDS[program_name]
+        # 1. Поиск в словаре и алиасах (точный или нечёткий)
+        command = self._lookup_local(INTENT_LAUNCH, program_name)
+        learned_command = None
+        if command:
             self.log(f"Команда найдена в словаре: '{command}'")
 
         # 2. Если не нашли в словаре - спрашиваем у Gemini
@@ -206,7 +334,16 @@ class CommandRouter:
                 f"Команда '{program_name}' не найдена в словаре. Спрашиваю у Gemini..."
             )
             self.assistant.show_status("Определение команды...", COLORS["accent"], True)
-            command = self._resolve_command_with_gemini(program_name, cancel_seq)
+            deadline_s = self._launch_resolve_deadline()
+            command, timed_out = self.command_resolver.resolve(
+                program_name,
+                deadline_s=deadline_s,
+                cancel_check=lambda: self.assistant._is_cancelled(cancel_seq),
+            )
+            if timed_out:
+                self.log(f"Gemini не ответил за {deadline_s:.1f}с: {program_name}")
+            if command and command != "UNKNOWN":
+                learned_command = command
 
         if self.assistant._is_cancelled(cancel_seq):
             self.log("Команда запуска отменена пользователем.")
@@ -230,9 +367,11 @@ class CommandRouter:
             return True  # Команда обработана, но не выполнена
 
         # 4. Проверка на опасность
-        if self._is_dangerous_command(command):
+        danger = find_danger(command)
+        if danger is not None:
             self.log(
-                f"ПРЕДУПРЕЖДЕНИЕ: Обнаружена потенциально опасная команда: {command}"
+                f"ПРЕДУПРЕЖДЕНИЕ: Обнаружена потенциально опасная команда: {command} "
+                f"(правило '{danger.rule}', совпадение '{danger.matched}')"
             )
             # Показываем диалог подтверждения
             if not self._show_command_confirmation_dialog(command):
@@ -285,9 +424,20 @@ class CommandRouter:
             if command.startswith("ms-settings:"):
                 # Специальная обработка для настроек Windows
                 os.startfile(command)
+                # startfile бросает исключение при неудаче - запуск подтверждён
+                if learned_command:
+                    self._remember_alias(INTENT_LAUNCH, program_name, learned_command)
             else:
                 # Обычный запуск через subprocess
-                subprocess.Popen(command, shell=True)
+                proc = subprocess.Popen(command, shell=True)
+                if learned_command:
+                    # Popen через оболочку успешен и для несуществующей команды:
+                    # запоминаем алиас только после проверки кода возврата
+                    threading.Thread(
+                        target=self._remember_alias_after_launch,
+                        args=(proc, program_name, learned_command),
+                        daemon=True,
+                    ).start()
 
             self.assistant.show_status(
                 f"Запущено: {program_name}", COLORS["accent"], False
@@ -322,11 +472,13 @@ class CommandRouter:
             ).start()
             return False
 
-    def handle_everything_search(self, text):
+    def handle_everything_search(self, text, intent: Intent = None):
         """
         Обрабатывает голосовые команды на поиск через Everything (es.exe).
         Возвращает True, если команда была распознана (даже без результатов).
         """
+        if intent is not None and intent.kind != INTENT_SEARCH:
+            return False
         try:
             cancel_seq = self.assistant._get_cancel_seq()
             handled, paths = self.assistant.search_handler.handle_voice_command(
@@ -351,7 +503,7 @@ class CommandRouter:
             return handled
         except Exception as e:
             self.log(f"Ошибка обработки поиска через Everything: {e}")
-            self.log(traceback.format_exc())
+            log_traceback()
             self.assistant.show_status(
                 "Ошибка поиска Everything", COLORS["btn_warning"], False
             )
@@ -367,15 +519,11 @@ class CommandRouter:
                 "Не удалось открыть найденное", COLORS["btn_warning"], False
             )
 
-    def _resolve_command_with_gemini(self, description, cancel_seq=None):
+    def _resolve_command_with_gemini(self, description, cancel_check=None):
         """
         Использует Gemini для определения команды по описанию.
         Возвращает команду или 'UNKNOWN' если не уверен.
         """
-        cancel_check = None
-        if cancel_seq is not None:
-            def cancel_check():
-                return self.assistant._is_cancelled(cancel_seq)
         return self.assistant.gemini_manager.resolve_command(
             description, cancel_check=cancel_check
         )
@@ -385,17 +533,7 @@ class CommandRouter:
         Проверяет, является ли команда потенциально опасной.
         Возвращает True если команда опасна.
         """
-        # Проверка префикса от Gemini
-        if command.startswith("DANGER:"):
-            return True
-
-        # Проверка по паттернам
-        command_lower = command.lower()
-        for pattern in DANGEROUS_COMMAND_PATTERNS:
-            if re.search(pattern, command_lower):
-                return True
-
-        return False
+        return find_danger(command) is not None
 
     def _show_command_confirmation_dialog(self, command):
         """
@@ -417,9 +555,11 @@ class CommandRouter:
         result = msg_box.exec()
         return result == QMessageBox.Yes
 
-    def _resolve_url_with_gemini(self, description):
+    def _resolve_url_with_gemini(self, description, cancel_check=None):
         """
         Использует Gemini для определения URL по описанию.
         Возвращает URL или 'SEARCH' если не уверен.
         """
-        return self.assistant.gemini_manager.resolve_url(description)
+        return self.assistant.gemini_manager.resolve_url(
+            description, cancel_check=cancel_check
+        )
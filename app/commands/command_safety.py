@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка команд запуска на опасность. Правила DANGEROUS_COMMAND_PATTERNS
+собираются при импорте в одно регулярное выражение с именованными группами,
+чтобы одна проверка сообщала, какое именно правило сработало.
+"""
+
+import re
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from app.core.app_config import DANGEROUS_COMMAND_PATTERNS
+
+DANGER_PREFIX = "DANGER:"
+# Правило, которым помечается команда с префиксом DANGER: от Gemini
+GEMINI_DANGER_RULE = DANGER_PREFIX
+
+
+@dataclass(frozen=True)
+class DangerMatch:
+    rule: str
+    rule_index: Optional[int]
+    matched: str
+
+
+def compile_danger_patterns(patterns: Sequence[str]) -> Optional["re.Pattern"]:
+    """Объединяет правила в одну альтернативу; группа r<N> - правило с индексом N."""
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?P<r{i}>{p})" for i, p in enumerate(patterns)))
+
+
+_DANGER_RE = compile_danger_patterns(DANGEROUS_COMMAND_PATTERNS)
+
+# Контрольный набор для проверки объединённого выражения: на каждое правило
+# есть хотя бы одна опасная команда, плюс безопасные команды с похожими словами
+DANGEROUS_CORPUS = [
+    "del /f /q *.*",
+    "cmd /c del C:\\temp\\file.txt",
+    "delete old logs",
+    "rm -rf build",
+    "remove-item C:\\temp",
+    "format c:",
+    "fdisk /mbr",
+    "reg delete HKCU\\Software\\App /f",
+    "regedit /s tweaks.reg",
+    "taskkill /im explorer.exe /f",
+    "rd /s /q C:\\temp",
+    "rmdir C:\\old",
+    "shutdown /s /t 0",
+    "shutdown -r",
+    "restart-computer",
+    "перезагрузка",
+    "выключить компьютер",
+    "powershell Get-ChildItem | Remove-Item",
+    "powershell -c Delete-Stuff",
+    "удали все файлы",
+    "форматировать диск",
+    "DANGER:del /f /q *.*",
+]
+SAFE_CORPUS = [
+    "notepad",
+    "calc",
+    "chrome",
+    "code",
+    "control",
+    "explorer.exe",
+    "taskmgr",
+    "regedit",
+    "taskkill /im notepad.exe",
+    "powershell",
+    "delivery.exe",
+    "model.exe",
+    "ord.exe",
+    "cmd /c dir",
+    "formatter.exe",
+    "start ms-settings:",
+    "mspaint",
+    "",
+]
+BENCHMARK_REPEAT = 2000
+
+
+def find_danger(
+    command: str,
+    patterns: Sequence[str] = DANGEROUS_COMMAND_PATTERNS,
+    compiled: Optional["re.Pattern"] = None,
+) -> Optional[DangerMatch]:
+    """
+    Возвращает первое сработавшее правило или None. Команда проверяется
+    в нижнем регистре, как и прежде при поочерёдном re.search.
+    """
+    if not command:
+        return None
+    if command.startswith(DANGER_PREFIX):
+        return DangerMatch(GEMINI_DANGER_RULE, None, DANGER_PREFIX)
+    if compiled is None:
+        compiled = (
+            _DANGER_RE
+            if patterns is DANGEROUS_COMMAND_PATTERNS
+            else compile_danger_patterns(patterns)
+        )
+    if compiled is None:
+        return None
+    match = compiled.search(command.lower())
+    if match is None:
+        return None
+    index = int(match.lastgroup[1:])
+    return DangerMatch(patterns[index], index, match.group(0))
+
+
+def is_dangerous_command(command: str) -> bool:
+    return find_danger(command) is not None
+
+
+def _legacy_is_dangerous(command: str, patterns: Sequence[str]) -> bool:
+    """Прежняя проверка: каждое правило отдельным re.search."""
+    if not command:
+        return False
+    if command.startswith(DANGER_PREFIX):
+        return True
+    lowered = command.lower()
+    return any(re.search(pattern, lowered) for pattern in patterns)
+
+
+def check_danger_parity(
+    patterns: Sequence[str] = DANGEROUS_COMMAND_PATTERNS,
+    dangerous: Sequence[str] = DANGEROUS_CORPUS,
+    safe: Sequence[str] = SAFE_CORPUS,
+) -> List[str]:
+    """
+    Сверяет объединённое выражение с поочерёдным re.search на контрольном
+    наборе и проверяет, что каждое правило срабатывает хотя бы на одной
+    команде. Возвращает описания расхождений.
+    """
+    problems = []
+    compiled = compile_danger_patterns(patterns)
+    for command in list(dangerous) + list(safe):
+        legacy = _legacy_is_dangerous(command, patterns)
+        merged = find_danger(command, patterns, compiled) is not None
+        if merged != legacy:
+            problems.append(
+                f"'{command}': единый regex {merged}, поочерёдный re.search {legacy}"
+            )
+    for command in dangerous:
+        if find_danger(command, patterns, compiled) is None:
+            problems.append(f"'{command}': ожидалась опасная команда")
+    for command in safe:
+        match = find_danger(command, patterns, compiled)
+        if match is not None:
+            problems.append(f"'{command}': ложное срабатывание правила {match.rule}")
+    for index, pattern in enumerate(patterns):
+        rule_re = re.compile(pattern)
+        if not any(rule_re.search(command.lower()) for command in dangerous):
+            problems.append(f"Правило {pattern} не покрыто контрольным набором")
+    return problems
+
+
+def benchmark_danger_matcher(
+    commands: Sequence[str] = tuple(DANGEROUS_CORPUS) + tuple(SAFE_CORPUS),
+    patterns: Sequence[str] = DANGEROUS_COMMAND_PATTERNS,
+    repeat: int = BENCHMARK_REPEAT,
+) -> Dict[str, float]:
+    """Медиана времени (мкс) проверки одной команды: единый regex и прежний способ."""
+    compiled = compile_danger_patterns(patterns)
+    cases = {
+        "единый regex": lambda command: find_danger(command, patterns, compiled),
+        "поочерёдный re.search": lambda command: _legacy_is_dangerous(
+            command, patterns
+        ),
+    }
+    results = {}
+    for label, func in cases.items():
+        timings = []
+        for command in commands:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                func(command)
+            timings.append((time.perf_counter() - started) / repeat * 1e6)
+        results[label] = statistics.median(timings)
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    problems = check_danger_parity()
+    for problem in problems:
+        print(problem)
+    for label, us in benchmark_danger_matcher().items():
+        print(f"{label}: {us:.2f} мкс")
+    print("OK" if not problems else f"Расхождений: {len(problems)}")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Классификация распознанной фразы за один проход: команды (открой/запусти/найди)
+и служебные слова диктовки (выделить, про, флеш, имена профилей).
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+WEBSITE_TRIGGERS = ("открой", "открыть", "откроем", "открывай")
+LAUNCH_TRIGGERS = (
+    "запусти",
+    "запустить",
+    "запуск",
+    "запустим",
+    "запускай",
+    "запускаю",
+)
+# Любая форма слова <найди>: найди, найти, найдите...
+SEARCH_TRIGGER_PREFIX = "найд"
+
+INTENT_WEBSITE = "website"
+INTENT_LAUNCH = "launch"
+INTENT_SEARCH = "search"
+INTENT_DICTATION = "dictation"
+
+ROLE_SELECTION = "selection"
+ROLE_PRO = "pro"
+ROLE_FLASH = "flash"
+ROLE_PROFILE = "profile"
+
+_BODY_COMMANDS = (INTENT_WEBSITE, INTENT_LAUNCH)
+_COMMAND_KINDS = (INTENT_WEBSITE, INTENT_LAUNCH, INTENT_SEARCH)
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_TOKEN_PUNCT_RE = re.compile(r"[^\w]", flags=re.UNICODE)
+
+
+@dataclass(frozen=True)
+class Intent:
+    """
+    Результат классификации. kind - тип команды, trigger/body - сработавшее слово
+    и нормализованный остаток фразы. tokens - пары (нормализованное, исходное)
+    слово для разбора модификаторов диктовки; first_index указывает на первое
+    непустое слово, first_role/profile_name - его роль.
+    """
+
+    kind: str
+    text: str
+    norm_text: str
+    trigger: str = ""
+    body: str = ""
+    tokens: Tuple[Tuple[str, str], ...] = ()
+    first_index: Optional[int] = None
+    first_role: Optional[str] = None
+    profile_name: Optional[str] = None
+
+    @property
+    def is_command(self) -> bool:
+        return self.kind != INTENT_DICTATION
+
+
+class _TrieNode:
+    __slots__ = ("children", "values", "prefix_values")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.values: List[tuple] = []
+        self.prefix_values: List[tuple] = []
+
+
+class _WordTrie:
+    """Префиксное дерево по символам: точные слова и префиксы (для <найд...>)."""
+
+    def __init__(self) -> None:
+        self._root = _TrieNode()
+
+    def add(self, word: str, value: tuple, prefix: bool = False) -> None:
+        node = self._root
+        for ch in word:
+            node = node.children.setdefault(ch, _TrieNode())
+        (node.prefix_values if prefix else node.values).append(value)
+
+    def lookup(self, word: str) -> List[tuple]:
+        """
+        Все значения слова в порядке добавления (точные, затем префиксные).
+        Слово просматривается один раз.
+        """
+        node = self._root
+        prefix_hits: List[tuple] = []
+        for ch in word:
+            node = node.children.get(ch)
+            if node is None:
+                return prefix_hits
+            prefix_hits.extend(node.prefix_values)
+        return node.values + prefix_hits
+
+
+class IntentRouter:
+    """
+    Скомпилированный маршрутизатор намерений. Слова-триггеры команд неизменны,
+    слова модификаторов берутся из настроек: дерево пересобирается только
+    при их изменении.
+    """
+
+    def __init__(self) -> None:
+        self._key = None
+        self._trie: Optional[_WordTrie] = None
+
+    def _compile(self, settings: dict) -> _WordTrie:
+        pro_word = _setting_word(settings, "pro_word", "про")
+        flash_word = _setting_word(settings, "flash_word", "флеш")
+        selection_word = _setting_word(settings, "selection_word", "выделить")
+        prompts = settings.get("gemini_prompts", {})
+        if not isinstance(prompts, dict):
+            prompts = {}
+        profiles = tuple(sorted(prompts.keys()))
+        key = (pro_word, flash_word, selection_word, profiles)
+        if self._trie is not None and key == self._key:
+            return self._trie
+
+        trie = _WordTrie()
+        # Порядок добавления задаёт приоритет: сначала команды
+        _add_all(trie, WEBSITE_TRIGGERS, (INTENT_WEBSITE, None))
+        _add_all(trie, LAUNCH_TRIGGERS, (INTENT_LAUNCH, None))
+        trie.add(SEARCH_TRIGGER_PREFIX, (INTENT_SEARCH, None), prefix=True)
+        # Порядок как в прежних проверках: выделение, профиль, затем про/флеш
+        trie.add(selection_word, (ROLE_SELECTION, None))
+        for name in profiles:
+            trie.add(name.strip().lower(), (ROLE_PROFILE, name))
+        trie.add(pro_word, (ROLE_PRO, None))
+        trie.add(flash_word, (ROLE_FLASH, None))
+
+        self._key = key
+        self._trie = trie
+        return trie
+
+    def classify(self, text: str, settings: Optional[dict] = None) -> Intent:
+        text = text or ""
+        trie = self._compile(settings or {})
+
+        # Нормализация один раз: "Открой, гугл!" -> "открой гугл"
+        norm_text = " ".join(_PUNCT_RE.sub(" ", text.strip().lower()).split())
+        head, _, body = norm_text.partition(" ")
+        for kind, _ in trie.lookup(head) if head else ():
+            if kind == INTENT_SEARCH or (kind in _BODY_COMMANDS and body):
+                return Intent(kind, text, norm_text, trigger=head, body=body)
+
+        tokens = tuple(
+            (_TOKEN_PUNCT_RE.sub("", w).lower(), w) for w in text.strip().split()
+        )
+        first_index = next((i for i, (norm, _) in enumerate(tokens) if norm), None)
+        first_role = None
+        profile_name = None
+        if first_index is not None:
+            for role, name in trie.lookup(tokens[first_index][0]):
+                if role not in _COMMAND_KINDS:
+                    first_role, profile_name = role, name
+                    break
+        return Intent(
+            INTENT_DICTATION,
+            text,
+            norm_text,
+            tokens=tokens,
+            first_index=first_index,
+            first_role=first_role,
+            profile_name=profile_name,
+        )
+
+    def roles_of(self, word: str, settings: Optional[dict] = None) -> FrozenSet[str]:
+        """Роли отдельного нормализованного слова (про/флеш после профиля)."""
+        if not word:
+            return frozenset()
+        return frozenset(role for role, _ in self._compile(settings or {}).lookup(word))
+
+
+def _setting_word(settings: dict, key: str, default: str) -> str:
+    return (settings.get(key, default) or default).strip().lower()
+
+
+def _add_all(trie: _WordTrie, words: Iterable[str], value) -> None:
+    for word in words:
+        trie.add(word, value)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Упреждающее разрешение команд через Gemini: запрос стартует, как только
+триггер распознан (в том числе в промежуточном сегменте), а ожидание
+ответа ограничено сроком, после которого используется запасной вариант.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional, Tuple
+
+RESOLVE_POOL_WORKERS = 2
+# Упреждающие запросы идут в отдельном пуле и не занимают потоки,
+# нужные команде, которую пользователь уже договорил
+PREFETCH_POOL_WORKERS = 2
+# Сколько держать готовый или упреждающий ответ, если команду так и не выполнили
+RESULT_TTL_S = 60.0
+_POLL_INTERVAL_S = 0.05
+
+_resolve_pool: Optional[ThreadPoolExecutor] = None
+_prefetch_pool: Optional[ThreadPoolExecutor] = None
+_pools_lock = threading.Lock()
+
+# Результат запроса, отменённого до завершения: не кэшируется
+_CANCELLED = object()
+
+
+def _get_resolve_pool() -> ThreadPoolExecutor:
+    global _resolve_pool
+    with _pools_lock:
+        if _resolve_pool is None:
+            _resolve_pool = ThreadPoolExecutor(
+                max_workers=RESOLVE_POOL_WORKERS, thread_name_prefix="command-resolve"
+            )
+        return _resolve_pool
+
+
+def _get_prefetch_pool() -> ThreadPoolExecutor:
+    global _prefetch_pool
+    with _pools_lock:
+        if _prefetch_pool is None:
+            _prefetch_pool = ThreadPoolExecutor(
+                max_workers=PREFETCH_POOL_WORKERS, thread_name_prefix="command-prefetch"
+            )
+        return _prefetch_pool
+
+
+def _normalize_phrase(text: str) -> str:
+    return " ".join((text or "").lower().replace("ё", "е").split())
+
+
+class _PendingResolve:
+    """Запущенный запрос. cancel_check - от последнего присоединившегося вызова."""
+
+    def __init__(
+        self, cancel_check: Optional[Callable[[], bool]], foreground: bool
+    ) -> None:
+        self.future: Optional[Future] = None
+        self.started = time.monotonic()
+        self.cancel_check = cancel_check
+        self.foreground = foreground
+
+    def is_cancelled(self) -> bool:
+        cancel_check = self.cancel_check
+        return bool(cancel_check and cancel_check())
+
+
+class SpeculativeResolver:
+    """
+    Один запрос на фразу: повторные prefetch/resolve присоединяются к уже
+    запущенному. resolve_func(phrase, cancel_check) вызывается в пуле потоков;
+    ответ отменённого запроса не сохраняется.
+    """
+
+    def __init__(
+        self,
+        resolve_func: Callable[[str, Callable[[], bool]], str],
+        ttl_s: float = RESULT_TTL_S,
+        log_func=None,
+    ) -> None:
+        self.resolve_func = resolve_func
+        self.ttl_s = ttl_s
+        self.log = log_func or (lambda _msg: None)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _PendingResolve] = {}
+
+    def prefetch(
+        self, phrase: str, cancel_check: Optional[Callable[[], bool]] = None
+    ) -> bool:
+        """Запускает разрешение заранее. True, если запрос был запущен сейчас."""
+        key = _normalize_phrase(phrase)
+        if not key:
+            return False
+        _future, started = self._get_or_submit(key, cancel_check, foreground=False)
+        if started:
+            self.log(f"Упреждающее разрешение команды: '{key}'")
+        return started
+
+    def resolve(
+        self,
+        phrase: str,
+        deadline_s: Optional[float] = None,
+        cancel_check: Optional[Callable[[], bool]] = None,
+    ) -> Tuple[Optional[str], bool]:
+        """
+        Возвращает (ответ, timed_out). Ответ None при отмене или истечении
+        срока; незавершённый запрос продолжает работу и его результат
+        пригодится при повторе команды.
+        """
+        key = _normalize_phrase(phrase)
+        if not key:
+            return None, False
+        future, _started = self._get_or_submit(key, cancel_check, foreground=True)
+        deadline = time.monotonic() + deadline_s if deadline_s else None
+        while True:
+            if cancel_check and cancel_check():
+                return None, False
+            timeout = _POLL_INTERVAL_S
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None, True
+                timeout = min(timeout, remaining)
+            try:
+                result = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                continue
+            except Exception as e:
+                self.log(f"Ошибка разрешения команды '{key}': {e}")
+                self.discard(key)
+                return None, False
+            if result is _CANCELLED:
+                # Упреждающий запрос отменённой диктовки: спрашиваем заново
+                future, _started = self._get_or_submit(
+                    key, cancel_check, foreground=True
+                )
+                continue
+            self.discard(key)
+            return result, False
+
+    def discard(self, phrase: str) -> None:
+        key = _normalize_phrase(phrase)
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _get_or_submit(
+        self,
+        key: str,
+        cancel_check: Optional[Callable[[], bool]],
+        foreground: bool,
+    ) -> Tuple[Future, bool]:
+        now = time.monotonic()
+        with self._lock:
+            self._drop_expired_locked(now)
+            entry = self._pending.get(key)
+            if entry is not None:
+                if foreground and not entry.foreground and entry.future.cancel():
+                    # Упреждающий запрос ещё ждёт в очереди - не ждём его
+                    self._pending.pop(key, None)
+                else:
+                    entry.cancel_check = cancel_check
+                    entry.foreground = entry.foreground or foreground
+                    return entry.future, False
+            entry = _PendingResolve(cancel_check, foreground)
+            pool = _get_resolve_pool() if foreground else _get_prefetch_pool()
+            entry.future = pool.submit(self._run, key, entry)
+            self._pending[key] = entry
+            return entry.future, True
+
+    def _run(self, key: str, entry: _PendingResolve):
+        result = self.resolve_func(key, entry.is_cancelled)
+        if entry.is_cancelled():
+            with self._lock:
+                if self._pending.get(key) is entry:
+                    self._pending.pop(key, None)
+            return _CANCELLED
+        return result
+
+    def _drop_expired_locked(self, now: float) -> None:
+        expired = [
+            key
+            for key, entry in self._pending.items()
+            if entry.future.done() and now - entry.started > self.ttl_s
+        ]
+        for key in expired:
+            self._pending.pop(key, None)
@@ -20,8 +20,15 @@ except Exception:
     genai_errors = None
 
 from app.core.app_config import MODEL_DISPLAY_NAMES, MODEL_FALLBACKS
+from app.core.gemini_context_cache import GeminiContextCache
+from app.core.gemini_request_coalescer import GeminiRequestCoalescer
+from app.core.gemini_telemetry import GeminiCallRecord, GeminiTelemetryStore
+from app.core.gemini_thinking_policy import AdaptiveThinkingPolicy
 from app.utils.logging_utils import log_message
 
+# Период сводки телеметрии, которая пишется в лог при запуске
+TELEMETRY_SUMMARY_WINDOW_S = 24 * 3600
+
 
 class GeminiCancelledError(Exception):
     """Исключение для отменённых запросов к Gemini."""
@@ -34,6 +41,22 @@ class GeminiClientManager:
         self._supported_thinking_levels = None
         thinking_fields = getattr(types.ThinkingConfig, "model_fields", {}) or {}
         self.supports_thinking_level = "thinking_level" in thinking_fields
+        self.context_cache = GeminiContextCache(log_func=log_func)
+        self.request_coalescer = GeminiRequestCoalescer(
+            cancelled_error_cls=GeminiCancelledError, log_func=log_func
+        )
+        self.thinking_policy = AdaptiveThinkingPolicy()
+        self.telemetry = GeminiTelemetryStore(log_func=log_func)
+        loaded = self.thinking_policy.load_samples(self.telemetry.latency_samples())
+        if loaded:
+            self.log(f"Адаптивный thinking: загружено замеров задержки: {loaded}")
+        summary = self.telemetry.summary_lines(
+            since_ts=time.time() - TELEMETRY_SUMMARY_WINDOW_S
+        )
+        if summary:
+            self.log("Телеметрия Gemini за сутки (запрос/ответ/thinking токены):")
+            for line in summary:
+                self.log(f"   {line}")
 
     def initialize(self, settings: dict, vless_manager=None):
         # Загрузка API ключа ТОЛЬКО из настроек
@@ -97,7 +120,10 @@ class GeminiClientManager:
                 except Exception as e:
                     self.log(f"? Не удалось настроить кастомный HTTP клиент: {e}")
 
+            previous_client = self.client
             self.client = genai.Client(api_key=api_key, http_options=http_options)
+            self.context_cache.reset(previous_client)
+            self.request_coalescer.clear()
             self.log("Gemini клиент инициализирован")
         except Exception as e:
             self.client = None
@@ -108,26 +134,57 @@ class GeminiClientManager:
     def reinitialize(self, settings: dict, vless_manager=None):
         return self.initialize(settings, vless_manager=vless_manager)
 
+    def shutdown(self) -> None:
+        """Освобождает серверные кэши промптов и дописывает телеметрию."""
+        if self.client is not None:
+            self.context_cache.shutdown(self.client)
+        self.telemetry.close()
+
     def describe_model(self, model_name: str, thinking_level: str) -> str:
         level = (thinking_level or "low").lower()
         key = (model_name, level)
         return MODEL_DISPLAY_NAMES.get(key, f"{model_name} ({level})")
 
     def determine_thinking_level(
-        self, settings: dict, use_pro: bool, use_flash: bool, model_name: Optional[str]
+        self,
+        settings: dict,
+        use_pro: bool,
+        use_flash: bool,
+        model_name: Optional[str],
+        text_chars: Optional[int] = None,
+        prompt_chars: Optional[int] = None,
+        use_selection: bool = False,
     ) -> str:
         """
         Определяет уровень мышления (thinking_level) на основе настроек.
         Gemini 3.x: поддерживаемые уровни зависят от SDK.
+        Если передана длина текста, уровень из настроек может быть понижен
+        адаптивной политикой (короткие фразы, бюджет задержки).
         """
         # Если явный флаг Pro или модель Pro
         if use_pro or (model_name and "pro" in model_name.lower()):
             val = settings.get("gemini3_pro_thinking_level", "high")
-            return self._normalize_thinking_level(val)
-
-        # В остальных случаях (Flash, по умолчанию)
-        val = settings.get("gemini3_flash_thinking_level", "high")
-        return self._normalize_thinking_level(val)
+        else:
+            # В остальных случаях (Flash, по умолчанию)
+            val = settings.get("gemini3_flash_thinking_level", "high")
+        level = self._normalize_thinking_level(val)
+
+        if text_chars is None or not model_name:
+            return level
+        adaptive_level, reason = self.thinking_policy.choose(
+            model_name,
+            level,
+            text_chars=text_chars,
+            prompt_chars=prompt_chars if prompt_chars is not None else text_chars,
+            settings=settings,
+            use_selection=use_selection,
+            allowed_levels=self._get_supported_thinking_levels(),
+        )
+        if adaptive_level != level:
+            self.log(
+                f"Адаптивный thinking_level: {level} -> {adaptive_level} ({reason})"
+            )
+        return adaptive_level
 
     def generate_with_fallback(
         self,
@@ -138,28 +195,124 @@ class GeminiClientManager:
         cancel_check: Optional[Callable[[], bool]] = None,
         status_cb: Optional[Callable[[str, str, bool], None]] = None,
         warning_color: Optional[str] = None,
+        system_prompt: Optional[str] = None,
     ) -> Tuple[object, str, str]:
-        """Отправляет запрос к Gemini, понижая модель при ошибках или недоступности."""
+        """
+        Отправляет запрос к Gemini, понижая модель при ошибках или недоступности.
+        system_prompt (промпт профиля) по возможности передаётся через cached content,
+        иначе склеивается с prompt как раньше. Одинаковые одновременные запросы
+        объединяются в один сетевой вызов.
+        """
         if not self.client:
             raise RuntimeError("Gemini client не инициализирован")
 
+        key = self.request_coalescer.make_key(
+            model_name, thinking_level, prompt, system_prompt
+        )
+        return self.request_coalescer.run(
+            key,
+            lambda: self._generate_with_fallback_uncoalesced(
+                model_name,
+                prompt,
+                thinking_level,
+                settings,
+                cancel_check=cancel_check,
+                status_cb=status_cb,
+                warning_color=warning_color,
+                system_prompt=system_prompt,
+            ),
+            cancel_check=cancel_check,
+        )
+
+    def _generate_with_fallback_uncoalesced(
+        self,
+        model_name: str,
+        prompt: str,
+        thinking_level: str,
+        settings: dict,
+        cancel_check: Optional[Callable[[], bool]] = None,
+        status_cb: Optional[Callable[[str, str, bool], None]] = None,
+        warning_color: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+    ) -> Tuple[object, str, str]:
+        trace = GeminiCallRecord(
+            kind="dictation",
+            requested_model=model_name,
+            prompt_chars=len(prompt),
+        )
+        started = time.monotonic()
+        try:
+            response, used_model, used_level = self._generate_attempts(
+                trace,
+                model_name,
+                prompt,
+                thinking_level,
+                settings,
+                cancel_check=cancel_check,
+                status_cb=status_cb,
+                warning_color=warning_color,
+                system_prompt=system_prompt,
+            )
+        except GeminiCancelledError:
+            self._record_call(trace, started, None, "cancelled")
+            raise
+        except Exception:
+            self._record_call(trace, started, None, "error")
+            raise
+        self._record_call(trace, started, response, "ok")
+        return response, used_model, used_level
+
+    def _generate_attempts(
+        self,
+        trace: GeminiCallRecord,
+        model_name: str,
+        prompt: str,
+        thinking_level: str,
+        settings: dict,
+        cancel_check: Optional[Callable[[], bool]] = None,
+        status_cb: Optional[Callable[[str, str, bool], None]] = None,
+        warning_color: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+    ) -> Tuple[object, str, str]:
         attempted = set()
         current_model = model_name
         current_level = thinking_level or "low"
         retries_for_model = 0
         max_retries = 2
+        use_context_cache = bool(system_prompt) and bool(
+            settings.get("gemini_context_cache_enabled", True)
+        )
+        cache_rejected = set()
 
         while True:
             if cancel_check and cancel_check():
                 raise GeminiCancelledError("Gemini generation cancelled")
 
             attempted.add(current_model)
-            config = self._build_generation_config(current_level)
-
+            cached_content = None
+            if use_context_cache and current_model not in cache_rejected:
+                cached_content = self.context_cache.get_cached_content_name(
+                    self.client, current_model, system_prompt
+                )
+            config = self._build_generation_config(
+                current_level, cached_content=cached_content
+            )
+            if cached_content or not system_prompt:
+                contents = prompt
+            else:
+                contents = f"{system_prompt} {prompt}"
+
+            if current_model not in trace.fallback_path:
+                trace.fallback_path.append(current_model)
+            trace.model = current_model
+            trace.level = current_level
+            trace.attempts += 1
             try:
+                attempt_start = time.monotonic()
                 response = self.client.models.generate_content(
-                    model=current_model, contents=prompt, config=config
+                    model=current_model, contents=contents, config=config
                 )
+                trace.latency_s = time.monotonic() - attempt_start
                 retries_for_model = 0
                 return response, current_model, current_level
             except GeminiCancelledError:
@@ -167,6 +320,19 @@ class GeminiClientManager:
             except Exception as e:
                 display_name = self.describe_model(current_model, current_level)
 
+                if cached_content and self._is_cache_error(e):
+                    # Кэш истёк или удалён на сервере - повторяем без него.
+                    # Остальные ошибки (сеть, 429) идут в обычные повторы
+                    self.log(
+                        f"{display_name}: запрос с кэшем промпта отклонён ({e}). "
+                        "Повтор без кэша."
+                    )
+                    self.context_cache.invalidate(
+                        current_model, system_prompt, client=self.client
+                    )
+                    cache_rejected.add(current_model)
+                    continue
+
                 if self._is_transient_network_error(e) and retries_for_model < max_retries:
                     retries_for_model += 1
                     delay = min(6.0, 1.5**retries_for_model)
@@ -247,7 +413,11 @@ class GeminiClientManager:
             """
 
             response = self._generate_simple(
-                model_name, prompt, temperature=0.0, cancel_check=cancel_check
+                model_name,
+                prompt,
+                temperature=0.0,
+                cancel_check=cancel_check,
+                kind="command",
             )
             if response is None:
                 return "UNKNOWN"
@@ -280,7 +450,9 @@ class GeminiClientManager:
             self.log(f"Ошибка при определении команды через Gemini: {e}")
             return "UNKNOWN"
 
-    def resolve_url(self, description: str) -> str:
+    def resolve_url(
+        self, description: str, cancel_check: Optional[Callable[[], bool]] = None
+    ) -> str:
         """
         Использует Gemini для определения URL по описанию.
         Возвращает URL или 'SEARCH' если не уверен.
@@ -288,6 +460,9 @@ class GeminiClientManager:
         if not self.client:
             return "SEARCH"
 
+        if cancel_check and cancel_check():
+            return "SEARCH"
+
         try:
             model_name = "gemini-3-flash-preview"  # Используем новую быструю модель
 
@@ -304,7 +479,11 @@ class GeminiClientManager:
             """
 
             response = self._generate_simple(
-                model_name, prompt, temperature=0.0, cancel_check=None
+                model_name,
+                prompt,
+                temperature=0.0,
+                cancel_check=cancel_check,
+                kind="url",
             )
             if response is None:
                 return "SEARCH"
@@ -326,18 +505,47 @@ class GeminiClientManager:
         prompt: str,
         temperature: float,
         cancel_check: Optional[Callable[[], bool]] = None,
+        kind: str = "simple",
     ):
         if not self.client:
             return None
         if cancel_check and cancel_check():
             return None
-        response = self.client.models.generate_content(
+        trace = GeminiCallRecord(
+            kind=kind,
+            requested_model=model_name,
             model=model_name,
-            contents=prompt,
-            config=types.GenerateContentConfig(temperature=temperature),
+            attempts=1,
+            fallback_path=[model_name],
+            prompt_chars=len(prompt),
         )
+        started = time.monotonic()
+        try:
+            response = self.client.models.generate_content(
+                model=model_name,
+                contents=prompt,
+                config=types.GenerateContentConfig(temperature=temperature),
+            )
+        except Exception:
+            self._record_call(trace, started, None, "error")
+            raise
+        trace.latency_s = time.monotonic() - started
+        self._record_call(trace, started, response, "ok")
         return response
 
+    def _record_call(
+        self, trace: GeminiCallRecord, started: float, response, status: str
+    ) -> None:
+        trace.status = status
+        trace.total_s = time.monotonic() - started
+        if response is not None:
+            trace.apply_usage(response)
+        if status == "ok" and trace.kind == "dictation" and trace.latency_s is not None:
+            self.thinking_policy.record(
+                trace.model, trace.level, trace.prompt_chars, trace.latency_s
+            )
+        self.telemetry.record(trace)
+
     def _get_supported_thinking_levels(self):
         if self._supported_thinking_levels is not None:
             return self._supported_thinking_levels
@@ -372,8 +580,11 @@ class GeminiClientManager:
             )
         return fallback
 
-    def _build_generation_config(self, thinking_level: str):
+    def _build_generation_config(
+        self, thinking_level: str, cached_content: Optional[str] = None
+    ):
         """Собирает конфиг с учетом особенностей моделей 3.x."""
+        extra = {"cached_content": cached_content} if cached_content else {}
         # Gemini 3.x: используют thinking_level (поддерживаемые значения зависят от SDK)
         if self.supports_thinking_level:
             level = self._normalize_thinking_level(thinking_level)
@@ -381,12 +592,13 @@ class GeminiClientManager:
                 thinking_config=types.ThinkingConfig(
                     thinking_level=level,
                     include_thoughts=False,
-                )
+                ),
+                **extra,
             )
 
         # Fallback для старых SDK (если вдруг)
         return types.GenerateContentConfig(
-            thinking_config=types.ThinkingConfig(thinking_budget=-1)
+            thinking_config=types.ThinkingConfig(thinking_budget=-1), **extra
         )
 
     def _is_transient_network_error(self, error) -> bool:
@@ -399,6 +611,18 @@ class GeminiClientManager:
             return True
         return False
 
+    def _is_cache_error(self, error) -> bool:
+        """Ошибка относится к самому кэшу промпта: не найден, истёк или недоступен."""
+        if genai_errors is None or not isinstance(error, genai_errors.ClientError):
+            return False
+        status_code = getattr(error, "status_code", None) or getattr(
+            error, "code", None
+        )
+        if status_code not in (400, 403, 404):
+            return False
+        text = str(error).lower()
+        return "cache" in text
+
     def _should_try_fallback(self, error) -> bool:
         """Понимает, стоит ли пробовать резервную модель после ошибки."""
         retryable_codes = {403, 404, 408, 409, 429, 500, 502, 503}
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Явное кэширование системных промптов Gemini (cached content API)."""
+
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from google.genai import types
+
+from app.utils.logging_utils import log_debug, log_message
+
+CACHE_TTL_S = 3600
+# Продлеваем кэш заранее, чтобы запрос не попал на уже истёкший объект
+CACHE_REFRESH_MARGIN_S = 300
+# После отказа API (слишком короткий промпт, модель без кэша) не пробуем снова
+CACHE_RETRY_AFTER_S = 1800
+
+
+class GeminiContextCache:
+    """
+    Регистрирует промпт профиля как cached content при первом использовании,
+    продлевает его до истечения и отдаёт имя для GenerateContentConfig.
+    Любая ошибка API означает работу без кэша, а не ошибку запроса.
+    """
+
+    def __init__(
+        self,
+        log_func=log_message,
+        ttl_s: int = CACHE_TTL_S,
+        refresh_margin_s: int = CACHE_REFRESH_MARGIN_S,
+        retry_after_s: int = CACHE_RETRY_AFTER_S,
+    ) -> None:
+        self.log = log_func
+        self.ttl_s = ttl_s
+        self.refresh_margin_s = refresh_margin_s
+        self.retry_after_s = retry_after_s
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._unavailable: Dict[Tuple[str, str], float] = {}
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._client_id = None
+
+    def reset(self, client=None) -> None:
+        """
+        Забывает кэши (например, после переинициализации клиента). Если передан
+        прежний клиент, его кэши удаляются на сервере, а не ждут истечения TTL.
+        """
+        with self._lock:
+            names = [name for name, _expires_at in self._entries.values()]
+            self._entries.clear()
+            self._unavailable.clear()
+            self._key_locks.clear()
+            self._client_id = None
+        if client is not None:
+            for name in names:
+                self._delete(client, name)
+
+    def shutdown(self, client) -> None:
+        """Удаляет созданные кэши на сервере при выходе из приложения."""
+        self.reset(client)
+
+    def get_cached_content_name(
+        self, client, model_name: str, system_prompt: Optional[str]
+    ) -> Optional[str]:
+        if not client or not model_name or not system_prompt:
+            return None
+        if not hasattr(client, "caches"):
+            return None
+        key = (model_name, self._digest(system_prompt))
+        with self._lock:
+            if self._client_id != id(client):
+                self._entries.clear()
+                self._unavailable.clear()
+                self._key_locks.clear()
+                self._client_id = id(client)
+            name = self._fresh_name_locked(key)
+            if name is not None:
+                return name
+            if self._is_unavailable_locked(key):
+                return None
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Сетевые вызовы идут под замком ключа: другие модели и профили не ждут,
+        # а одинаковые запросы не создают кэш дважды
+        with key_lock:
+            with self._lock:
+                name = self._fresh_name_locked(key)
+                if name is not None or self._is_unavailable_locked(key):
+                    return name
+                entry = self._entries.get(key)
+            if entry:
+                name, expires_at = entry
+                if time.monotonic() < expires_at and self._refresh(client, name):
+                    with self._lock:
+                        self._entries[key] = (name, time.monotonic() + self.ttl_s)
+                    return name
+                with self._lock:
+                    self._entries.pop(key, None)
+                self._delete(client, name)
+            return self._create(client, key, system_prompt)
+
+    def invalidate(
+        self, model_name: str, system_prompt: Optional[str], client=None
+    ) -> None:
+        """Сбрасывает запись, если API отклонил запрос с этим кэшем."""
+        if not system_prompt:
+            return
+        key = (model_name, self._digest(system_prompt))
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry and client is not None:
+            self._delete(client, entry[0])
+
+    def _fresh_name_locked(self, key: Tuple[str, str]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry and time.monotonic() < entry[1] - self.refresh_margin_s:
+            return entry[0]
+        return None
+
+    def _is_unavailable_locked(self, key: Tuple[str, str]) -> bool:
+        retry_at = self._unavailable.get(key)
+        if retry_at is None:
+            return False
+        if time.monotonic() < retry_at:
+            return True
+        self._unavailable.pop(key, None)
+        return False
+
+    def _create(self, client, key: Tuple[str, str], system_prompt: str):
+        model_name, digest = key
+        try:
+            cached = client.caches.create(
+                model=model_name,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_prompt,
+                    display_name=f"gva-prompt-{digest[:12]}",
+                    ttl=f"{self.ttl_s}s",
+                ),
+            )
+        except Exception as e:
+            with self._lock:
+                self._unavailable[key] = time.monotonic() + self.retry_after_s
+            self.log(f"Кэш промпта Gemini недоступен для {model_name}: {e}")
+            return None
+        name = getattr(cached, "name", None)
+        with self._lock:
+            if not name:
+                self._unavailable[key] = time.monotonic() + self.retry_after_s
+                return None
+            self._entries[key] = (name, time.monotonic() + self.ttl_s)
+        self.log(f"Промпт профиля закэширован в Gemini ({model_name}): {name}")
+        return name
+
+    def _refresh(self, client, name: str) -> bool:
+        try:
+            client.caches.update(
+                name=name,
+                config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_s}s"),
+            )
+        except Exception as e:
+            self.log(f"Не удалось продлить кэш промпта Gemini {name}: {e}")
+            return False
+        return True
+
+    def _delete(self, client, name: str) -> None:
+        try:
+            client.caches.delete(name=name)
+        except Exception as e:
+            # Кэш мог уже истечь на сервере - это не ошибка
+            log_debug("Не удалось удалить кэш промпта Gemini %s: %s", name, e)
+
+    @staticmethod
+    def _digest(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
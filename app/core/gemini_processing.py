@@ -7,13 +7,19 @@ import re
 import subprocess
 import threading
 import time
-import traceback
 
 import pyperclip
 
 from app.core.app_config import COLORS, resource_path
 from app.core.gemini_client import GeminiCancelledError
-from app.utils.logging_utils import history_logger, log_message, log_separator
+from app.utils.logging_utils import (
+    history_logger,
+    is_debug_enabled,
+    log_debug,
+    log_message,
+    log_separator,
+    log_traceback,
+)
 
 
 def begin_gemini_task(assistant, whisper_text, insert_text):
@@ -62,6 +68,10 @@ def finalize_task_output(
         log_message("Запись добавлена в историю")
     except Exception as e:
         log_message(f"Ошибка записи в историю: {e}")
+    try:
+        assistant.history_store.append(final_text, timestamp)
+    except Exception as e:
+        log_message(f"Ошибка записи в индекс истории: {e}")
 
     if assistant.ui_signals:
         assistant.ui_signals.history_updated.emit()
@@ -195,10 +205,9 @@ def _extract_response_text(response) -> str:
             clean.append(part_text)
     if clean:
         if suspicious:
-            preview = "; ".join(_debug_preview(text, 80) for text in suspicious)
-            log_message(
-                "DEBUG: Пропущены служебные части ответа Gemini: "
-                f"{preview}"
+            log_debug(
+                lambda: "Пропущены служебные части ответа Gemini: "
+                + "; ".join(_debug_preview(text, 80) for text in suspicious)
             )
         return "\n".join(part.rstrip() for part in clean).strip()
     return fallback_text
@@ -207,18 +216,18 @@ def _extract_response_text(response) -> str:
 def _log_response_structure(response) -> None:
     try:
         candidates = getattr(response, "candidates", None) or []
-        log_message(f"DEBUG: Кандидатов Gemini: {len(candidates)}")
+        log_debug(f"Кандидатов Gemini: {len(candidates)}")
         for idx, candidate in enumerate(candidates):
             content = getattr(candidate, "content", None)
             parts = getattr(content, "parts", None) or []
-            log_message(f"DEBUG: Кандидат {idx}: частей={len(parts)}")
+            log_debug(f"Кандидат {idx}: частей={len(parts)}")
             for pidx, part in enumerate(parts):
                 part_text = getattr(part, "text", None)
                 part_thought = getattr(part, "thought", False)
                 if part_text is not None:
                     preview = _debug_preview(part_text, 200)
-                    log_message(
-                        "DEBUG:  part["
+                    log_debug(
+                        "  part["
                         f"{pidx}] text({len(part_text)}), thought={part_thought}: "
                         f"{preview}"
                     )
@@ -231,9 +240,9 @@ def _log_response_structure(response) -> None:
                     part_type = "file_data"
                 else:
                     part_type = "unknown"
-                log_message(f"DEBUG:  part[{pidx}] type={part_type}")
+                log_debug(f"  part[{pidx}] type={part_type}")
     except Exception as e:
-        log_message(f"DEBUG: Не удалось прочитать структуру ответа Gemini: {e}")
+        log_debug(f"Не удалось прочитать структуру ответа Gemini: {e}")
 
 
 def cancel_gemini_processing(assistant):
@@ -309,6 +318,7 @@ def handle_final_text(
         if active_profile:
             log_message(f"Используется профиль промпта '{active_profile}'")
 
+        system_prompt = None
         if use_selection and selected_text:
             selection_instruction = whisper_text or "Отредактируй выделенный текст"
             prompt = (
@@ -324,7 +334,9 @@ def handle_final_text(
                 user_prompt = assistant.settings.get("gemini_prompt")
             else:
                 user_prompt = prompt_override
-            prompt = f"{user_prompt} Вот текст: '{whisper_text}'"
+            # Промпт профиля отправляется отдельно, чтобы его можно было закэшировать
+            system_prompt = user_prompt or None
+            prompt = f"Вот текст: '{whisper_text}'"
 
         markdown_enabled = bool(
             assistant.settings.get("gemini_markdown_enabled", False)
@@ -351,8 +363,13 @@ def handle_final_text(
                 "перед текстом ответа. Ответ должен начинаться сразу "
                 "с содержательного текста."
             )
-        log_message(
-            f"DEBUG: Промпт Gemini ({len(prompt)} симв.): {_debug_preview(prompt)}"
+        if system_prompt:
+            log_debug(
+                lambda: "Промпт профиля Gemini "
+                f"({len(system_prompt)} симв.): {_debug_preview(system_prompt)}"
+            )
+        log_debug(
+            lambda: f"Промпт Gemini ({len(prompt)} симв.): {_debug_preview(prompt)}"
         )
 
         if use_pro:
@@ -363,7 +380,13 @@ def handle_final_text(
             model_name = assistant.settings.get("gemini_model_default")
 
         thinking_level = assistant.gemini_manager.determine_thinking_level(
-            assistant.settings, use_pro, use_flash, model_name=model_name
+            assistant.settings,
+            use_pro,
+            use_flash,
+            model_name=model_name,
+            text_chars=len(whisper_text) + len(selected_text),
+            prompt_chars=len(prompt),
+            use_selection=bool(use_selection and selected_text),
         )
         display_name = assistant.gemini_manager.describe_model(
             model_name, thinking_level
@@ -387,16 +410,18 @@ def handle_final_text(
             cancel_check=assistant._gemini_cancel_event.is_set,
             status_cb=assistant.show_status,
             warning_color=COLORS["btn_warning"],
+            system_prompt=system_prompt,
         )
 
         if assistant._gemini_cancel_event.is_set():
             raise GeminiCancelledError("Отмена после ответа Gemini")
 
         used_display = assistant.gemini_manager.describe_model(used_model, used_level)
-        _log_response_structure(response)
+        if is_debug_enabled():
+            _log_response_structure(response)
         raw_response_text = _extract_response_text(response)
-        log_message(
-            "DEBUG: Сырой ответ Gemini "
+        log_debug(
+            lambda: "Сырой ответ Gemini "
             f"({len(raw_response_text)} симв.): {_debug_preview(raw_response_text)}"
         )
         response_text = raw_response_text.strip()
@@ -435,7 +460,8 @@ def handle_final_text(
             spinning=False,
         )
     except Exception as e:
-        log_message(f"ОШИБКА Gemini: {e}\n{traceback.format_exc()}")
+        log_message(f"ОШИБКА Gemini: {e}")
+        log_traceback()
         assistant.show_status(
             "Ошибка Gemini - вставляю Whisper", COLORS["btn_warning"], False
         )
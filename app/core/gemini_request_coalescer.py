@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Объединение одинаковых запросов к Gemini (single-flight) и короткая память ответов."""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+MEMO_TTL_S = 10.0
+MEMO_MAX_ITEMS = 16
+
+
+class _InflightCall:
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class GeminiRequestCoalescer:
+    """
+    Одинаковые запросы (модель, уровень thinking, хеш промпта), отправленные
+    одновременно, делят один сетевой вызов. Успешный ответ хранится MEMO_TTL_S
+    секунд, чтобы немедленный повтор вернулся сразу.
+    """
+
+    def __init__(
+        self,
+        cancelled_error_cls=Exception,
+        memo_ttl_s: float = MEMO_TTL_S,
+        memo_max_items: int = MEMO_MAX_ITEMS,
+        log_func: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.cancelled_error_cls = cancelled_error_cls
+        self.memo_ttl_s = memo_ttl_s
+        self.memo_max_items = memo_max_items
+        self.log = log_func or (lambda _msg: None)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._memo: "OrderedDict[tuple, Tuple[float, object]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(
+        model_name: str,
+        thinking_level: str,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+    ) -> tuple:
+        digest = hashlib.sha256()
+        digest.update((system_prompt or "").encode("utf-8"))
+        digest.update(b"\0")
+        digest.update((prompt or "").encode("utf-8"))
+        return (model_name, (thinking_level or "").upper(), digest.hexdigest())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memo.clear()
+
+    def run(self, key: tuple, func: Callable[[], object], cancel_check=None):
+        while True:
+            with self._lock:
+                memo_result = self._get_memo(key)
+                if memo_result is not None:
+                    self.log("Повтор запроса Gemini - ответ взят из памяти.")
+                    return memo_result
+                call = self._inflight.get(key)
+                is_leader = call is None
+                if is_leader:
+                    call = _InflightCall()
+                    self._inflight[key] = call
+
+            if is_leader:
+                return self._run_leader(key, call, func)
+
+            self.log("Такой же запрос Gemini уже выполняется - жду общий ответ.")
+            while not call.event.wait(0.1):
+                if cancel_check and cancel_check():
+                    raise self.cancelled_error_cls("Gemini generation cancelled")
+            if call.error is None:
+                return call.result
+            if isinstance(call.error, self.cancelled_error_cls):
+                # Отменили чужой запрос, а не наш - выполняем сами
+                continue
+            raise call.error
+
+    def _run_leader(self, key: tuple, call: _InflightCall, func):
+        try:
+            result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            call.result = result
+            with self._lock:
+                self._memo[key] = (time.monotonic() + self.memo_ttl_s, result)
+                self._memo.move_to_end(key)
+                while len(self._memo) > self.memo_max_items:
+                    self._memo.popitem(last=False)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+    def _get_memo(self, key: tuple):
+        entry = self._memo.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if time.monotonic() >= expires_at:
+            self._memo.pop(key, None)
+            return None
+        return result
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""Телеметрия запросов Gemini: токены, попытки и задержки (SQLite, кольцевой буфер)."""
+
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from statistics import median
+from typing import List, Optional, Tuple
+
+from app.core.app_config import TELEMETRY_FILE
+from app.utils.logging_utils import log_message
+
+MAX_ROWS = 5000
+# Обрезаем таблицу не на каждой вставке, а раз в TRIM_EVERY записей
+TRIM_EVERY = 100
+# Записи ждут фонового писателя; при переполнении новые отбрасываются
+WRITE_QUEUE_MAXSIZE = 1000
+_STOP = object()
+
+
+@dataclass
+class GeminiCallRecord:
+    kind: str
+    requested_model: str
+    model: str = ""
+    level: str = ""
+    attempts: int = 0
+    fallback_path: List[str] = field(default_factory=list)
+    status: str = "ok"  # ok | error | cancelled
+    # Время ответа последней попытки: generate_content не потоковый,
+    # поэтому это полная задержка вызова, а не время до первого байта
+    latency_s: Optional[float] = None
+    total_s: Optional[float] = None
+    prompt_chars: int = 0
+    prompt_tokens: Optional[int] = None
+    candidate_tokens: Optional[int] = None
+    thought_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    ts: float = field(default_factory=time.time)
+
+    def apply_usage(self, response) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        self.prompt_tokens = getattr(usage, "prompt_token_count", None)
+        self.candidate_tokens = getattr(usage, "candidates_token_count", None)
+        self.thought_tokens = getattr(usage, "thoughts_token_count", None)
+        self.cached_tokens = getattr(usage, "cached_content_token_count", None)
+        self.total_tokens = getattr(usage, "total_token_count", None)
+
+
+_COLUMNS = (
+    "ts",
+    "kind",
+    "requested_model",
+    "model",
+    "level",
+    "attempts",
+    "fallback_path",
+    "status",
+    "latency_s",
+    "total_s",
+    "prompt_chars",
+    "prompt_tokens",
+    "candidate_tokens",
+    "thought_tokens",
+    "cached_tokens",
+    "total_tokens",
+)
+
+
+class GeminiTelemetryStore:
+    """Append-only хранилище последних MAX_ROWS запросов с простой агрегацией."""
+
+    def __init__(
+        self,
+        db_path: str = TELEMETRY_FILE,
+        max_rows: int = MAX_ROWS,
+        log_func=log_message,
+    ) -> None:
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.log = log_func
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS gemini_calls (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts REAL NOT NULL,
+                    kind TEXT,
+                    requested_model TEXT,
+                    model TEXT,
+                    level TEXT,
+                    attempts INTEGER,
+                    fallback_path TEXT,
+                    status TEXT,
+                    latency_s REAL,
+                    total_s REAL,
+                    prompt_chars INTEGER,
+                    prompt_tokens INTEGER,
+                    candidate_tokens INTEGER,
+                    thought_tokens INTEGER,
+                    cached_tokens INTEGER,
+                    total_tokens INTEGER
+                )
+                """
+            )
+            self._rename_legacy_columns()
+            self._conn.commit()
+        except Exception as e:
+            self._conn = None
+            self.log(f"Телеметрия Gemini отключена: {e}")
+        self._queue: "queue.Queue" = queue.Queue(maxsize=WRITE_QUEUE_MAXSIZE)
+        self._writer: Optional[threading.Thread] = None
+        self.dropped = 0
+
+    def _rename_legacy_columns(self) -> None:
+        columns = {
+            row[1] for row in self._conn.execute("PRAGMA table_info(gemini_calls)")
+        }
+        if "ttfb_s" in columns and "latency_s" not in columns:
+            # Раньше задержка ответа хранилась под неверным именем ttfb_s
+            self._conn.execute(
+                "ALTER TABLE gemini_calls RENAME COLUMN ttfb_s TO latency_s"
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def record(self, record: GeminiCallRecord) -> None:
+        """Ставит запись в очередь: запрос не ждёт INSERT и commit."""
+        if self._conn is None:
+            return
+        values = asdict(record)
+        values["fallback_path"] = ">".join(record.fallback_path)
+        row = tuple(values[column] for column in _COLUMNS)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self._ensure_writer()
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Ждёт записи всего, что уже поставлено в очередь."""
+        if self._writer is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self) -> None:
+        writer = self._writer
+        if writer is not None and writer.is_alive():
+            self._queue.put(_STOP)
+            writer.join(timeout=2.0)
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            self._writer = threading.Thread(
+                target=self._write_loop, name="gemini-telemetry", daemon=True
+            )
+            self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            # Всё, что успело накопиться, пишем одной транзакцией
+            batch = [item]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [entry for entry in batch if isinstance(entry, tuple)]
+            if rows:
+                self._insert(rows)
+            for entry in batch:
+                if isinstance(entry, threading.Event):
+                    entry.set()
+            if any(entry is _STOP for entry in batch):
+                return
+
+    def _insert(self, rows: List[tuple]) -> None:
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        try:
+            with self._lock:
+                if self._conn is None:
+                    return
+                self._conn.executemany(
+                    f"INSERT INTO gemini_calls ({', '.join(_COLUMNS)}) "
+                    f"VALUES ({placeholders})",
+                    rows,
+                )
+                previous = self._inserts
+                self._inserts += len(rows)
+                if self._inserts // TRIM_EVERY != previous // TRIM_EVERY:
+                    self._conn.execute(
+                        "DELETE FROM gemini_calls WHERE id <= "
+                        "(SELECT MAX(id) FROM gemini_calls) - ?",
+                        (self.max_rows,),
+                    )
+                self._conn.commit()
+        except Exception as e:
+            self.log(f"Ошибка записи телеметрии Gemini: {e}")
+
+    def summarize(self, since_ts: Optional[float] = None) -> List[dict]:
+        """Сводка по (модель, уровень): число запросов, задержки и токены."""
+        rows = self._select(
+            "SELECT model, level, status, attempts, latency_s, total_s, prompt_tokens, "
+            "candidate_tokens, thought_tokens, cached_tokens FROM gemini_calls"
+            + (" WHERE ts >= ?" if since_ts is not None else ""),
+            (since_ts,) if since_ts is not None else (),
+        )
+        groups = {}
+        for (
+            model,
+            level,
+            status,
+            attempts,
+            latency_s,
+            total_s,
+            prompt_tokens,
+            candidate_tokens,
+            thought_tokens,
+            cached_tokens,
+        ) in rows:
+            group = groups.setdefault(
+                (model or "", level or ""),
+                {
+                    "model": model or "",
+                    "level": level or "",
+                    "count": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "latency": [],
+                    "total": [],
+                    "prompt_tokens": 0,
+                    "candidate_tokens": 0,
+                    "thought_tokens": 0,
+                    "cached_tokens": 0,
+                },
+            )
+            group["count"] += 1
+            if status != "ok":
+                group["errors"] += 1
+            group["retries"] += max(0, (attempts or 1) - 1)
+            if latency_s is not None:
+                group["latency"].append(latency_s)
+            if total_s is not None and status == "ok":
+                group["total"].append(total_s)
+            group["prompt_tokens"] += prompt_tokens or 0
+            group["candidate_tokens"] += candidate_tokens or 0
+            group["thought_tokens"] += thought_tokens or 0
+            group["cached_tokens"] += cached_tokens or 0
+
+        summary = []
+        for group in groups.values():
+            latency = sorted(group.pop("latency"))
+            total = sorted(group.pop("total"))
+            group["latency_median_s"] = median(latency) if latency else None
+            group["total_median_s"] = median(total) if total else None
+            group["total_p95_s"] = (
+                total[min(len(total) - 1, int(len(total) * 0.95))] if total else None
+            )
+            summary.append(group)
+        summary.sort(key=lambda item: item["count"], reverse=True)
+        return summary
+
+    def summary_lines(self, since_ts: Optional[float] = None) -> List[str]:
+        """Сводка summarize() построчно для лога."""
+        lines = []
+        for group in self.summarize(since_ts):
+            latency = group["latency_median_s"]
+            p95 = group["total_p95_s"]
+            lines.append(
+                f"{group['model'] or '?'} {group['level'] or '-'}: "
+                f"{group['count']} запр., ошибок {group['errors']}, "
+                f"повторов {group['retries']}, медиана "
+                f"{f'{latency:.2f}с' if latency is not None else '-'}, p95 "
+                f"{f'{p95:.2f}с' if p95 is not None else '-'}, токены "
+                f"{group['prompt_tokens']}/{group['candidate_tokens']}/"
+                f"{group['thought_tokens']} (кэш {group['cached_tokens']})"
+            )
+        return lines
+
+    def latency_samples(self, limit: int = 1000) -> List[Tuple[str, str, int, float]]:
+        """Успешные замеры (model, level, prompt_chars, latency_s) для адаптивной политики."""
+        rows = self._select(
+            "SELECT model, level, prompt_chars, latency_s FROM gemini_calls "
+            "WHERE status = 'ok' AND kind = 'dictation' AND latency_s IS NOT NULL "
+            "ORDER BY id DESC LIMIT ?",
+            (limit,),
+        )
+        return [tuple(row) for row in reversed(rows)]
+
+    def _select(self, sql: str, params: tuple) -> list:
+        if self._conn is None:
+            return []
+        try:
+            with self._lock:
+                return self._conn.execute(sql, params).fetchall()
+        except Exception as e:
+            self.log(f"Ошибка чтения телеметрии Gemini: {e}")
+            return []
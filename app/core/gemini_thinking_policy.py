@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""Адаптивный выбор thinking_level по длине текста и бюджету задержки."""
+
+import threading
+from collections import deque
+from statistics import median
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+LEVEL_ORDER = ("HIGH", "MEDIUM", "LOW", "MINIMAL")
+PRO_LEVELS = ("HIGH", "LOW")
+
+MAX_SAMPLES_PER_LEVEL = 200
+MIN_SAMPLES_FOR_ESTIMATE = 8
+
+# Значение настройки порога, при котором он подбирается по телеметрии
+AUTO = "auto"
+# Пороги до накопления замеров
+DEFAULT_SHORT_CHARS = 80
+DEFAULT_LONG_CHARS = 600
+# Короткий текст: thinking базового уровня занимает не меньше этой доли
+# времени ответа, и понижение уровня ускоряет ответ хотя бы вдвое
+SHORT_THINKING_SHARE = 0.5
+# Диапазон и шаг перебора длины промпта при подборе порогов
+TUNE_SCAN_MAX_CHARS = 8000
+TUNE_SCAN_STEP = 20
+
+
+class AdaptiveThinkingPolicy:
+    """
+    Короткие фразы и жёсткий бюджет задержки понижают уровень thinking,
+    длинные тексты и правка выделения сохраняют уровень из настроек.
+    Оценка задержки строится по замерам для каждой пары (модель, уровень):
+    линейная зависимость времени ответа от длины промпта. По тем же оценкам
+    подбираются пороги <короткого> и <длинного> текста, если в настройках
+    вместо числа указано "auto".
+    """
+
+    def __init__(
+        self,
+        max_samples: int = MAX_SAMPLES_PER_LEVEL,
+        min_samples: int = MIN_SAMPLES_FOR_ESTIMATE,
+    ) -> None:
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple[str, str], deque] = {}
+
+    def record(
+        self, model_name: str, level: str, prompt_chars: int, seconds: float
+    ) -> None:
+        if not model_name or not level or seconds is None or seconds < 0:
+            return
+        key = (model_name, level.upper())
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = deque(maxlen=self.max_samples)
+                self._samples[key] = samples
+            samples.append((max(0, int(prompt_chars or 0)), float(seconds)))
+
+    def load_samples(self, samples: Iterable[Tuple[str, str, int, float]]) -> int:
+        """Загружает исторические замеры (model, level, prompt_chars, seconds)."""
+        count = 0
+        for model_name, level, prompt_chars, seconds in samples:
+            self.record(model_name, level, prompt_chars, seconds)
+            count += 1
+        return count
+
+    def estimate_latency(
+        self, model_name: str, level: str, prompt_chars: int
+    ) -> Optional[float]:
+        fit = self._fit(model_name, level)
+        if fit is None:
+            return None
+        intercept, slope = fit
+        return max(0.0, intercept + slope * prompt_chars)
+
+    def _fit(self, model_name: str, level: str) -> Optional[Tuple[float, float]]:
+        """(intercept, slope) линейной оценки задержки или None без замеров."""
+        with self._lock:
+            samples = list(self._samples.get((model_name, level.upper()), ()))
+        if len(samples) < self.min_samples:
+            return None
+        xs = [chars for chars, _ in samples]
+        ys = [seconds for _, seconds in samples]
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        if var_x <= 0:
+            return median(ys), 0.0
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+        slope = max(0.0, slope)
+        return mean_y - slope * mean_x, slope
+
+    def choose(
+        self,
+        model_name: str,
+        base_level: str,
+        text_chars: int,
+        prompt_chars: int,
+        settings: dict,
+        use_selection: bool = False,
+        allowed_levels: Optional[Sequence[str]] = None,
+    ) -> Tuple[str, str]:
+        """Возвращает (уровень, причина) не выше base_level."""
+        base = (base_level or "HIGH").upper()
+        if not settings.get("gemini_adaptive_thinking", True):
+            return base, "адаптивный режим выключен"
+
+        candidates = self._candidate_levels(model_name, base, allowed_levels)
+        if not candidates:
+            return base, "нет уровней ниже заданного"
+
+        if use_selection:
+            return base, "правка выделенного текста"
+        budget = float(settings.get("gemini_latency_budget_s", 0) or 0)
+        (short_chars, short_tuned), (long_chars, long_tuned) = self._thresholds(
+            model_name, base, candidates[-1], budget, settings
+        )
+        long_length = prompt_chars if long_tuned else text_chars
+        if long_chars and long_length >= long_chars:
+            source = "по телеметрии" if long_tuned else "из настроек"
+            return base, f"длинный текст ({long_length} >= {long_chars} симв., {source})"
+        short_length = prompt_chars if short_tuned else text_chars
+        if short_chars and short_length <= short_chars:
+            source = "по телеметрии" if short_tuned else "из настроек"
+            return (
+                candidates[-1],
+                f"короткий текст ({short_length} <= {short_chars} симв., {source})",
+            )
+
+        if budget <= 0:
+            return base, "бюджет задержки не задан"
+
+        for level in candidates:
+            estimate = self.estimate_latency(model_name, level, prompt_chars)
+            if estimate is None:
+                if level == base:
+                    return base, "нет замеров задержки"
+                continue
+            if estimate <= budget:
+                return level, f"оценка {estimate:.1f}с <= бюджета {budget:.1f}с"
+        return candidates[-1], f"все уровни дольше бюджета {budget:.1f}с"
+
+    def tune_thresholds(
+        self, model_name: str, base_level: str, low_level: str, budget_s: float
+    ) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Подбирает (short_chars, long_chars) по оценкам задержки базового и
+        самого низкого уровня. Короткий - до первой длины, на которой thinking
+        перестаёт занимать SHORT_THINKING_SHARE времени ответа базового уровня.
+        Длинный - с длины, на которой даже низкий уровень не укладывается в
+        бюджет: понижение качества там уже не окупается. Короткий порог всегда
+        меньше длинного. None - замеров недостаточно или порог не найден.
+        """
+        if base_level == low_level:
+            return None, None
+        base_fit = self._fit(model_name, base_level)
+        low_fit = self._fit(model_name, low_level)
+        if base_fit is None or low_fit is None:
+            return None, None
+        short_chars = None
+        long_chars = None
+        short_done = False
+        for chars in range(0, TUNE_SCAN_MAX_CHARS + 1, TUNE_SCAN_STEP):
+            base_s = max(0.0, base_fit[0] + base_fit[1] * chars)
+            low_s = max(0.0, low_fit[0] + low_fit[1] * chars)
+            if budget_s > 0 and low_s > budget_s:
+                long_chars = chars
+                break
+            if short_done:
+                continue
+            if base_s > 0 and (base_s - low_s) / base_s >= SHORT_THINKING_SHARE:
+                short_chars = chars
+                continue
+            short_done = True
+            if budget_s <= 0:
+                break
+        return short_chars, long_chars
+
+    def _thresholds(
+        self,
+        model_name: str,
+        base: str,
+        low_level: str,
+        budget_s: float,
+        settings: dict,
+    ) -> Tuple[Tuple[int, bool], Tuple[int, bool]]:
+        """
+        ((short, подобран), (long, подобран)); 0 - порог выключен. Подобранный
+        порог измеряется в символах промпта, заданный в настройках - текста.
+        """
+        tuned = None
+        thresholds = []
+        for key, default in (
+            ("gemini_adaptive_short_chars", DEFAULT_SHORT_CHARS),
+            ("gemini_adaptive_long_chars", DEFAULT_LONG_CHARS),
+        ):
+            value = settings.get(key, AUTO)
+            if value not in (None, AUTO):
+                try:
+                    thresholds.append((int(value or 0), False))
+                except (TypeError, ValueError):
+                    thresholds.append((default, False))
+                continue
+            if tuned is None:
+                tuned = self.tune_thresholds(model_name, base, low_level, budget_s)
+            value = tuned[len(thresholds)]
+            if value is None:
+                # Замеров мало или порог не найден: значение по умолчанию
+                # в символах текста
+                thresholds.append((default, False))
+            else:
+                thresholds.append((value, True))
+        return thresholds[0], thresholds[1]
+
+    @staticmethod
+    def _candidate_levels(
+        model_name: str, base: str, allowed_levels: Optional[Sequence[str]]
+    ) -> Tuple[str, ...]:
+        family = PRO_LEVELS if model_name and "pro" in model_name.lower() else LEVEL_ORDER
+        if base not in family:
+            return ()
+        levels = family[family.index(base):]
+        if allowed_levels:
+            allowed = {level.upper() for level in allowed_levels}
+            levels = tuple(level for level in levels if level in allowed)
+        return tuple(levels)
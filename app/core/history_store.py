@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Индексированная история диктовок (SQLite + FTS5 trigram). Последние N записей
+читаются по первичному ключу без разбора всего файла, полнотекстовый поиск
+идёт по всей истории. Старый speech_history.txt (с ротациями .1/.2)
+переносится в базу один раз.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from app.core.app_config import HISTORY_DB_FILE, HISTORY_FILE
+from app.utils.logging_utils import log_message
+
+# Сколько файлов ротации держит history_logger (backupCount)
+LEGACY_BACKUP_COUNT = 2
+# Размер пачки вставок при переносе старого файла
+MIGRATION_BATCH = 1000
+MIN_FTS_TERM_LEN = 3
+_ENTRY_SPLIT_RE = re.compile(r"\n---\n?")
+
+
+@dataclass(frozen=True)
+class HistoryEntry:
+    id: int
+    ts: str
+    text: str
+
+
+def fold_text(text: str) -> str:
+    return (text or "").lower().replace("ё", "е")
+
+
+def search_terms(query: str) -> List[str]:
+    """Слова запроса в том виде, в каком они ищутся (и подсвечиваются)."""
+    return [term for term in fold_text(query).replace('"', " ").split() if term]
+
+
+def parse_history_text(content: str) -> List[Tuple[str, str]]:
+    """Разбирает формат history_logger: "время\\nтекст\\n---". Возвращает [(время, текст)]."""
+    entries = []
+    for chunk in _ENTRY_SPLIT_RE.split((content or "").strip()):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        lines = chunk.split("\n", 1)
+        if len(lines) < 2:
+            continue
+        text = lines[1].strip()
+        if text:
+            entries.append((lines[0].strip(), text))
+    return entries
+
+
+def legacy_history_files(path: str = HISTORY_FILE) -> List[str]:
+    """Файлы старой истории от самого давнего к новому: .2, .1, основной."""
+    candidates = [f"{path}.{i}" for i in range(LEGACY_BACKUP_COUNT, 0, -1)] + [path]
+    return [candidate for candidate in candidates if os.path.exists(candidate)]
+
+
+class HistoryStore:
+    """
+    Таблица entries(id, ts, text, text_fold) и внешний FTS5-индекс по text_fold.
+    Без FTS5/trigram (SQLite < 3.34) поиск идёт через LIKE. Порядок записей -
+    по id: новые записи всегда получают больший id.
+    """
+
+    def __init__(
+        self,
+        db_path: str = HISTORY_DB_FILE,
+        legacy_file: Optional[str] = HISTORY_FILE,
+        log_func=log_message,
+    ) -> None:
+        self.db_path = db_path
+        self.legacy_file = legacy_file
+        self.log = log_func
+        self._lock = threading.Lock()
+        self._fts = False
+        self._conn: Optional[sqlite3.Connection] = None
+        try:
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    text_fold TEXT NOT NULL
+                );
+                """
+            )
+            self._fts = self._ensure_fts(conn)
+            conn.commit()
+            self._conn = conn
+        except Exception as e:
+            self._conn = None
+            self.log(f"Индекс истории отключён: {e}")
+            return
+        self._migrate_legacy()
+
+    @staticmethod
+    def _ensure_fts(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.executescript(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                    text_fold, content='entries', content_rowid='id', tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+                    INSERT INTO entries_fts(rowid, text_fold) VALUES (new.id, new.text_fold);
+                END;
+                CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+                    INSERT INTO entries_fts(entries_fts, rowid, text_fold)
+                    VALUES ('delete', old.id, old.text_fold);
+                END;
+                """
+            )
+            return True
+        except sqlite3.OperationalError:
+            # SQLite без FTS5/trigram: ищем через LIKE
+            return False
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    # --- Запись ---
+
+    def append(self, text: str, ts: str) -> Optional[int]:
+        """Добавляет запись и возвращает её id (None, если база недоступна)."""
+        text = (text or "").strip()
+        if self._conn is None or not text:
+            return None
+        with self._lock:
+            if self._conn is None:
+                return None
+            cursor = self._conn.execute(
+                "INSERT INTO entries (ts, text, text_fold) VALUES (?, ?, ?)",
+                (ts, text, fold_text(text)),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def clear(self) -> None:
+        if self._conn is None:
+            return
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.execute("DELETE FROM entries")
+            if self._fts:
+                self._conn.execute(
+                    "INSERT INTO entries_fts(entries_fts) VALUES ('delete-all')"
+                )
+            self._conn.commit()
+
+    # --- Чтение ---
+
+    def latest(self, limit: int = 10) -> List[HistoryEntry]:
+        """Последние limit записей, новые первыми."""
+        return self._select(
+            "SELECT id, ts, text FROM entries ORDER BY id DESC LIMIT ?", (int(limit),)
+        )
+
+    def count(self) -> int:
+        if self._conn is None:
+            return 0
+        with self._lock:
+            if self._conn is None:
+                return 0
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def search(
+        self, query: str, limit: int = 50, before_id: Optional[int] = None
+    ) -> List[HistoryEntry]:
+        """
+        Записи, содержащие все слова запроса, новые первыми. Следующая
+        страница запрашивается с before_id = id последней полученной записи.
+        Пустой запрос возвращает историю целиком.
+        """
+        where: List[str] = []
+        params: List[object] = []
+        fts_terms = []
+        for term in search_terms(query):
+            if self._fts and len(term) >= MIN_FTS_TERM_LEN:
+                fts_terms.append(f'"{term}"')
+            else:
+                where.append("e.text_fold LIKE ? ESCAPE '\\'")
+                escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                params.append(f"%{escaped}%")
+
+        if fts_terms:
+            # Идём по rowid FTS-индекса в обратном порядке: LIMIT останавливает
+            # обход на первой странице, а не после сбора всех совпадений.
+            # Граница страницы тоже ставится на f.rowid, чтобы FTS5 сразу
+            # перешёл к ней, а не перебирал все более новые совпадения
+            sql = (
+                "SELECT e.id, e.ts, e.text FROM entries_fts f "
+                "JOIN entries e ON e.id = f.rowid WHERE entries_fts MATCH ?"
+            )
+            params.insert(0, " ".join(fts_terms))
+            if before_id is not None:
+                where.insert(0, "f.rowid < ?")
+                params.insert(1, int(before_id))
+            order = " ORDER BY f.rowid DESC"
+            if where:
+                sql += " AND " + " AND ".join(where)
+        else:
+            if before_id is not None:
+                where.append("e.id < ?")
+                params.append(int(before_id))
+            sql = "SELECT e.id, e.ts, e.text FROM entries e"
+            order = " ORDER BY e.id DESC"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+        params.append(int(limit))
+        return self._select(sql + order + " LIMIT ?", tuple(params))
+
+    def _select(self, sql: str, params: tuple) -> List[HistoryEntry]:
+        if self._conn is None:
+            return []
+        try:
+            with self._lock:
+                if self._conn is None:
+                    return []
+                rows = self._conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            self.log(f"Ошибка чтения истории: {e}")
+            return []
+        return [HistoryEntry(*row) for row in rows]
+
+    # --- Перенос старого файла ---
+
+    def _migrate_legacy(self) -> None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'legacy_migrated'"
+            ).fetchone()
+        if row is not None or not self.legacy_file:
+            return
+        files = legacy_history_files(self.legacy_file)
+        try:
+            imported = self._import_entries(_iter_legacy_entries(files))
+        except Exception as e:
+            # Флаг не ставим: перенос повторится при следующем запуске
+            self.log(f"Не удалось перенести историю из {self.legacy_file}: {e}")
+            return
+        if imported:
+            self.log(f"История перенесена в индекс: {imported} записей из {len(files)} файлов")
+
+    def _import_entries(self, entries: Iterable[Tuple[str, str]]) -> int:
+        imported = 0
+        batch = []
+        with self._lock:
+            conn = self._conn
+            try:
+                # Одна транзакция: прерванный перенос не оставит половину истории
+                for ts, text in entries:
+                    batch.append((ts, text, fold_text(text)))
+                    if len(batch) >= MIGRATION_BATCH:
+                        conn.executemany(
+                            "INSERT INTO entries (ts, text, text_fold) VALUES (?, ?, ?)",
+                            batch,
+                        )
+                        imported += len(batch)
+                        batch = []
+                if batch:
+                    conn.executemany(
+                        "INSERT INTO entries (ts, text, text_fold) VALUES (?, ?, ?)",
+                        batch,
+                    )
+                    imported += len(batch)
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_migrated', '1')"
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return imported
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+
+
+def _iter_legacy_entries(files: Iterable[str]):
+    for path in files:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            content = f.read()
+        yield from parse_history_text(content)
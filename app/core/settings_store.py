@@ -138,6 +138,15 @@ class SettingsStore:
             settings["gemini3_flash_thinking_level"] = "high"
             extra_updated = True
 
+        # Прежние фиксированные пороги адаптивного thinking -> подбор по телеметрии
+        if (
+            settings.get("gemini_adaptive_short_chars") == 80
+            and settings.get("gemini_adaptive_long_chars") == 600
+        ):
+            settings["gemini_adaptive_short_chars"] = "auto"
+            settings["gemini_adaptive_long_chars"] = "auto"
+            extra_updated = True
+
         # Cleanup old 2.5 settings
         if "gemini25_flash_mode" in settings:
             settings.pop("gemini25_flash_mode")
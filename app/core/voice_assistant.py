@@ -10,18 +10,22 @@ from app.core.app_config import (
     COLORS,
     EXE_DIR,
     LANGUAGE,
+    LOCAL_INDEX_DEFAULT_FOLDERS,
+    LOCAL_INDEX_FILE,
     WHISPER_MODELS_DIR,
     format_path_for_log,
 )
 from app.core.gemini_client import GeminiClientManager
+from app.core.history_store import HistoryStore
 from app.core.settings_store import SettingsStore
 from app.core.voice_assistant_audio import VoiceAssistantAudioMixin
 from app.core.voice_assistant_commands import VoiceAssistantCommandMixin
 from app.core.voice_assistant_output import VoiceAssistantOutputMixin
+from app.services.everything_local_index import LocalFileIndex
 from app.services.everything_search import EverythingSearchHandler
 from app.services.vless_manager import VLESSManager
 from app.speech.whisper_engine import WhisperEngine
-from app.utils.logging_utils import log_message
+from app.utils.logging_utils import log_message, set_log_level
 
 
 class VoiceAssistant(
@@ -50,6 +54,7 @@ class VoiceAssistant(
         self._cancel_pending = threading.Event()
         self.settings_store = SettingsStore()
         self.settings = self.settings_store.load_settings()
+        set_log_level(self.settings.get("log_level"))
         self.gemini_manager = GeminiClientManager(log_func=log_message)
         if self.gemini_manager.supports_thinking_level:
             log_message(
@@ -65,6 +70,7 @@ class VoiceAssistant(
         log_message(f"VLESS VPN инициализирован на порту: {vless_port}")
         # Модуль поиска через Everything
         self.search_handler = EverythingSearchHandler(log_message)
+        self.search_handler.telemetry = self.gemini_manager.telemetry
         self.search_handler.instance_name = (
             self.settings.get("everything_instance_name") or None
         )
@@ -72,7 +78,10 @@ class VoiceAssistant(
             self.settings.get("everything_previous_instance") or None
         )
         self.update_everything_paths(self.settings.get("everything_dir", ""))
+        self.setup_local_index()
         self.command_router = CommandRouter(self, log_func=log_message)
+        # История диктовок с полнотекстовым индексом
+        self.history_store = HistoryStore(log_func=log_message)
         self._everything_warmup_complete = False
         self._everything_warmup_in_progress = False
         self._everything_warmup_pending = False
@@ -139,10 +148,47 @@ class VoiceAssistant(
         if self._everything_warmup_complete:
             self._emit_everything_status_refresh()
 
+    def setup_local_index(self):
+        """
+        Готовит локальный индекс файлов для поиска без Everything. Обход
+        начинается, только когда Everything оказался недоступен.
+        """
+        if self.search_handler.local_index is not None:
+            self.search_handler.local_index.close()
+            self.search_handler.local_index = None
+        if not self.settings.get("local_index_enabled", True):
+            return
+        roots = [
+            root
+            for root in (self.settings.get("local_index_roots") or [])
+            if root and os.path.isdir(root)
+        ] or [
+            path
+            for path in (
+                os.path.join(os.path.expanduser("~"), folder)
+                for folder in LOCAL_INDEX_DEFAULT_FOLDERS
+            )
+            if os.path.isdir(path)
+        ]
+        if not roots:
+            log_message("Локальный индекс файлов: нет папок для индексации.")
+            return
+        refresh_min = float(self.settings.get("local_index_refresh_min", 30) or 30)
+        index = LocalFileIndex(
+            LOCAL_INDEX_FILE,
+            roots,
+            log_func=log_message,
+            refresh_interval_s=max(60.0, refresh_min * 60.0),
+        )
+        self.search_handler.local_index = index
+        roots_label = ", ".join(format_path_for_log(root) or root for root in roots)
+        log_message(f"Локальный индекс файлов (запасной): {roots_label}")
+
     def _warmup_everything(self, force_start: bool = False):
         try:
             if not os.path.exists(self.search_handler.es_path):
                 log_message("es.exe не найден, автозапуск Everything пропущен.")
+                self.search_handler.start_local_index()
                 return
             if self.search_handler.ensure_everything_running(
                 timeout_s=10.0, force_start=force_start
@@ -150,6 +196,7 @@ class VoiceAssistant(
                 log_message("Everything готов к поиску.")
             else:
                 log_message("Everything недоступен. Поиск может не работать.")
+                self.search_handler.start_local_index()
         finally:
             self._everything_warmup_complete = True
             self._emit_everything_status_refresh()
@@ -2,14 +2,13 @@
 """Вывод результата и вспомогательные операции."""
 
 import os
-import re
 import subprocess
 import sys
 import traceback
 
 from app.core.app_config import COLORS, HISTORY_FILE, LOG_FILE
-from app.utils import logging_utils
-from app.utils.logging_utils import log_message, reset_logger
+from app.core.history_store import parse_history_text
+from app.utils.logging_utils import log_message, reset_logger, stop_logging
 
 
 class VoiceAssistantOutputMixin:
@@ -43,32 +42,27 @@ class VoiceAssistantOutputMixin:
             normalized = min(100, max(0, int((volume_level / 5000) * 100)))
             self.ui_signals.volume_changed.emit(normalized)
 
-    def load_history_to_combo(self):
-        """Загрузка истории для комбобокса."""
+    def load_history_to_combo(self, limit: int = 10):
+        """Загрузка последних записей истории для комбобокса."""
         items = []
         try:
-            if os.path.exists(HISTORY_FILE):
+            store = getattr(self, "history_store", None)
+            if store is not None and store.enabled:
+                entries = [(entry.ts, entry.text) for entry in store.latest(limit)]
+            elif os.path.exists(HISTORY_FILE):
+                # Индекс недоступен: разбираем текстовый файл, как раньше
                 with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                    content = f.read()
-
-                entries = re.split(r"\n---\n?", content.strip())
-
-                for entry in reversed(entries[-10:]):
-                    entry = entry.strip()
-                    if not entry:
-                        continue
-
-                    lines = entry.split("\n", 1)
-                    if len(lines) >= 2:
-                        timestamp = lines[0].strip()
-                        text = lines[1].strip()
-
-                        display_text = text.replace("\n", " ")
-                        display = (
-                            f"{timestamp} - "
-                            f"{display_text[:50]}{'...' if len(display_text) > 50 else ''}"
-                        )
-                        items.append((display, text))
+                    entries = parse_history_text(f.read())[-limit:][::-1]
+            else:
+                entries = []
+
+            for timestamp, text in entries:
+                display_text = text.replace("\n", " ")
+                display = (
+                    f"{timestamp} - "
+                    f"{display_text[:50]}{'...' if len(display_text) > 50 else ''}"
+                )
+                items.append((display, text))
         except Exception as e:
             log_message(f"Ошибка загрузки истории: {e}")
 
@@ -77,10 +71,8 @@ class VoiceAssistantOutputMixin:
     def clear_log_file(self, silent: bool = False):
         """Очистка файла логов; silent=True - без служебной записи в лог."""
         try:
-            # Закрываем и удаляем текущие обработчики
-            for handler in list(logging_utils.logger.handlers):
-                handler.close()
-                logging_utils.logger.removeHandler(handler)
+            # Дописываем очередь и закрываем файл логов
+            stop_logging()
 
             # Перезаписываем файл
             with open(LOG_FILE, "w", encoding="utf-8", errors="replace") as f:
@@ -99,6 +91,9 @@ class VoiceAssistantOutputMixin:
         try:
             with open(HISTORY_FILE, "w", encoding="utf-8") as f:
                 f.write("")
+            store = getattr(self, "history_store", None)
+            if store is not None:
+                store.clear()
             log_message("Файл истории очищен")
             if self.ui_signals:
                 self.ui_signals.history_updated.emit()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""Бэкенды поиска Everything: SDK (ctypes) и внутрипроцессная подделка для тестов."""
+
+import ctypes
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from app.services.everything_models import EverythingSearchSpec
+from app.services.everything_paths import format_path_for_log
+
+# Константы Everything SDK (Everything.h)
+EVERYTHING_OK = 0
+EVERYTHING_ERROR_IPC = 2
+EVERYTHING_REQUEST_FILE_NAME = 0x00000001
+EVERYTHING_REQUEST_PATH = 0x00000002
+EVERYTHING_REQUEST_FULL_PATH_AND_FILE_NAME = 0x00000004
+EVERYTHING_SORT_NAME_ASCENDING = 1
+
+_SDK_ERRORS = {
+    1: "недостаточно памяти",
+    2: "IPC: Everything не запущен",
+    3: "не удалось зарегистрировать класс окна",
+    4: "не удалось создать окно",
+    5: "не удалось создать поток",
+    6: "неверный индекс",
+    7: "неверный вызов",
+}
+
+
+class EverythingBackend(ABC):
+    """
+    Интерфейс бэкенда поиска. search() возвращает итератор полных путей,
+    чтобы потребитель мог прекратить чтение, как только нашёл нужное.
+    """
+
+    name = "base"
+
+    def __init__(self) -> None:
+        self.last_error = ""
+
+    def is_available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def search(
+        self, spec: EverythingSearchSpec, stop_event: Optional[threading.Event] = None
+    ) -> Iterator[str]:
+        """Итератор полных путей; реализуется каждым бэкендом."""
+
+    def close(self) -> None:
+        pass
+
+
+def build_sdk_search_text(spec: EverythingSearchSpec) -> str:
+    """Переводит спецификацию в синтаксис поиска Everything."""
+    terms: List[str] = []
+    if spec.drive:
+        terms.append(f"{spec.drive.upper()}:\\")
+    if spec.target_type == "folder":
+        terms.append("folder:")
+    elif spec.target_type == "file":
+        terms.append("file:")
+    if spec.extensions:
+        terms.append(f"ext:{spec.extensions}")
+    if spec.text:
+        if spec.regex:
+            terms.append(f'regex:"{spec.text}"')
+        else:
+            terms.append(spec.text)
+    return " ".join(terms)
+
+
+class EverythingSdkBackend(EverythingBackend):
+    """
+    Поиск через Everything SDK (Everything64.dll) без запуска es.exe.
+    DLL загружается один раз и держит IPC-соединение с Everything.
+    SDK 2 работает только с экземпляром по умолчанию, поэтому для именованного
+    экземпляра бэкенд считается недоступным.
+    """
+
+    name = "sdk"
+
+    def __init__(
+        self, dll_path: str, instance_name: Optional[str] = None, log_func=None
+    ) -> None:
+        super().__init__()
+        self.dll_path = dll_path
+        self.instance_name = instance_name
+        self.log = log_func or (lambda _msg: None)
+        self._dll = None
+        self._load_error = ""
+        # Состояние запроса в DLL глобальное - сериализуем обращения
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        if self.instance_name:
+            return False
+        return self._load() is not None
+
+    def _load(self):
+        if self._dll is not None or self._load_error:
+            return self._dll
+        if os.name != "nt" or not self.dll_path or not os.path.exists(self.dll_path):
+            self._load_error = "Everything SDK недоступен"
+            return None
+        try:
+            dll = ctypes.WinDLL(self.dll_path)
+            dll.Everything_SetSearchW.argtypes = [ctypes.c_wchar_p]
+            dll.Everything_SetRegex.argtypes = [ctypes.c_int]
+            dll.Everything_SetMax.argtypes = [ctypes.c_uint32]
+            dll.Everything_SetSort.argtypes = [ctypes.c_uint32]
+            dll.Everything_SetRequestFlags.argtypes = [ctypes.c_uint32]
+            dll.Everything_QueryW.argtypes = [ctypes.c_int]
+            dll.Everything_QueryW.restype = ctypes.c_int
+            dll.Everything_GetNumResults.restype = ctypes.c_uint32
+            dll.Everything_GetLastError.restype = ctypes.c_uint32
+            dll.Everything_GetResultFullPathNameW.argtypes = [
+                ctypes.c_uint32,
+                ctypes.c_wchar_p,
+                ctypes.c_uint32,
+            ]
+            dll.Everything_GetResultFullPathNameW.restype = ctypes.c_uint32
+        except Exception as e:
+            self._load_error = f"не удалось загрузить Everything SDK: {e}"
+            self.log(self._load_error)
+            return None
+        self._dll = dll
+        path_label = format_path_for_log(self.dll_path) or str(self.dll_path)
+        self.log(f"Everything SDK загружен: {path_label}")
+        return dll
+
+    def search(
+        self, spec: EverythingSearchSpec, stop_event: Optional[threading.Event] = None
+    ) -> Iterator[str]:
+        dll = self._load()
+        if dll is None:
+            self.last_error = self._load_error
+            return
+        search_text = build_sdk_search_text(spec)
+        with self._lock:
+            dll.Everything_SetSearchW(search_text)
+            dll.Everything_SetRegex(0)
+            dll.Everything_SetMax(spec.max_results)
+            dll.Everything_SetSort(EVERYTHING_SORT_NAME_ASCENDING)
+            dll.Everything_SetRequestFlags(
+                EVERYTHING_REQUEST_FILE_NAME
+                | EVERYTHING_REQUEST_PATH
+                | EVERYTHING_REQUEST_FULL_PATH_AND_FILE_NAME
+            )
+            if not dll.Everything_QueryW(1):
+                code = dll.Everything_GetLastError()
+                self.last_error = _SDK_ERRORS.get(code, f"код {code}")
+                self.log(f"Everything SDK ({spec.label}): {self.last_error}")
+                return
+            self.last_error = ""
+            count = dll.Everything_GetNumResults()
+            buffer = ctypes.create_unicode_buffer(32768)
+            paths = []
+            for index in range(count):
+                length = dll.Everything_GetResultFullPathNameW(
+                    index, buffer, len(buffer)
+                )
+                if length:
+                    paths.append(buffer.value)
+        for path in paths:
+            if stop_event is not None and stop_event.is_set():
+                return
+            yield path
+
+    def close(self) -> None:
+        dll = self._dll
+        self._dll = None
+        if dll is not None:
+            try:
+                dll.Everything_CleanUp()
+            except Exception:
+                pass
+
+
+EntryLike = Union[str, Tuple[str, bool]]
+
+
+class FakeEverythingBackend(EverythingBackend):
+    """
+    Внутрипроцессный бэкенд над списком путей. Нужен для тестов на Linux:
+    повторяет семантику es.exe (совпадение по имени, /ad и /a-d, ext:, -path).
+    """
+
+    name = "fake"
+
+    def __init__(self, entries: Iterable[EntryLike] = ()) -> None:
+        super().__init__()
+        self.entries: List[Tuple[str, bool]] = []
+        self.queries: List[EverythingSearchSpec] = []
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: EntryLike) -> None:
+        if isinstance(entry, tuple):
+            path, is_dir = entry
+        else:
+            path, is_dir = entry.rstrip("\\/"), entry.endswith(("\\", "/"))
+        self.entries.append((path, bool(is_dir)))
+
+    def search(
+        self, spec: EverythingSearchSpec, stop_event: Optional[threading.Event] = None
+    ) -> Iterator[str]:
+        self.queries.append(spec)
+        matcher = self._build_matcher(spec)
+        extensions = (
+            {ext.lower() for ext in spec.extensions.split(";") if ext}
+            if spec.extensions
+            else None
+        )
+        drive_prefix = f"{spec.drive.lower()}:\\" if spec.drive else None
+        matches = []
+        for path, is_dir in self.entries:
+            if spec.target_type == "folder" and not is_dir:
+                continue
+            if spec.target_type == "file" and is_dir:
+                continue
+            if drive_prefix and not path.lower().startswith(drive_prefix):
+                continue
+            name = re.split(r"[\\/]", path)[-1]
+            if extensions is not None:
+                ext = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+                if ext not in extensions:
+                    continue
+            if matcher(name):
+                matches.append((name.lower(), path))
+        matches.sort()
+        for _, path in matches[: spec.max_results]:
+            if stop_event is not None and stop_event.is_set():
+                return
+            yield path
+
+    @staticmethod
+    def _build_matcher(spec: EverythingSearchSpec):
+        if not spec.text:
+            return lambda _name: True
+        if spec.regex:
+            compiled = re.compile(spec.text, flags=re.IGNORECASE)
+            return lambda name: bool(compiled.search(name))
+        words = [w.lower() for w in spec.text.split()]
+        return lambda name: all(word in name.lower() for word in words)
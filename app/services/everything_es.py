@@ -2,13 +2,35 @@ import locale
 import os
 import subprocess
 import tempfile
+import threading
 import traceback
-from typing import List, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional
 
-from app.services.everything_models import SearchQuery
+from app.services.everything_backends import EverythingBackend
+from app.services.everything_match import is_unbeatable_match
+from app.services.everything_models import CompiledQuery, EverythingSearchSpec
 from app.services.everything_paths import format_path_for_log
 
 
+# regex и plain выполняются параллельно; пул общий, чтобы не плодить потоки
+SEARCH_POOL_WORKERS = 2
+# Сколько ждать выхода es.exe после конца вывода, чтобы получить код возврата
+ES_EXIT_TIMEOUT_S = 2.0
+_search_pool: Optional[ThreadPoolExecutor] = None
+_search_pool_lock = threading.Lock()
+
+
+def _get_search_pool() -> ThreadPoolExecutor:
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is None:
+            _search_pool = ThreadPoolExecutor(
+                max_workers=SEARCH_POOL_WORKERS, thread_name_prefix="everything-search"
+            )
+        return _search_pool
+
+
 def build_es_base_args(es_path: str, instance_name: Optional[str]) -> List[str]:
     args = [es_path]
     if instance_name:
@@ -35,82 +57,216 @@ def format_args_for_log(args: List[str]) -> List[str]:
     return formatted
 
 
-def run_es_search(
-    log_func,
-    es_path: str,
-    instance_name: Optional[str],
-    pattern: Optional[str],
-    query: SearchQuery,
-) -> List[str]:
+def build_search_specs(query: CompiledQuery) -> List[EverythingSearchSpec]:
     """
-    Запускает es.exe и читает результаты из временного файла в UTF-8 (с BOM),
-    чтобы избежать проблем с кодировками stdout. Делает два запроса:
+    Делает два запроса:
     1) regex (фаззи по правилам)
     2) прямой текстовый (для точных совпадений вроде 'Развитие' или 'Portable Soft')
     """
-    base_args = build_es_base_args(es_path, instance_name)
-    if query.drive:
-        base_args += ["-path", f"{query.drive}:\\"]
-
-    type_flag = (
-        "/ad"
-        if query.target_type == "folder"
-        else "/a-d"
-        if query.target_type == "file"
-        else None
+    target_type = query.target_type if query.target_type in ("folder", "file") else None
+    specs = []
+    if query.regex:
+        specs.append(
+            EverythingSearchSpec(
+                label="regex",
+                text=query.regex,
+                regex=True,
+                target_type=target_type,
+                extensions=query.extensions,
+                drive=query.drive,
+            )
+        )
+    # Прямой поиск: имя + ext-фильтр (или только ext-фильтр)
+    specs.append(
+        EverythingSearchSpec(
+            label="plain",
+            text=(query.name or "").strip(),
+            target_type=target_type,
+            extensions=query.extensions,
+            drive=query.drive,
+        )
     )
-    searches = []
+    return specs
 
-    # Добавляем расширения как фильтр ext:
-    ext_filter = f"ext:{query.extensions}" if query.extensions else ""
 
-    if pattern:
-        regex_args = base_args + ["-r", pattern, "-n", "30", "-sort", "name-ascending"]
+def build_es_args(
+    es_path: str, instance_name: Optional[str], spec: EverythingSearchSpec
+) -> List[str]:
+    args = build_es_base_args(es_path, instance_name)
+    if spec.drive:
+        args += ["-path", f"{spec.drive}:\\"]
+    ext_filter = f"ext:{spec.extensions}" if spec.extensions else ""
+    sort_args = ["-n", str(spec.max_results), "-sort", "name-ascending"]
+    if spec.regex:
+        args += ["-r", spec.text] + sort_args
         if ext_filter:
-            regex_args.append(ext_filter)
-        if type_flag:
-            regex_args.append(type_flag)
-        searches.append(("regex", regex_args))
+            args.append(ext_filter)
+    else:
+        terms = [term for term in (spec.text, ext_filter) if term]
+        args += ([" ".join(terms)] if terms else []) + sort_args
+    if spec.target_type == "folder":
+        args.append("/ad")
+    elif spec.target_type == "file":
+        args.append("/a-d")
+    return args
 
-    # Прямой поиск: имя + ext-фильтр (или только ext-фильтр)
-    plain_terms = []
-    if query.name:
-        plain_terms.append(query.name)
-    if ext_filter:
-        plain_terms.append(ext_filter)
-    search_text = " ".join(plain_terms) if plain_terms else ext_filter
-    if not search_text.strip():
-        search_text = ""
-
-    plain_args = (
-        base_args
-        + ([search_text] if search_text else [])
-        + ["-n", "30", "-sort", "name-ascending"]
-    )
-    if type_flag:
-        plain_args.append(type_flag)
-    searches.append(("plain", plain_args))
 
-    all_lines: List[str] = []
-    for label, args in searches:
+class EsExeBackend(EverythingBackend):
+    """
+    Запускает es.exe и читает его stdout построчно в UTF-8 (-cp 65001), так что
+    обработка начинается с первых строк, а процесс можно прервать досрочно.
+    Если старая версия es.exe не понимает -cp, используем экспорт во временный
+    файл в UTF-8 (с BOM). Сам бэкенд - запасной вариант, когда Everything SDK
+    недоступен.
+    """
+
+    name = "es.exe"
+
+    def __init__(self, log_func, es_path: str, instance_name: Optional[str]) -> None:
+        super().__init__()
+        self.log = log_func
+        self.es_path = es_path
+        self.instance_name = instance_name
+        self._stream_supported = True
+
+    def is_available(self) -> bool:
+        return bool(self.es_path) and os.path.exists(self.es_path)
+
+    def search(
+        self, spec: EverythingSearchSpec, stop_event: Optional[threading.Event] = None
+    ) -> Iterator[str]:
+        if self._stream_supported:
+            streamed = yield from self._run_stream(spec, stop_event)
+            if streamed:
+                return
+            if stop_event is not None and stop_event.is_set():
+                return
+        for line in self._run_export(spec):
+            if stop_event is not None and stop_event.is_set():
+                return
+            yield line
+
+    def _run_stream(
+        self, spec: EverythingSearchSpec, stop_event: Optional[threading.Event]
+    ):
+        """
+        Генератор строк stdout. Возвращает True, если поток отработал
+        (в том числе с пустым результатом), и False, если нужен запасной путь.
+        """
+        label = spec.label
+        args = build_es_args(self.es_path, self.instance_name, spec) + ["-cp", "65001"]
+        self.log(f"Выполняю поиск через es.exe ({label}): {format_args_for_log(args)}")
+        try:
+            proc = subprocess.Popen(
+                args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                stdin=subprocess.DEVNULL,
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+            )
+        except Exception as e:
+            self.last_error = str(e)
+            self.log(f"Ошибка запуска es.exe ({label}): {e}")
+            return False
+
+        finished = threading.Event()
+        if stop_event is not None:
+            threading.Thread(
+                target=self._kill_on_stop,
+                args=(proc, stop_event, finished),
+                daemon=True,
+            ).start()
+
+        count = 0
+        stopped = False
+        reached_eof = False
+        try:
+            for raw in proc.stdout:
+                if stop_event is not None and stop_event.is_set():
+                    stopped = True
+                    break
+                line = raw.decode("utf-8", errors="replace").strip().lstrip("\ufeff")
+                if not line:
+                    continue
+                count += 1
+                yield line
+            else:
+                reached_eof = True
+        except GeneratorExit:
+            # Потребитель закрыл генератор - это тоже досрочная остановка
+            stopped = True
+            raise
+        finally:
+            finished.set()
+            if stop_event is not None and stop_event.is_set():
+                stopped = True
+            if reached_eof and not stopped:
+                # Вывод закончился: даём es.exe завершиться и вернуть код
+                try:
+                    proc.wait(timeout=ES_EXIT_TIMEOUT_S)
+                except Exception:
+                    pass
+            if proc.poll() is None:
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+            try:
+                proc.stdout.close()
+            except Exception:
+                pass
+            try:
+                proc.wait(timeout=2.0)
+            except Exception:
+                pass
+
+        if stopped:
+            self.log(f"es.exe ({label}) остановлен досрочно после {count} строк")
+            return True
+        if proc.returncode not in (0, None) and count == 0:
+            self.last_error = f"код {proc.returncode}"
+            self.log(
+                f"es.exe ({label}) завершился с кодом {proc.returncode} без вывода - "
+                "пробую экспорт во временный файл"
+            )
+            return False
+        self.last_error = ""
+        return True
+
+    @staticmethod
+    def _kill_on_stop(proc, stop_event: threading.Event, finished: threading.Event):
+        """Прерывает es.exe, даже если он ещё не выдал ни одной строки."""
+        while not finished.wait(0.05):
+            if stop_event.is_set():
+                if proc.poll() is None:
+                    try:
+                        proc.kill()
+                    except Exception:
+                        pass
+                return
+
+    def _run_export(self, spec: EverythingSearchSpec) -> List[str]:
+        label = spec.label
+        args = build_es_args(self.es_path, self.instance_name, spec)
         tmp_path = None
         try:
             with tempfile.NamedTemporaryFile(delete=False, suffix=".txt") as tmp:
                 tmp_path = tmp.name
             export_args = args + ["-export-txt", tmp_path, "-utf8-bom"]
             log_args = format_args_for_log(export_args)
-            log_func(f"Выполняю поиск через es.exe ({label}): {log_args}")
+            self.log(f"Выполняю поиск через es.exe ({label}): {log_args}")
 
             result = subprocess.run(export_args, capture_output=True, check=False)
         except Exception as e:
-            log_func(f"Ошибка запуска es.exe ({label}): {e}")
-            log_func(traceback.format_exc())
+            self.last_error = str(e)
+            self.log(f"Ошибка запуска es.exe ({label}): {e}")
+            self.log(traceback.format_exc())
             if tmp_path and os.path.exists(tmp_path):
                 try:
                     os.remove(tmp_path)
                 except Exception:
                     pass
-            continue
+            return []
 
         lines: List[str] = []
         if tmp_path and os.path.exists(tmp_path):
@@ -126,7 +282,7 @@ def run_es_search(
                             line.strip() for line in f.readlines() if line.strip()
                         ]
             except Exception as e:
-                log_func(f"Не удалось прочитать экспортированный файл ({label}): {e}")
+                self.log(f"Не удалось прочитать экспортированный файл ({label}): {e}")
             finally:
                 try:
                     os.remove(tmp_path)
@@ -148,16 +304,66 @@ def run_es_search(
                         break
                 except Exception:
                     continue
+        self.last_error = "" if result.returncode == 0 else f"код {result.returncode}"
+        if lines and self._stream_supported:
+            # Экспорт сработал там, где поток не смог - дальше сразу через файл
+            self._stream_supported = False
+            self.log("es.exe не поддерживает вывод в UTF-8 (-cp 65001), использую экспорт в файл")
+        return lines
+
+
+def run_es_search(
+    log_func,
+    es_path: str,
+    instance_name: Optional[str],
+    query: CompiledQuery,
+    backend: Optional[EverythingBackend] = None,
+) -> List[str]:
+    """
+    Выполняет regex- и текстовый запросы через backend (по умолчанию es.exe)
+    параллельно и объединяет результаты без дубликатов в порядке запросов.
+    Оба запроса собираются полностью (в пределах лимита backend), кроме
+    случая, когда найден путь <диск>:\\<имя> на запрошенном диске: лучше него
+    select_best_path ничего не выберет, и остальные запросы останавливаются.
+    """
+    if backend is None:
+        backend = EsExeBackend(log_func, es_path, instance_name)
+
+    specs = build_search_specs(query)
+    stop_event = threading.Event()
+    results: Dict[str, List[str]] = {spec.label: [] for spec in specs}
+
+    def _collect(spec: EverythingSearchSpec) -> None:
+        bucket = results[spec.label]
+        try:
+            for path in backend.search(spec, stop_event):
+                bucket.append(path)
+                if is_unbeatable_match(path, query):
+                    if not stop_event.is_set():
+                        log_func(f"Точное совпадение в корне диска ({spec.label}) - прекращаю поиск.")
+                    stop_event.set()
+                    return
+        except Exception as e:
+            log_func(f"Ошибка поиска Everything ({backend.name}, {spec.label}): {e}")
+            log_func(traceback.format_exc())
 
-        all_lines.extend(lines)
+    if len(specs) == 1:
+        _collect(specs[0])
+    else:
+        pending = {_get_search_pool().submit(_collect, spec) for spec in specs}
+        while pending and not stop_event.is_set():
+            _, pending = wait(pending, return_when=FIRST_COMPLETED)
+        # Незавершённые запросы увидят stop_event и остановятся сами
+        stop_event.set()
 
     # Убираем дубликаты, сохраняя порядок
     seen = set()
     uniq_lines = []
-    for line in all_lines:
-        if line not in seen:
-            seen.add(line)
-            uniq_lines.append(line)
+    for spec in specs:
+        for line in list(results[spec.label]):
+            if line not in seen:
+                seen.add(line)
+                uniq_lines.append(line)
 
-    log_func(f"Результаты es.exe: {len(uniq_lines)} записей")
+    log_func(f"Результаты Everything ({backend.name}): {len(uniq_lines)} записей")
     return uniq_lines
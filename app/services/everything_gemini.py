@@ -1,6 +1,7 @@
 import json
 import re
 import socket
+import time
 import traceback
 from typing import Optional
 
@@ -16,11 +17,36 @@ try:
 except Exception:
     httpx = None
 
+from app.core.gemini_telemetry import GeminiCallRecord
+from app.services.everything_local_query import (
+    LOCAL_CONFIDENCE_THRESHOLD,
+    parse_search_query_local,
+)
 from app.services.everything_models import SearchQuery
 
 
-def normalize_search_query(log_func, client, text: str) -> Optional[SearchQuery]:
-    """Нормализуем запрос через Gemini с фолбэком и аккуратным логом."""
+def normalize_search_query(
+    log_func, client, text: str, telemetry=None
+) -> Optional[SearchQuery]:
+    """
+    Нормализуем запрос: сначала локальными правилами, а при низкой уверенности
+    через Gemini с фолбэком и аккуратным логом. Вызовы Gemini записываются
+    в telemetry (GeminiTelemetryStore), если он передан.
+    """
+    local_query, confidence = parse_search_query_local(text)
+    if local_query and confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+        drive_label = local_query.drive or "all"
+        log_func(
+            "Локальная нормализация поиска "
+            f"(уверенность {confidence:.2f}): {local_query.target_type}, "
+            f"'{local_query.name}', диск {drive_label}"
+        )
+        return local_query
+    if local_query:
+        log_func(
+            f"Локальный разбор поиска неуверен ({confidence:.2f}), спрашиваю Gemini."
+        )
+
     if not client:
         log_func("Gemini не инициализирован, пропускаю обработку поиска")
         return None
@@ -81,11 +107,20 @@ def normalize_search_query(log_func, client, text: str) -> Optional[SearchQuery]
     ]
     attempted = set()
     last_error = None
+    trace = GeminiCallRecord(
+        kind="search", requested_model=candidates[0], prompt_chars=len(prompt)
+    )
+    started = time.monotonic()
 
     for model_name in candidates:
         if model_name in attempted:
             continue
         attempted.add(model_name)
+        trace.model = model_name
+        trace.level = "MINIMAL" if model_name.startswith("gemini-3") else ""
+        trace.attempts += 1
+        trace.fallback_path.append(model_name)
+        attempt_started = time.monotonic()
         try:
             config = _build_search_config(model_name)
             response = client.models.generate_content(
@@ -93,6 +128,8 @@ def normalize_search_query(log_func, client, text: str) -> Optional[SearchQuery]
                 contents=prompt,
                 config=config,
             )
+            trace.latency_s = time.monotonic() - attempt_started
+            _record_call(telemetry, trace, started, response, "ok")
             raw = (getattr(response, "text", "") or "").strip()
             log_func(f"Gemini нормализация поиска ({model_name}), ответ: {raw}")
             data = _extract_json(raw)
@@ -130,10 +167,24 @@ def normalize_search_query(log_func, client, text: str) -> Optional[SearchQuery]
                 break
 
     if last_error:
+        if trace.total_s is None:
+            _record_call(telemetry, trace, started, None, "error")
         log_func(traceback.format_exc())
     return None
 
 
+def _record_call(
+    telemetry, trace: GeminiCallRecord, started: float, response, status: str
+) -> None:
+    if telemetry is None:
+        return
+    trace.status = status
+    trace.total_s = time.monotonic() - started
+    if response is not None:
+        trace.apply_usage(response)
+    telemetry.record(trace)
+
+
 def _build_search_config(model_name: str) -> types.GenerateContentConfig:
     config_kwargs = {"temperature": 0.1}
     thinking_config = _build_thinking_config(model_name)
@@ -3,9 +3,11 @@
 
 import os
 import re
-import subprocess
 from typing import List, Optional
 
+from app.services.everything_state import get_cached_command_lines, store_command_lines
+from app.services.process_inspector import ProcessInspector, create_process_inspector
+
 
 def is_everything_running(runtime) -> bool:
     if runtime.instance_name:
@@ -18,10 +20,21 @@ def is_everything_process_running(runtime) -> bool:
     return _is_everything_running(runtime)
 
 
+EVERYTHING_EXE_NAMES = ("Everything.exe", "Everything64.exe")
+
+
+def get_process_inspector(runtime) -> ProcessInspector:
+    if runtime.process_inspector is None:
+        runtime.process_inspector = create_process_inspector()
+        runtime.log(f"Перечисление процессов: {runtime.process_inspector.name}")
+    return runtime.process_inspector
+
+
 def _is_everything_running(runtime) -> bool:
-    return _is_process_running(runtime, "Everything.exe") or _is_process_running(
-        runtime, "Everything64.exe"
-    )
+    try:
+        return get_process_inspector(runtime).is_running(EVERYTHING_EXE_NAMES)
+    except Exception:
+        return False
 
 
 def _is_instance_running(runtime, instance_name: Optional[str]) -> bool:
@@ -35,15 +48,7 @@ def _is_instance_running(runtime, instance_name: Optional[str]) -> bool:
 
 def _is_process_running(runtime, exe_name: str) -> bool:
     try:
-        result = subprocess.run(
-            ["tasklist", "/FI", f"IMAGENAME eq {exe_name}"],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="ignore",
-            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
-        )
-        return exe_name.lower() in (result.stdout or "").lower()
+        return get_process_inspector(runtime).is_running([exe_name])
     except Exception:
         return False
 
@@ -75,82 +80,33 @@ def _get_running_instance_candidates(runtime) -> List[Optional[str]]:
 
 
 def _get_everything_command_lines(runtime) -> List[str]:
-    commands = [
-        [
-            "powershell",
-            "-NoProfile",
-            "-Command",
-            (
-                "Get-CimInstance Win32_Process "
-                "-Filter \"Name='Everything.exe' OR Name='Everything64.exe'\" "
-                "| Where-Object { $_.CommandLine } "
-                "| Select-Object -ExpandProperty CommandLine"
-            ),
-        ],
-        [
-            "wmic",
-            "process",
-            "where",
-            "name='Everything.exe' or name='Everything64.exe'",
-            "get",
-            "CommandLine",
-            "/VALUE",
-        ],
-    ]
-
-    for cmd in commands:
-        try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-                errors="ignore",
-                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
-                timeout=3,
+    cached = get_cached_command_lines(runtime)
+    if cached is not None:
+        return cached
+    lines = _query_everything_command_lines(runtime)
+    store_command_lines(runtime, lines)
+    return lines
+
+
+def _query_everything_command_lines(runtime) -> List[str]:
+    inspector = get_process_inspector(runtime)
+    try:
+        infos = inspector.list_processes(EVERYTHING_EXE_NAMES, with_cmdline=True)
+    except Exception as e:
+        runtime.log(f"Не удалось получить процессы Everything ({inspector.name}): {e}")
+        infos = []
+    lines = [info.cmdline.strip() for info in infos if (info.cmdline or "").strip()]
+    if lines:
+        source = inspector.last_cmdline_source or inspector.name
+        if runtime._cmdline_source != source or runtime._cmdline_count != len(lines):
+            runtime.log(
+                f"Командные строки Everything получены через {source}: {len(lines)} шт."
             )
-            output = (result.stdout or "").strip()
-            if not output:
-                continue
-            lines = [line.strip() for line in output.splitlines() if line.strip()]
-            if cmd[0].lower() == "wmic":
-                cmdlines = []
-                for line in lines:
-                    if line.lower().startswith("commandline="):
-                        value = line.split("=", 1)[1].strip()
-                        if value:
-                            cmdlines.append(value)
-                if cmdlines:
-                    if (
-                        runtime._cmdline_source != "wmic"
-                        or runtime._cmdline_count != len(cmdlines)
-                    ):
-                        runtime.log(
-                            "Командные строки Everything получены через WMIC: "
-                            f"{len(cmdlines)} шт."
-                        )
-                        runtime._cmdline_source = "wmic"
-                        runtime._cmdline_count = len(cmdlines)
-                    return cmdlines
-                continue
-            if lines:
-                if (
-                    runtime._cmdline_source != "powershell"
-                    or runtime._cmdline_count != len(lines)
-                ):
-                    runtime.log(
-                        "Командные строки Everything получены через PowerShell: "
-                        f"{len(lines)} шт."
-                    )
-                    runtime._cmdline_source = "powershell"
-                    runtime._cmdline_count = len(lines)
-                return lines
-        except Exception:
-            continue
+            runtime._cmdline_source = source
+            runtime._cmdline_count = len(lines)
+        return lines
     if runtime._cmdline_source is not None:
-        runtime.log(
-            "Командные строки Everything не получены ни через PowerShell, ни через WMIC."
-        )
+        runtime.log("Командные строки Everything не получены.")
         runtime._cmdline_source = None
         runtime._cmdline_count = None
     return []
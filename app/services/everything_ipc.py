@@ -4,7 +4,13 @@
 import os
 import subprocess
 import time
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from app.services.everything_state import get_cached_ready, store_ready
+
+WAIT_INITIAL_DELAY_S = 0.025
+WAIT_MAX_DELAY_S = 0.4
 
 
 def is_everything_ready(runtime) -> bool:
@@ -18,10 +24,19 @@ def _probe_es_ready(runtime) -> bool:
 
 
 def _probe_es_ready_for_instance(
-    runtime, instance_name: Optional[str]
+    runtime, instance_name: Optional[str], use_cache: bool = True
 ) -> Tuple[bool, str]:
     if not runtime.es_path or not os.path.exists(runtime.es_path):
         return False, "es.exe не найден"
+    if use_cache and get_cached_ready(runtime, instance_name):
+        return True, ""
+    ready, error = _run_es_probe(runtime, instance_name)
+    if ready:
+        store_ready(runtime, instance_name)
+    return ready, error
+
+
+def _run_es_probe(runtime, instance_name: Optional[str]) -> Tuple[bool, str]:
     try:
         args = [runtime.es_path]
         if instance_name:
@@ -55,12 +70,70 @@ def _probe_es_ready_for_instance(
         return False, "не удалось выполнить es.exe"
 
 
+def _probe_candidates(
+    runtime, instances: List[Optional[str]]
+) -> Tuple[bool, Optional[str], str]:
+    """
+    Проверяет несколько экземпляров одновременно. Возвращает
+    (готов, экземпляр, последняя ошибка); при нескольких готовых
+    побеждает первый в списке.
+    """
+    if len(instances) == 1:
+        ready, error = _probe_es_ready_for_instance(runtime, instances[0])
+        return ready, instances[0], error
+    with ThreadPoolExecutor(max_workers=len(instances)) as pool:
+        results = list(
+            pool.map(lambda name: _probe_es_ready_for_instance(runtime, name), instances)
+        )
+    last_error = ""
+    for instance_name, (ready, error) in zip(instances, results):
+        if ready:
+            return True, instance_name, ""
+        if error:
+            last_error = error
+    return False, None, last_error
+
+
 def _wait_for_es_ready(runtime, timeout_s: float) -> bool:
+    """
+    Ждёт готовности IPC экземпляра runtime.instance_name с экспоненциальной
+    паузой (25 мс, 50 мс, ... до 400 мс).
+    Если запущенный нами процесс Everything завершился с ошибкой, прекращает
+    ожидание, не дожидаясь таймаута. Код 0 означает передачу команды уже
+    запущенному или стартующему экземпляру - тогда ждём до срока.
+    """
+    launched = runtime._launched_process
+    runtime._launched_process = None
     deadline = time.monotonic() + max(0.0, timeout_s)
-    while time.monotonic() < deadline:
-        if _probe_es_ready(runtime):
+    delay = WAIT_INITIAL_DELAY_S
+    probes = 0
+    handoff_logged = False
+    while True:
+        probes += 1
+        ready, error = _probe_es_ready_for_instance(runtime, runtime.instance_name)
+        runtime.last_es_error = error
+        if ready:
+            if probes > 1:
+                runtime.log(f"Everything готов после {probes} проверок IPC.")
             return True
-        time.sleep(0.2)
+        returncode = launched.poll() if launched is not None else None
+        if returncode not in (None, 0):
+            runtime.log(
+                "Запущенный процесс Everything завершился "
+                f"(код {returncode}), прекращаю ожидание."
+            )
+            return False
+        if returncode == 0 and not handoff_logged:
+            handoff_logged = True
+            runtime.log(
+                "Запущенный процесс Everything передал команду другому экземпляру, "
+                "жду его готовности."
+            )
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, WAIT_MAX_DELAY_S)
     if runtime.last_es_error:
         runtime.log(
             "es.exe не смог подключиться к Everything вовремя: "
@@ -75,15 +148,11 @@ def _find_ready_running_instance(runtime) -> Optional[Optional[str]]:
     candidates = runtime._get_running_instance_candidates()
     if not candidates:
         candidates = [None]
-    last_error = ""
-    for instance_name in candidates:
-        ready, error = _probe_es_ready_for_instance(runtime, instance_name)
-        if ready:
-            return instance_name
-        if error:
-            last_error = error
-    if last_error:
-        runtime.last_es_error = last_error
+    ready, instance_name, error = _probe_candidates(runtime, candidates)
+    if ready:
+        return instance_name
+    if error:
+        runtime.last_es_error = error
     return None
 
 
@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""Локальный индекс имён файлов (SQLite + FTS5 trigram) на случай, когда Everything недоступен."""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.services.everything_backends import EverythingBackend
+from app.services.everything_models import EverythingSearchSpec
+from app.services.everything_paths import format_path_for_log
+
+REFRESH_INTERVAL_S = 1800
+# Фиксируем изменения пачками, чтобы поиск не ждал весь обход
+COMMIT_EVERY_DIRS = 200
+FETCH_BATCH = 256
+SKIP_DIR_NAMES = {
+    "$recycle.bin",
+    "system volume information",
+    "$windows.~bt",
+    "$windows.~ws",
+    "node_modules",
+    "__pycache__",
+    ".git",
+}
+FILE_ATTRIBUTE_REPARSE_POINT = 0x400
+
+
+def _fold(text: str) -> str:
+    return (text or "").lower().replace("ё", "е")
+
+
+def _split_ext(name: str) -> str:
+    if "." not in name:
+        return ""
+    return name.rsplit(".", 1)[-1].lower()
+
+
+def extract_regex_literals(pattern: str) -> List[str]:
+    """
+    Достаёт обязательные буквальные фрагменты из регэкспа (для предфильтра).
+    Для шаблонов с альтернативами и группами возвращает пустой список.
+    """
+    if not pattern or "|" in pattern or "(" in pattern:
+        return []
+    literals: List[str] = []
+    current: List[str] = []
+
+    def _flush():
+        if current:
+            literals.append("".join(current))
+            current.clear()
+
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            _flush()
+            index += 2
+            continue
+        if char == "[":
+            _flush()
+            end = pattern.find("]", index + 1)
+            index = len(pattern) if end == -1 else end + 1
+            continue
+        if char in "*?{":
+            # Предыдущий символ необязателен
+            if current:
+                current.pop()
+            _flush()
+            if char == "{":
+                end = pattern.find("}", index)
+                index = len(pattern) if end == -1 else end + 1
+                continue
+            index += 1
+            continue
+        if char in ".^$+":
+            _flush()
+            index += 1
+            continue
+        current.append(char)
+        index += 1
+    _flush()
+    return [_fold(item) for item in literals if item.strip()]
+
+
+class LocalFileIndex(EverythingBackend):
+    """
+    Фоновый обход os.scandir по заданным корням. Повторный обход заново
+    читает только каталоги, у которых изменился mtime; для остальных
+    подкаталоги берутся из индекса. Поиск реализует интерфейс
+    EverythingBackend, поэтому используется вместо es.exe без изменений
+    в логике выбора результата.
+    """
+
+    name = "local-index"
+
+    def __init__(
+        self,
+        db_path: str,
+        roots: Sequence[str],
+        log_func=None,
+        refresh_interval_s: float = REFRESH_INTERVAL_S,
+    ) -> None:
+        super().__init__()
+        self.db_path = db_path
+        self.roots = [os.path.normpath(root) for root in roots if root]
+        self.log = log_func or (lambda _msg: None)
+        self.refresh_interval_s = refresh_interval_s
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = False
+        self._fts = False
+        self._conn: Optional[sqlite3.Connection] = None
+        self._open()
+
+    # --- Хранилище ---
+
+    def _open(self) -> None:
+        try:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL UNIQUE,
+                    parent TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    name_fold TEXT NOT NULL,
+                    ext TEXT NOT NULL,
+                    is_dir INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_parent ON entries(parent);
+                CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime REAL NOT NULL);
+                """
+            )
+            self._fts = self._ensure_fts(conn)
+            roots_json = json.dumps(sorted(self.roots), ensure_ascii=False)
+            row = conn.execute("SELECT value FROM meta WHERE key = 'roots'").fetchone()
+            if row is None or row[0] != roots_json:
+                # Набор корней изменился - проще построить индекс заново
+                conn.execute("DELETE FROM entries")
+                conn.execute("DELETE FROM dirs")
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('roots', ?)",
+                    (roots_json,),
+                )
+            conn.commit()
+            self._ready = (
+                conn.execute("SELECT 1 FROM dirs LIMIT 1").fetchone() is not None
+            )
+            self._conn = conn
+        except Exception as e:
+            self._conn = None
+            self.last_error = str(e)
+            self.log(f"Локальный индекс файлов отключён: {e}")
+
+    @staticmethod
+    def _ensure_fts(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.executescript(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                    name_fold, content='entries', content_rowid='id', tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+                    INSERT INTO entries_fts(rowid, name_fold) VALUES (new.id, new.name_fold);
+                END;
+                CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+                    INSERT INTO entries_fts(entries_fts, rowid, name_fold)
+                    VALUES ('delete', old.id, old.name_fold);
+                END;
+                """
+            )
+            return True
+        except sqlite3.OperationalError:
+            # SQLite без FTS5/trigram (< 3.34): ищем через LIKE
+            return False
+
+    # --- Обход ---
+
+    def start(self) -> None:
+        if self._conn is None or not self.roots:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="local-file-index", daemon=True
+        )
+        self._thread.start()
+
+    def refresh_now(self) -> None:
+        self._wake.set()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread and thread.is_alive():
+            thread.join(timeout=2.0)
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+
+    def is_available(self) -> bool:
+        return self._conn is not None and self._ready
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            started = time.monotonic()
+            stats = {"dirs": 0, "rescanned": 0, "added": 0, "removed": 0}
+            for root in self.roots:
+                if self._stop.is_set():
+                    break
+                try:
+                    self._crawl_root(root, stats)
+                except Exception as e:
+                    root_label = format_path_for_log(root) or root
+                    self.log(f"Ошибка обхода '{root_label}' для локального индекса: {e}")
+            with self._lock:
+                if self._conn is not None:
+                    self._conn.commit()
+            if self._stop.is_set():
+                break
+            self._ready = True
+            self.log(
+                "Локальный индекс файлов обновлён за "
+                f"{time.monotonic() - started:.1f}с: каталогов {stats['dirs']}, "
+                f"перечитано {stats['rescanned']}, +{stats['added']}/-{stats['removed']}"
+            )
+            self._wake.wait(self.refresh_interval_s)
+            self._wake.clear()
+
+    def _crawl_root(self, root: str, stats: Dict[str, int]) -> None:
+        stack = [root]
+        while stack and not self._stop.is_set():
+            directory = stack.pop()
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError:
+                stats["removed"] += self._remove_subtree(directory)
+                continue
+            stats["dirs"] += 1
+
+            with self._lock:
+                if self._conn is None:
+                    return
+                row = self._conn.execute(
+                    "SELECT mtime FROM dirs WHERE path = ?", (directory,)
+                ).fetchone()
+                if row is not None and row[0] == mtime:
+                    # Состав каталога не менялся - спускаемся по известным подкаталогам
+                    stack.extend(
+                        child
+                        for (child,) in self._conn.execute(
+                            "SELECT path FROM entries WHERE parent = ? AND is_dir = 1",
+                            (directory,),
+                        )
+                    )
+                    continue
+
+            current = self._scan_directory(directory)
+            if current is None:
+                continue
+            stats["rescanned"] += 1
+            added, removed = self._apply_directory(directory, mtime, current)
+            stats["added"] += added
+            stats["removed"] += removed
+            stack.extend(path for path, (_, is_dir) in current.items() if is_dir)
+            if stats["rescanned"] % COMMIT_EVERY_DIRS == 0:
+                with self._lock:
+                    if self._conn is not None:
+                        self._conn.commit()
+
+    @staticmethod
+    def _scan_directory(directory: str) -> Optional[Dict[str, Tuple[str, bool]]]:
+        current: Dict[str, Tuple[str, bool]] = {}
+        try:
+            with os.scandir(directory) as iterator:
+                for entry in iterator:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if is_dir:
+                            if entry.name.lower() in SKIP_DIR_NAMES:
+                                continue
+                            if os.name == "nt":
+                                attrs = getattr(
+                                    entry.stat(follow_symlinks=False),
+                                    "st_file_attributes",
+                                    0,
+                                )
+                                # Junction-точки ведут в уже обойдённые места
+                                if attrs & FILE_ATTRIBUTE_REPARSE_POINT:
+                                    continue
+                        elif entry.is_symlink():
+                            continue
+                    except OSError:
+                        continue
+                    current[entry.path] = (entry.name, is_dir)
+        except OSError:
+            return None
+        return current
+
+    def _apply_directory(
+        self, directory: str, mtime: float, current: Dict[str, Tuple[str, bool]]
+    ) -> Tuple[int, int]:
+        with self._lock:
+            if self._conn is None:
+                return 0, 0
+            existing = {
+                path: bool(is_dir)
+                for path, is_dir in self._conn.execute(
+                    "SELECT path, is_dir FROM entries WHERE parent = ?", (directory,)
+                )
+            }
+        removed = 0
+        for path, was_dir in existing.items():
+            entry = current.get(path)
+            if entry is None or entry[1] != was_dir:
+                removed += self._remove_subtree(path)
+        rows = [
+            (path, directory, name, _fold(name), "" if is_dir else _split_ext(name), int(is_dir))
+            for path, (name, is_dir) in current.items()
+            if path not in existing or existing[path] != is_dir
+        ]
+        with self._lock:
+            if self._conn is None:
+                return 0, removed
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO entries (path, parent, name, name_fold, ext, is_dir) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)",
+                (directory, mtime),
+            )
+        return len(rows), removed
+
+    def _remove_subtree(self, path: str) -> int:
+        prefix = path.rstrip("\\/") + os.sep
+        # Диапазон по индексу path вместо substr(): без полного перебора таблицы
+        params = (path, prefix, prefix)
+        with self._lock:
+            if self._conn is None:
+                return 0
+            cursor = self._conn.execute(
+                "DELETE FROM entries WHERE path = ? "
+                "OR (path >= ? AND path < ? || char(1114111))",
+                params,
+            )
+            self._conn.execute(
+                "DELETE FROM dirs WHERE path = ? "
+                "OR (path >= ? AND path < ? || char(1114111))",
+                params,
+            )
+            return max(0, cursor.rowcount)
+
+    # --- Поиск ---
+
+    def search(
+        self, spec: EverythingSearchSpec, stop_event: Optional[threading.Event] = None
+    ) -> Iterator[str]:
+        if self._conn is None:
+            return
+        where: List[str] = []
+        params: List[object] = []
+        if spec.target_type == "folder":
+            where.append("is_dir = 1")
+        elif spec.target_type == "file":
+            where.append("is_dir = 0")
+        if spec.extensions:
+            extensions = [ext.lower() for ext in spec.extensions.split(";") if ext]
+            if extensions:
+                where.append(f"ext IN ({', '.join('?' for _ in extensions)})")
+                params.extend(extensions)
+        if spec.drive:
+            where.append("lower(substr(path, 1, 3)) = ?")
+            params.append(f"{spec.drive.lower()}:\\")
+
+        compiled = None
+        if spec.regex:
+            try:
+                compiled = re.compile(spec.text, flags=re.IGNORECASE)
+            except re.error as e:
+                self.last_error = str(e)
+                return
+            terms = extract_regex_literals(spec.text)
+        else:
+            terms = [_fold(word) for word in spec.text.split()]
+
+        fts_terms = []
+        for term in terms:
+            if self._fts and len(term) >= 3:
+                fts_terms.append('"' + term.replace('"', '""') + '"')
+            else:
+                where.append("name_fold LIKE ? ESCAPE '\\'")
+                escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                params.append(f"%{escaped}%")
+        if fts_terms:
+            where.append("id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)")
+            params.append(" ".join(fts_terms))
+
+        sql = "SELECT path, name FROM entries"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY name_fold"
+        if compiled is None:
+            sql += f" LIMIT {int(spec.max_results)}"
+
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                rows = self._conn.execute(sql, params)
+                found: List[str] = []
+                while len(found) < spec.max_results:
+                    batch = rows.fetchmany(FETCH_BATCH)
+                    if not batch:
+                        break
+                    for path, name in batch:
+                        if compiled is not None and not compiled.search(name):
+                            continue
+                        found.append(path)
+                        if len(found) >= spec.max_results:
+                            break
+            except sqlite3.Error as e:
+                self.last_error = str(e)
+                self.log(f"Ошибка поиска по локальному индексу ({spec.label}): {e}")
+                return
+        self.last_error = ""
+        for path in found:
+            if stop_event is not None and stop_event.is_set():
+                return
+            yield path
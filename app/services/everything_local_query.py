@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""Локальный разбор голосового запроса поиска без обращения к Gemini."""
+
+import re
+from typing import List, Optional, Tuple
+
+from app.services.everything_file_filters import detect_file_filter
+from app.services.everything_match import strip_punctuation
+from app.services.everything_models import SearchQuery
+
+FOLDER_KEYWORDS = ("папк", "каталог", "директори")
+FILE_KEYWORD = "файл"
+ALL_DRIVES_PHRASES = ("везде", "по всем дискам", "на всех дисках")
+
+# Ниже этого порога запрос отправляется на нормализацию в Gemini
+LOCAL_CONFIDENCE_THRESHOLD = 0.75
+# Больше стольких слов свободной речи в имени - разбор отдаётся Gemini
+MAX_FREE_FORM_WORDS = 1
+
+_TRIGGER_RE = re.compile(r"^найд[а-яa-z]*$")
+# Слово обычной речи: Whisper мог записать его с ошибкой (<откудо береться>),
+# в отличие от латиницы, чисел и имён с точками, которые редко искажаются
+_FREE_FORM_WORD_RE = re.compile(r"^[а-яё]+$")
+_TWO_DRIVES_RE = re.compile(r"\bна\s+диске\s+[a-zа-я]\s+или\s+[a-zа-я]\b")
+
+# Буквы дисков, как их распознаёт Whisper: латиница, кириллица и произношение
+_DRIVE_LETTERS = {
+    "а": "a",
+    "б": "b",
+    "бе": "b",
+    "би": "b",
+    "ц": "c",
+    "с": "c",
+    "це": "c",
+    "си": "c",
+    "д": "d",
+    "де": "d",
+    "ди": "d",
+    "е": "e",
+    "и": "e",
+    "ф": "f",
+    "эф": "f",
+    "г": "g",
+    "ге": "g",
+    "джи": "g",
+    "х": "h",
+}
+
+# Описательные указания, которые может корректно развернуть только Gemini:
+# <два ноля потом нижнее подчеркивание и слово развитие>
+_INSTRUCTION_MARKERS = (
+    "ноль",
+    "ноля",
+    "нолей",
+    "нуль",
+    "нуля",
+    "цифр",
+    "число",
+    "подчеркив",
+    "подчёркив",
+    "пробел",
+    "дефис",
+    "тире",
+    "точк",
+    "слово",
+    "слова",
+    "слов",
+    "букв",
+    "заглавн",
+    "английск",
+    "русск",
+    "латиниц",
+    "кириллиц",
+    "слитно",
+    "слить",
+    "потом",
+    "затем",
+    "раздел",
+)
+_NUMBER_WORDS = (
+    "один",
+    "одна",
+    "два",
+    "две",
+    "три",
+    "четыре",
+    "пять",
+    "шесть",
+    "семь",
+    "восемь",
+    "девять",
+    "десять",
+    "оба",
+    "обе",
+    "все",
+)
+_FILE_TYPE_WORDS = ("файл", "документ")
+_ALL_DRIVES_WORDS = tuple(tuple(phrase.split()) for phrase in ALL_DRIVES_PHRASES)
+# Знаки, которые срезаются с краёв исходных слов при сборке имени
+_EDGE_PUNCTUATION = ".,;:!?\"'«»()[]{}…"
+
+
+def normalize_intent_text(text: str) -> str:
+    return " ".join(strip_punctuation(text).lower().split())
+
+
+def has_folder_intent(norm_text: str) -> bool:
+    return any(keyword in norm_text for keyword in FOLDER_KEYWORDS)
+
+
+def has_file_intent(norm_text: str) -> bool:
+    return FILE_KEYWORD in norm_text
+
+
+def has_all_drives_intent(norm_text: str) -> bool:
+    if any(phrase in norm_text for phrase in ALL_DRIVES_PHRASES):
+        return True
+    return bool(_TWO_DRIVES_RE.search(norm_text))
+
+
+def parse_search_query_local(text: str) -> Tuple[Optional[SearchQuery], float]:
+    """
+    Разбирает команду <найди ...> правилами и возвращает (query, confidence).
+    confidence в диапазоне 0..1; при низком значении запрос стоит отдать Gemini.
+    Имя берётся из исходного текста: регистр и точки (<report.pdf>) сохраняются.
+    """
+    tokens = _tokenize(text)
+    if not tokens or not _TRIGGER_RE.match(tokens[0][0]):
+        return None, 0.0
+    norm_text = " ".join(word for word, _original in tokens)
+
+    confidence = 1.0
+    rest = tokens[1:]
+
+    drive, rest, drive_confidence = _extract_drive(rest, norm_text)
+    confidence = min(confidence, drive_confidence)
+
+    # Тип указывается только сразу после триггера: в <найди папку мои документы>
+    # слово <документы> - часть имени, а не тип
+    target_type = None
+    if rest:
+        target_type = _type_word_target(rest[0][0])
+        if target_type is None and detect_file_filter(rest[0][0]):
+            # Категория сразу после триггера - это тип, а не часть имени:
+            # <найди видео тренировка> -> файл "тренировка"
+            target_type = "file"
+        if target_type is not None:
+            rest = rest[1:]
+            if len(rest) > 1 and _type_word_target(rest[0][0]):
+                # <найди файл документ отчёт>: второе слово типа тоже отбрасываем,
+                # но такой разбор неоднозначен - пусть решает Gemini
+                rest = rest[1:]
+                confidence = min(confidence, 0.5)
+
+    if target_type is None:
+        # Gemini по умолчанию тоже выбирает папку, но без явного типа
+        # вероятность ошибки выше
+        target_type = "folder"
+        confidence -= 0.3
+
+    if not rest:
+        return None, 0.0
+    name_words = [word for word, _original in rest]
+
+    if any(_is_instruction_word(word) for word in name_words):
+        confidence = min(confidence, 0.2)
+    if "или" in name_words or "диск" in name_words or "диске" in name_words:
+        confidence = min(confidence, 0.3)
+    if len(name_words) > 5:
+        confidence -= 0.3
+    free_form = [word for _word, word in rest if _FREE_FORM_WORD_RE.match(word.lower())]
+    if len(free_form) > MAX_FREE_FORM_WORDS:
+        # Несколько русских слов подряд: правила не исправят ошибки
+        # распознавания, а Gemini восстановит задуманное имя
+        confidence = min(confidence, 0.5)
+
+    query = SearchQuery(
+        trigger="найди",
+        target_type=target_type,
+        name=" ".join(original for _word, original in rest),
+        drive=drive,
+    )
+    return query, max(0.0, min(1.0, confidence))
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    """Пары (нормализованное слово, исходное слово без краевой пунктуации)."""
+    tokens = []
+    for raw in (text or "").split():
+        word = normalize_intent_text(raw)
+        if word:
+            tokens.append((word, raw.strip(_EDGE_PUNCTUATION) or raw))
+    return tokens
+
+
+def _type_word_target(word: str) -> Optional[str]:
+    if any(word.startswith(keyword) for keyword in FOLDER_KEYWORDS):
+        return "folder"
+    if any(word.startswith(keyword) for keyword in _FILE_TYPE_WORDS):
+        return "file"
+    return None
+
+
+def _extract_drive(
+    tokens: List[Tuple[str, str]], norm_text: str
+) -> Tuple[Optional[str], List[Tuple[str, str]], float]:
+    """Вырезает указание диска и фразы <везде>, возвращает (drive, слова, confidence)."""
+    if has_all_drives_intent(norm_text):
+        return None, _drop_all_drives_phrases(tokens), 1.0
+
+    result: List[Tuple[str, str]] = []
+    drive = None
+    confidence = 1.0
+    index = 0
+    while index < len(tokens):
+        word = tokens[index][0]
+        if word in ("диск", "диске") and index + 1 < len(tokens):
+            letter = _drive_letter(tokens[index + 1][0])
+            if letter and drive is None:
+                drive = letter
+                if result and result[-1][0] == "на":
+                    result.pop()
+                index += 2
+                continue
+            confidence = 0.3
+        result.append(tokens[index])
+        index += 1
+    return drive, result, confidence
+
+
+def _drop_all_drives_phrases(tokens: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    words = [word for word, _original in tokens]
+    result: List[Tuple[str, str]] = []
+    index = 0
+    while index < len(tokens):
+        for phrase in _ALL_DRIVES_WORDS:
+            if tuple(words[index : index + len(phrase)]) == phrase:
+                index += len(phrase)
+                break
+        else:
+            # <на диске d или e>
+            if _TWO_DRIVES_RE.fullmatch(" ".join(words[index : index + 5])):
+                index += 5
+                continue
+            result.append(tokens[index])
+            index += 1
+    return result
+
+
+def _drive_letter(word: str) -> Optional[str]:
+    if len(word) == 1 and "a" <= word <= "z":
+        return word
+    return _DRIVE_LETTERS.get(word)
+
+
+def _is_instruction_word(word: str) -> bool:
+    if word in _NUMBER_WORDS:
+        return True
+    return any(word.startswith(marker) for marker in _INSTRUCTION_MARKERS)
@@ -1,18 +1,61 @@
 import os
 import re
 from difflib import SequenceMatcher
-from typing import List, Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
+from app.services.everything_models import CompiledQuery, SearchQuery
 from app.services.everything_paths import format_path_for_log
 
+try:
+    # Опционально: rapidfuzz считает схожесть на C, в разы быстрее SequenceMatcher
+    from rapidfuzz.fuzz import ratio as _rapidfuzz_ratio
+except Exception:
+    _rapidfuzz_ratio = None
+
+# Максимальный вклад схожести в оценку (ratio * 100)
+_RATIO_WEIGHT = 100
+
+
+_PUNCTUATION_RE = re.compile(r"[^\w\sЁё-]+")
+_SEPARATORS_RE = re.compile(r"[_-]+")
+_CAMEL_RE = re.compile(r"(?<=[A-Za-zА-Яа-яЁё0-9])(?=[A-ZА-Я])")
+_NON_ALNUM_RE = re.compile(r"[^а-яa-z0-9]+")
+
+
+def compile_query(query: SearchQuery) -> CompiledQuery:
+    """Готовит запрос один раз; повторные одинаковые запросы берутся из кэша."""
+    return _compile_query_cached(
+        query.target_type, query.name or "", query.drive, query.extensions
+    )
+
+
+@lru_cache(maxsize=256)
+def _compile_query_cached(
+    target_type: str, name: str, drive: Optional[str], extensions: Optional[str]
+) -> CompiledQuery:
+    clean_name = strip_punctuation(name)
+    tokens = _tokenize_name(clean_name)
+    return CompiledQuery(
+        target_type=target_type,
+        name=name,
+        drive=drive,
+        extensions=extensions,
+        clean_name=clean_name,
+        tokens=tokens,
+        regex=_regex_from_tokens(tokens),
+        target_norm=_normalize_text(name),
+    )
+
 
 def build_regex_pattern(name: str, target_type: str) -> Optional[str]:
     """Создаёт регэксп по правилам из ТЗ для имени файла/папки."""
     if not name:
         return None
+    return _regex_from_tokens(_tokenize_name(strip_punctuation(name)))
 
-    cleaned_name = strip_punctuation(name)
-    words = _tokenize_name(cleaned_name)
+
+def _regex_from_tokens(words: Tuple[str, ...]) -> Optional[str]:
     if not words:
         return None
 
@@ -37,9 +80,10 @@ def build_regex_pattern(name: str, target_type: str) -> Optional[str]:
     return body
 
 
+@lru_cache(maxsize=1024)
 def strip_punctuation(name: str) -> str:
     """Убирает знаки препинания, оставляя буквы/цифры/подчёркивания и дефисы."""
-    cleaned = re.sub(r"[^\w\sЁё-]+", " ", name)
+    cleaned = _PUNCTUATION_RE.sub(" ", name)
     return " ".join(cleaned.split())
 
 
@@ -48,6 +92,7 @@ def select_best_path(
     target_name: str,
     drive: Optional[str] = None,
     log_func=None,
+    compiled: Optional[CompiledQuery] = None,
 ) -> Optional[str]:
     """Выбирает лучший путь: точное совпадение по имени папки + минимальная глубина + схожесть."""
     if not paths:
@@ -59,8 +104,12 @@ def select_best_path(
         if log_func:
             log_func(message)
 
-    target_norm = _normalize_text(target_name)
-    target_clean = strip_punctuation(target_name)
+    if compiled is not None and compiled.name == target_name:
+        target_norm = compiled.target_norm
+        target_clean = compiled.clean_name
+    else:
+        target_norm = _normalize_text(target_name)
+        target_clean = strip_punctuation(target_name)
 
     # Известные алиасы для системных путей (локализованные названия)
     aliases = {
@@ -84,48 +133,101 @@ def select_best_path(
             _log(f"Прямое совпадение по диску: {path_label}")
             return direct_path
 
-    def score(path: str) -> int:
-        base = os.path.basename(path)
-        base_norm = _normalize_text(base)
-        depth = path.count(os.sep)
-
-        ratio = SequenceMatcher(None, base_norm, target_norm).ratio() if target_norm else 0
-
-        s = int(ratio * 100)
-        if base_norm == target_norm:
-            s += 180
-        elif target_norm and base_norm.endswith(target_norm):
-            s += 110
-        elif target_norm and target_norm in base_norm:
-            s += 80
-        elif base_norm and base_norm in target_norm:
-            s += 50
-
-        # Чем меньше глубина (ближе к корню), тем выше
-        s += max(0, 40 - depth * 2)
-
-        # Приоритет диска
-        if drive and path.lower().startswith(f"{drive.lower()}:\\"):
-            s += 30
-
-        # Чем короче путь, тем выше
-        s -= len(path) // 80
-        return s
-
-    best = max(paths, key=score)
+    best = _pick_best_path(paths, target_norm, drive)
     path_label = format_path_for_log(best) or str(best)
     _log(f"Лучший кандидат для открытия: {path_label}")
     return best
 
 
+def _similarity(a: str, b: str) -> int:
+    if not a or not b:
+        return 0
+    if _rapidfuzz_ratio is not None:
+        return int(_rapidfuzz_ratio(a, b))
+    return int(SequenceMatcher(None, a, b).ratio() * _RATIO_WEIGHT)
+
+
+def _static_score(path: str, base_norm: str, target_norm: str, drive: Optional[str]) -> int:
+    """Часть оценки без схожести строк: бонусы совпадения, глубина, диск, длина."""
+    s = 0
+    if base_norm == target_norm:
+        s += 180
+    elif target_norm and base_norm.endswith(target_norm):
+        s += 110
+    elif target_norm and target_norm in base_norm:
+        s += 80
+    elif base_norm and base_norm in target_norm:
+        s += 50
+
+    # Чем меньше глубина (ближе к корню), тем выше
+    s += max(0, 40 - path.count(os.sep) * 2)
+
+    # Приоритет диска
+    if drive and path.lower().startswith(f"{drive.lower()}:\\"):
+        s += 30
+
+    # Чем короче путь, тем выше
+    s -= len(path) // 80
+    return s
+
+
+def _pick_best_path(paths: List[str], target_norm: str, drive: Optional[str]) -> str:
+    """
+    Дешёвая часть оценки считается для всех кандидатов, дорогая схожесть -
+    только пока кандидат ещё может обогнать лучшего (ветви и границы).
+    При равенстве побеждает более ранний путь, как у max().
+    """
+    candidates: List[Tuple[int, int, str, str]] = []
+    for index, path in enumerate(paths):
+        base_norm = _normalize_text(os.path.basename(path))
+        candidates.append(
+            (_static_score(path, base_norm, target_norm, drive), index, path, base_norm)
+        )
+    candidates.sort(key=lambda item: (-item[0], item[1]))
+
+    best_score, best_index, best_path = None, None, None
+    for static, index, path, base_norm in candidates:
+        if best_score is not None:
+            upper = static + _RATIO_WEIGHT
+            if upper < best_score or (upper == best_score and index > best_index):
+                break
+        total = static + _similarity(base_norm, target_norm)
+        if (
+            best_score is None
+            or total > best_score
+            or (total == best_score and index < best_index)
+        ):
+            best_score, best_index, best_path = total, index, path
+    return best_path
+
+
+def is_unbeatable_match(path: str, compiled: CompiledQuery) -> bool:
+    """
+    Точное совпадение имени в корне запрошенного диска (<диск>:\\<имя>):
+    у него наибольшие бонусы имени, глубины и диска, и select_best_path не
+    предпочтёт ему другой найденный путь. Без диска такого пути нет.
+    """
+    if not compiled.drive or not compiled.target_norm or not path:
+        return False
+    trimmed = path.rstrip("\\/")
+    root = f"{compiled.drive.lower()}:\\"
+    if trimmed[:3].lower() != root:
+        return False
+    rest = trimmed[3:]
+    if not rest or "\\" in rest or "/" in rest:
+        return False
+    return _normalize_text(rest) == compiled.target_norm
+
+
+@lru_cache(maxsize=4096)
 def _normalize_text(text: str) -> str:
     txt = (text or "").lower().replace("ё", "е")
-    return re.sub(r"[^а-яa-z0-9]+", "", txt)
+    return _NON_ALNUM_RE.sub("", txt)
 
 
-def _tokenize_name(name: str) -> List[str]:
+def _tokenize_name(name: str) -> Tuple[str, ...]:
     """Нормализация имени: заменяем подчёркивания/дефисы и вставляем пробелы по CamelCase."""
-    with_spaces = re.sub(r"[_-]+", " ", name)
-    camel_split = re.sub(r"(?<=[A-Za-zА-Яа-яЁё0-9])(?=[A-ZА-Я])", " ", with_spaces)
+    with_spaces = _SEPARATORS_RE.sub(" ", name)
+    camel_split = _CAMEL_RE.sub(" ", with_spaces)
     normalized = camel_split.lower().replace("ё", "е")
-    return [w for w in normalized.split() if w]
+    return tuple(w for w in normalized.split() if w)
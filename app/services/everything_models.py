@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple
 
 
 @dataclass
@@ -9,3 +9,30 @@ class SearchQuery:
     name: str
     drive: Optional[str]  # 'c', 'd' или None
     extensions: Optional[str] = None  # список расширений для ext: фильтра
+
+
+@dataclass(frozen=True)
+class EverythingSearchSpec:
+    """Один поисковый запрос к Everything независимо от способа выполнения."""
+
+    label: str  # regex | plain
+    text: str  # регэксп для regex, строка поиска для plain
+    regex: bool = False
+    target_type: Optional[str] = None  # folder | file | None
+    extensions: Optional[str] = None
+    drive: Optional[str] = None
+    max_results: int = 30
+
+
+@dataclass(frozen=True)
+class CompiledQuery:
+    """SearchQuery, подготовленный один раз для всех этапов поиска и выбора результата."""
+
+    target_type: str
+    name: str
+    drive: Optional[str]
+    extensions: Optional[str]
+    clean_name: str  # имя без знаков препинания
+    tokens: Tuple[str, ...]  # слова имени (CamelCase и разделители разбиты)
+    regex: Optional[str]  # шаблон для es.exe -r
+    target_norm: str  # имя для сравнения с именами файлов
@@ -1,5 +1,6 @@
 import os
 import shutil
+import struct
 import sys
 from typing import Optional
 
@@ -149,6 +150,21 @@ def resolve_everything_exe_path(
     return ""
 
 
+def resolve_everything_sdk_dll(*search_dirs: Optional[str]) -> str:
+    """Ищет Everything64.dll/Everything32.dll (SDK) рядом с es.exe/Everything.exe."""
+    dll_name = "Everything64.dll" if struct.calcsize("P") == 8 else "Everything32.dll"
+    for base_dir in search_dirs:
+        if not base_dir:
+            continue
+        for path in (
+            os.path.join(base_dir, dll_name),
+            os.path.join(base_dir, "dll", dll_name),
+        ):
+            if os.path.exists(path):
+                return os.path.normpath(path)
+    return ""
+
+
 def normalize_path(path: Optional[str]) -> Optional[str]:
     if not path:
         return None
@@ -3,11 +3,12 @@
 
 import os
 import subprocess
+import threading
 import time
 from typing import List, Optional
 
 from app.services.everything_paths import format_path_for_log
-from app.services.everything_state import _UNSET
+from app.services.everything_state import _UNSET, invalidate_runtime_cache
 
 
 def ensure_everything_running(
@@ -165,7 +166,8 @@ def _start_everything_ui(
             args += ["-instance", runtime.instance_name]
         if use_startup_flag:
             args.append("-startup")
-        subprocess.Popen(
+        invalidate_runtime_cache(runtime)
+        proc = subprocess.Popen(
             args,
             cwd=os.path.dirname(runtime.everything_path),
             stdout=subprocess.DEVNULL,
@@ -173,6 +175,8 @@ def _start_everything_ui(
             creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
             startupinfo=startupinfo,
         )
+        _watch_process_exit(runtime, proc)
+        runtime._launched_process = proc
         if mark_started:
             _mark_started_instance(runtime)
         reason = f", {log_reason}" if log_reason else ""
@@ -188,6 +192,19 @@ def _start_everything_ui(
         return False
 
 
+def _watch_process_exit(runtime, proc) -> None:
+    """Сбрасывает кэш готовности, когда запущенный нами Everything завершается."""
+
+    def _wait():
+        try:
+            code = proc.wait()
+        except Exception:
+            return
+        invalidate_runtime_cache(runtime, f"процесс Everything завершился (код {code})")
+
+    threading.Thread(target=_wait, name="everything-exit-watch", daemon=True).start()
+
+
 def _make_startupinfo():
     startupinfo = None
     if hasattr(subprocess, "STARTUPINFO"):
@@ -441,6 +458,7 @@ def _stop_everything_instance(runtime, instance_name: Optional[str]) -> bool:
         args += ["-instance", instance_name]
         label = instance_name
     args.append("-exit")
+    invalidate_runtime_cache(runtime)
     try:
         result = subprocess.run(
             args,
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Кэш результатов голосового поиска с проверкой по файловой системе."""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from app.services.everything_models import CompiledQuery
+
+RESULT_CACHE_MAX_ITEMS = 64
+
+
+@dataclass(frozen=True)
+class CachedSearchResult:
+    query: CompiledQuery
+    best_path: str
+    candidates: Tuple[str, ...]
+    is_dir: bool
+    parent_mtime: Optional[float]
+    stored_at: float
+
+
+def _parent_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(os.path.dirname(path.rstrip("\\/")) or path).st_mtime
+    except OSError:
+        return None
+
+
+class SearchResultCache:
+    """
+    LRU по CompiledQuery (имя, тип, диск, расширения) плюс индекс по
+    нормализованной фразе, чтобы повтор той же команды обходился без Gemini.
+    Перед выдачей запись проверяется: путь существует, тип совпадает и
+    родительская папка не менялась (иначе рядом мог появиться лучший кандидат).
+    Непрошедшая проверку запись удаляется.
+    """
+
+    def __init__(self, max_items: int = RESULT_CACHE_MAX_ITEMS, log_func=None) -> None:
+        self.max_items = max_items
+        self.log = log_func or (lambda _msg: None)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CompiledQuery, CachedSearchResult]" = OrderedDict()
+        self._by_text: "OrderedDict[str, CompiledQuery]" = OrderedDict()
+
+    def get(self, query: CompiledQuery) -> Optional[CachedSearchResult]:
+        with self._lock:
+            entry = self._entries.get(query)
+        if entry is None:
+            return None
+        if not self._is_valid(entry):
+            self.log(f"Кэш поиска устарел для '{query.name}', ищу заново.")
+            self.evict(query)
+            return None
+        with self._lock:
+            if query in self._entries:
+                self._entries.move_to_end(query)
+        return entry
+
+    def get_by_text(self, text_key: str) -> Optional[CachedSearchResult]:
+        if not text_key:
+            return None
+        with self._lock:
+            query = self._by_text.get(text_key)
+            if query is not None:
+                self._by_text.move_to_end(text_key)
+        if query is None:
+            return None
+        entry = self.get(query)
+        if entry is None:
+            with self._lock:
+                self._by_text.pop(text_key, None)
+        return entry
+
+    def put(
+        self,
+        query: CompiledQuery,
+        best_path: str,
+        candidates,
+        text_key: Optional[str] = None,
+    ) -> None:
+        if not best_path:
+            return
+        entry = CachedSearchResult(
+            query=query,
+            best_path=best_path,
+            candidates=tuple(candidates or ()),
+            is_dir=os.path.isdir(best_path),
+            parent_mtime=_parent_mtime(best_path),
+            stored_at=time.time(),
+        )
+        with self._lock:
+            self._entries[query] = entry
+            self._entries.move_to_end(query)
+            if text_key:
+                self._by_text[text_key] = query
+                self._by_text.move_to_end(text_key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+            while len(self._by_text) > self.max_items * 2:
+                self._by_text.popitem(last=False)
+
+    def remember_text(self, text_key: str, query: CompiledQuery) -> None:
+        """Связывает ещё одну формулировку команды с уже закэшированным запросом."""
+        if not text_key:
+            return
+        with self._lock:
+            if query not in self._entries:
+                return
+            self._by_text[text_key] = query
+            self._by_text.move_to_end(text_key)
+            while len(self._by_text) > self.max_items * 2:
+                self._by_text.popitem(last=False)
+
+    def evict(self, query: CompiledQuery) -> None:
+        with self._lock:
+            self._entries.pop(query, None)
+            for text_key in [key for key, value in self._by_text.items() if value == query]:
+                self._by_text.pop(text_key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_text.clear()
+
+    @staticmethod
+    def _is_valid(entry: CachedSearchResult) -> bool:
+        path = entry.best_path
+        if not os.path.exists(path):
+            return False
+        if os.path.isdir(path) != entry.is_dir:
+            return False
+        return _parent_mtime(path) == entry.parent_mtime
@@ -22,6 +22,7 @@ class EverythingRuntime:
     update_paths = everything_state.update_paths
     _normalize_path = everything_state.normalize_path_value
     _is_internal_everything_path = everything_state.is_internal_everything_path_value
+    invalidate_runtime_cache = everything_state.invalidate_runtime_cache
 
     ensure_everything_running = everything_process.ensure_everything_running
     _start_everything = everything_process._start_everything
@@ -41,6 +42,7 @@ class EverythingRuntime:
     _wait_for_everything = everything_process._wait_for_everything
 
     is_everything_running = everything_instances.is_everything_running
+    get_process_inspector = everything_instances.get_process_inspector
     is_everything_process_running = everything_instances.is_everything_process_running
     _is_everything_running = everything_instances._is_everything_running
     _is_instance_running = everything_instances._is_instance_running
@@ -50,6 +52,9 @@ class EverythingRuntime:
         everything_instances._get_running_instance_candidates
     )
     _get_everything_command_lines = everything_instances._get_everything_command_lines
+    _query_everything_command_lines = (
+        everything_instances._query_everything_command_lines
+    )
     _is_service_cmdline = everything_instances._is_service_cmdline
     _is_service_running = everything_instances._is_service_running
     _extract_instance_from_cmdline = everything_instances._extract_instance_from_cmdline
@@ -60,6 +65,8 @@ class EverythingRuntime:
     is_everything_ready = everything_ipc.is_everything_ready
     _probe_es_ready = everything_ipc._probe_es_ready
     _probe_es_ready_for_instance = everything_ipc._probe_es_ready_for_instance
+    _run_es_probe = everything_ipc._run_es_probe
     _wait_for_es_ready = everything_ipc._wait_for_es_ready
+    _probe_candidates = everything_ipc._probe_candidates
     _find_ready_running_instance = everything_ipc._find_ready_running_instance
     _log_ipc_hint = everything_ipc._log_ipc_hint
@@ -2,52 +2,42 @@ import os
 import re
 from typing import Callable, List, Optional, Tuple
 
-from app.services.everything_es import run_es_search
+from app.services.everything_backends import EverythingBackend, EverythingSdkBackend
+from app.services.everything_es import EsExeBackend, run_es_search
 from app.services.everything_file_filters import detect_file_filter
 from app.services.everything_gemini import normalize_search_query
+from app.services.everything_local_query import (
+    has_all_drives_intent,
+    has_file_intent,
+    has_folder_intent,
+    normalize_intent_text,
+)
 from app.services.everything_match import (
-    build_regex_pattern,
+    compile_query,
     select_best_path,
     strip_punctuation,
 )
+from app.services.everything_models import CompiledQuery
+from app.services.everything_result_cache import CachedSearchResult, SearchResultCache
 from app.services.everything_paths import (
     ES_EXE_PATH,
     EVERYTHING_EXE_PATH,
     format_path_for_log,
+    resolve_everything_sdk_dll,
 )
 from app.services.everything_runtime import EverythingRuntime
 
-FOLDER_KEYWORDS = ("папк", "каталог", "директори")
-FILE_KEYWORD = "файл"
-ALL_DRIVES_PHRASES = ("везде", "по всем дискам", "на всех дисках")
-
-
-def _normalize_intent_text(text: str) -> str:
-    return " ".join(strip_punctuation(text).lower().split())
-
-
-def _has_folder_intent(norm_text: str) -> bool:
-    return any(keyword in norm_text for keyword in FOLDER_KEYWORDS)
-
-
-def _has_file_intent(norm_text: str) -> bool:
-    return FILE_KEYWORD in norm_text
-
-
-def _has_all_drives_intent(norm_text: str) -> bool:
-    if any(phrase in norm_text for phrase in ALL_DRIVES_PHRASES):
-        return True
-    return bool(re.search(r"\bна\s+диске\s+[a-zа-я]\s+или\s+[a-zа-я]\b", norm_text))
-
 
 class EverythingSearchHandler(EverythingRuntime):
     """
     Вынесенная логика голосового поиска через Everything (es.exe).
     Сценарий:
     1. Проверяем, что команда начинается с формы слова <найди>.
-    2. Отправляем сырой текст в Gemini 2.5 Flash для нормализации и исправления опечаток.
+    2. Разбираем текст локальными правилами; при низкой уверенности отправляем
+       его в Gemini для нормализации и исправления опечаток.
     3. Генерируем регулярное выражение по правилам заказчика.
-    4. Запускаем es.exe с флагами /ad (папки) или /a-d (файлы) и ограничением результатов.
+    4. Ищем через Everything SDK (если доступен) или es.exe с флагами /ad (папки)
+       или /a-d (файлы) и ограничением результатов.
     5. Возвращаем найденные пути.
     """
 
@@ -59,6 +49,30 @@ class EverythingSearchHandler(EverythingRuntime):
     ):
         super().__init__(log_func, es_path=es_path, everything_path=everything_path)
         self._trigger_re = re.compile(r"^\s*найд[а-яa-z]*", flags=re.IGNORECASE)
+        # Подменяемый бэкенд (например, FakeEverythingBackend в тестах)
+        self.search_backend: Optional[EverythingBackend] = None
+        self._sdk_backend: Optional[EverythingSdkBackend] = None
+        # Локальный индекс файлов: запасной путь, если Everything недоступен
+        self.local_index: Optional[EverythingBackend] = None
+        self.result_cache = SearchResultCache(log_func=log_func)
+        # GeminiTelemetryStore для вызовов нормализации запроса
+        self.telemetry = None
+
+    def _select_backend(self) -> EverythingBackend:
+        """SDK держит IPC-соединение внутри процесса; es.exe - запасной путь."""
+        dll_path = resolve_everything_sdk_dll(
+            os.path.dirname(self.es_path) if self.es_path else None,
+            os.path.dirname(self.everything_path) if self.everything_path else None,
+        )
+        sdk = self._sdk_backend
+        if sdk is None or sdk.dll_path != dll_path or sdk.instance_name != self.instance_name:
+            if sdk is not None:
+                sdk.close()
+            sdk = EverythingSdkBackend(dll_path, self.instance_name, log_func=self.log)
+            self._sdk_backend = sdk
+        if sdk.is_available():
+            return sdk
+        return EsExeBackend(self.log, self.es_path, self.instance_name)
 
     def looks_like_search(self, text: str) -> bool:
         """Быстрая проверка наличия триггера, чтобы не дергать Gemini без повода."""
@@ -93,11 +107,15 @@ class EverythingSearchHandler(EverythingRuntime):
         if status_cb:
             status_cb("Обрабатываю голосовой поиск...", accent, True)
 
-        query = normalize_search_query(self.log, client, text)
-        norm_text = _normalize_intent_text(text)
-        wants_folder = _has_folder_intent(norm_text)
-        wants_file = _has_file_intent(norm_text)
-        wants_all_drives = _has_all_drives_intent(norm_text)
+        norm_text = normalize_intent_text(text)
+        cached = self.result_cache.get_by_text(norm_text)
+        if cached is not None:
+            return self._open_cached_result(cached, status_cb, accent, open_cb, cancel_check)
+
+        query = normalize_search_query(self.log, client, text, telemetry=self.telemetry)
+        wants_folder = has_folder_intent(norm_text)
+        wants_file = has_file_intent(norm_text)
+        wants_all_drives = has_all_drives_intent(norm_text)
         if cancel_check and cancel_check():
             self.log("Отмена поиска пользователем.")
             return True, []
@@ -133,15 +151,31 @@ class EverythingSearchHandler(EverythingRuntime):
                     "Запрошена папка - игнорируем фильтр по расширениям, чтобы не переключаться на поиск файлов."
                 )
 
-        pattern = build_regex_pattern(query.name, query.target_type) if query.name else None
-        if not pattern and not query.extensions:
+        compiled = compile_query(query)
+        if not compiled.regex and not compiled.extensions:
             if status_cb:
                 status_cb("Не получилось построить запрос поиска", warning, False)
             return True, []
 
+        cached = self.result_cache.get(compiled)
+        if cached is not None:
+            self.result_cache.remember_text(norm_text, compiled)
+            return self._open_cached_result(cached, status_cb, accent, open_cb, cancel_check)
+
+        if self.search_backend is not None:
+            paths = self._run_search(compiled, self.search_backend)
+            return self._open_best_result(
+                paths, compiled, norm_text, status_cb, accent, warning, open_cb, cancel_check
+            )
+
         if not os.path.exists(self.es_path):
             path_label = format_path_for_log(self.es_path) or str(self.es_path)
             self.log(f"es.exe не найден по пути: {path_label}")
+            if self._local_index_ready():
+                paths = self._search_local_index(compiled)
+                return self._open_best_result(
+                    paths, compiled, norm_text, status_cb, accent, warning, open_cb, cancel_check
+                )
             if status_cb:
                 status_cb("Поисковик Everything не найден", warning, False)
             return True, []
@@ -155,19 +189,89 @@ class EverythingSearchHandler(EverythingRuntime):
                 self.log(f"Everything недоступен: {self.last_es_error}")
             else:
                 self.log("Everything недоступен, поиск невозможен.")
+            if self._local_index_ready():
+                paths = self._search_local_index(compiled)
+                return self._open_best_result(
+                    paths, compiled, norm_text, status_cb, accent, warning, open_cb, cancel_check
+                )
             if status_cb:
                 status_cb("Поисковик Everything недоступен", warning, False)
             return True, []
 
-        paths = run_es_search(self.log, self.es_path, self.instance_name, pattern, query)
+        backend = self._select_backend()
+        paths = self._run_search(compiled, backend)
+        if backend.last_error:
+            # Следующий поиск заново проверит готовность Everything
+            self.invalidate_runtime_cache(f"ошибка поиска ({backend.last_error})")
+        return self._open_best_result(
+            paths, compiled, norm_text, status_cb, accent, warning, open_cb, cancel_check
+        )
 
+    def start_local_index(self) -> None:
+        """Запускает обход локального индекса; вызывается, когда Everything недоступен."""
+        start = getattr(self.local_index, "start", None)
+        if start is not None:
+            start()
+
+    def _local_index_ready(self) -> bool:
+        if self.local_index is None:
+            return False
+        self.start_local_index()
+        return self.local_index.is_available()
+
+    def _search_local_index(self, compiled: CompiledQuery) -> List[str]:
+        self.log("Ищу по локальному индексу файлов вместо Everything.")
+        return self._run_search(compiled, self.local_index)
+
+    def _run_search(self, compiled: CompiledQuery, backend: EverythingBackend) -> List[str]:
+        return run_es_search(
+            self.log, self.es_path, self.instance_name, compiled, backend=backend
+        )
+
+    def _open_cached_result(
+        self,
+        cached: CachedSearchResult,
+        status_cb,
+        accent: str,
+        open_cb,
+        cancel_check,
+    ) -> Tuple[bool, List[str]]:
+        query = cached.query
+        path_label = format_path_for_log(cached.best_path) or str(cached.best_path)
+        self.log(f"Результат поиска взят из кэша: {path_label}")
+        if status_cb:
+            disk_info = f" на диске {query.drive.upper()}" if query.drive else ""
+            status_cb(f"Нашёл {query.target_type}: {query.name}{disk_info}", accent, False)
+        if open_cb:
+            try:
+                if cancel_check and cancel_check():
+                    self.log("Отмена открытия результата поиска пользователем.")
+                    return True, list(cached.candidates)
+                open_cb(cached.best_path)
+            except Exception as e:
+                self.log(f"Ошибка открытия результата '{path_label}': {e}")
+        return True, list(cached.candidates)
+
+    def _open_best_result(
+        self,
+        paths: List[str],
+        query: CompiledQuery,
+        text_key: str,
+        status_cb,
+        accent: str,
+        warning: str,
+        open_cb,
+        cancel_check,
+    ) -> Tuple[bool, List[str]]:
         if not paths:
-            self.log(f"Ничего не найдено для '{query.name}' (шаблон: {pattern})")
+            self.log(f"Ничего не найдено для '{query.name}' (шаблон: {query.regex})")
             if status_cb:
                 status_cb(f"Не найдено: {query.name}", warning, False)
             return True, []
 
-        best_path = select_best_path(paths, query.name, drive=query.drive, log_func=self.log)
+        best_path = select_best_path(
+            paths, query.name, drive=query.drive, log_func=self.log, compiled=query
+        )
         if not best_path:
             self.log("Не удалось выбрать подходящий результат: имя отсутствует или нет совпадений.")
             if status_cb:
@@ -175,6 +279,7 @@ class EverythingSearchHandler(EverythingRuntime):
             return True, []
 
         top = best_path
+        self.result_cache.put(query, best_path, paths, text_key=text_key)
         if status_cb:
             disk_info = f" на диске {query.drive.upper()}" if query.drive else ""
             status_cb(f"Нашёл {query.target_type}: {query.name}{disk_info}", accent, False)
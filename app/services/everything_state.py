@@ -2,7 +2,9 @@
 """Состояние и пути Everything Runtime."""
 
 import os
-from typing import Callable, Optional
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
 
 from app.services.everything_paths import (
     ES_EXE_PATH,
@@ -18,6 +20,11 @@ from app.services.everything_paths import (
 
 _UNSET = object()
 
+# Пока Everything заведомо исправен, голосовой поиск не запускает процессов:
+# готовность и командные строки берутся из кэша до истечения TTL или события
+READY_CACHE_TTL_S = 30.0
+CMDLINE_CACHE_TTL_S = 5.0
+
 
 def init_runtime(
     runtime,
@@ -40,9 +47,18 @@ def init_runtime(
     runtime._started_instances = []
     runtime._cmdline_source = None
     runtime._cmdline_count = None
+    # Подменяемый источник списка процессов (FakeProcessInspector в тестах)
+    runtime.process_inspector = None
+    # Последний запущенный нами Everything: ожидание готовности следит за его выходом
+    runtime._launched_process = None
     runtime._autostart_block_until = 0.0
     runtime._autostart_block_reason = ""
     runtime._autostart_block_logged = False
+    runtime._state_lock = threading.Lock()
+    runtime._ready_cache = {}
+    runtime._cmdline_cache = None
+    runtime.ready_cache_ttl_s = READY_CACHE_TTL_S
+    runtime.cmdline_cache_ttl_s = CMDLINE_CACHE_TTL_S
 
 
 def update_paths(runtime, base_dir: Optional[str] = None) -> None:
@@ -87,6 +103,49 @@ def update_paths(runtime, base_dir: Optional[str] = None) -> None:
         runtime._fallback_default_logged = False
 
 
+def get_cached_ready(runtime, instance_name: Optional[str]) -> bool:
+    with runtime._state_lock:
+        expires_at = runtime._ready_cache.get(instance_name)
+        if expires_at is None:
+            return False
+        if time.monotonic() >= expires_at:
+            runtime._ready_cache.pop(instance_name, None)
+            return False
+        return True
+
+
+def store_ready(runtime, instance_name: Optional[str]) -> None:
+    with runtime._state_lock:
+        runtime._ready_cache[instance_name] = time.monotonic() + runtime.ready_cache_ttl_s
+
+
+def get_cached_command_lines(runtime) -> Optional[List[str]]:
+    with runtime._state_lock:
+        entry: Optional[Tuple[float, List[str]]] = runtime._cmdline_cache
+        if entry is None or time.monotonic() >= entry[0]:
+            runtime._cmdline_cache = None
+            return None
+        return list(entry[1])
+
+
+def store_command_lines(runtime, lines: List[str]) -> None:
+    with runtime._state_lock:
+        runtime._cmdline_cache = (
+            time.monotonic() + runtime.cmdline_cache_ttl_s,
+            list(lines),
+        )
+
+
+def invalidate_runtime_cache(runtime, reason: str = "") -> None:
+    """Сбрасывает кэш готовности и командных строк (процесс завершился, поиск упал)."""
+    with runtime._state_lock:
+        had_ready = bool(runtime._ready_cache)
+        runtime._ready_cache.clear()
+        runtime._cmdline_cache = None
+    if had_ready and reason:
+        runtime.log(f"Кэш состояния Everything сброшен: {reason}")
+
+
 def normalize_path_value(runtime, path: Optional[str]) -> Optional[str]:
     return normalize_path(path)
 
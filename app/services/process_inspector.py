@@ -0,0 +1,484 @@
+# -*- coding: utf-8 -*-
+"""Перечисление процессов за один проход: psutil, Toolhelp32 (ctypes) или tasklist/PowerShell."""
+
+import csv
+import ctypes
+import io
+import os
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+@dataclass(frozen=True)
+class ProcessInfo:
+    pid: int
+    name: str
+    cmdline: Optional[str] = None
+
+
+def _normalize_names(names: Optional[Iterable[str]]) -> Optional[Set[str]]:
+    if names is None:
+        return None
+    return {name.lower() for name in names if name}
+
+
+class ProcessInspector(ABC):
+    """
+    Возвращает процессы (pid, имя и по запросу командную строку) одним
+    снимком. names ограничивает выборку по имени exe без учёта регистра.
+    """
+
+    name = "base"
+
+    def __init__(self) -> None:
+        # Откуда получены командные строки в последнем вызове (для логов)
+        self.last_cmdline_source: Optional[str] = None
+
+    @abstractmethod
+    def list_processes(
+        self, names: Optional[Iterable[str]] = None, with_cmdline: bool = False
+    ) -> List[ProcessInfo]:
+        """Снимок процессов; реализуется каждым бэкендом."""
+
+    def is_running(self, names: Iterable[str]) -> bool:
+        return bool(self.list_processes(names))
+
+    def _fill_missing_cmdlines(self, result: List[ProcessInfo]) -> List[ProcessInfo]:
+        """
+        Командные строки, которые бэкенд не смог прочитать (нет прав, например
+        у Everything, запущенного от администратора), добирает одним вызовом
+        PowerShell/WMIC, как прежний способ.
+        """
+        self.last_cmdline_source = self.name
+        missing = {info.name for info in result if info.cmdline is None}
+        if not missing or os.name != "nt":
+            return result
+        _, shell_infos = query_cmdlines_via_shell(missing)
+        by_pid = {info.pid: info.cmdline for info in shell_infos}
+        if by_pid:
+            self.last_cmdline_source = f"{self.name}+shell"
+        return [
+            info
+            if info.cmdline is not None
+            else ProcessInfo(info.pid, info.name, by_pid.get(info.pid))
+            for info in result
+        ]
+
+
+class FakeProcessInspector(ProcessInspector):
+    """Подменяемый список процессов для тестов и отладки без Windows."""
+
+    name = "fake"
+
+    def __init__(self, processes: Iterable[ProcessInfo] = ()) -> None:
+        super().__init__()
+        self.processes: List[ProcessInfo] = list(processes)
+        self.calls = 0
+
+    def list_processes(
+        self, names: Optional[Iterable[str]] = None, with_cmdline: bool = False
+    ) -> List[ProcessInfo]:
+        self.calls += 1
+        wanted = _normalize_names(names)
+        result = []
+        for info in self.processes:
+            if wanted is not None and info.name.lower() not in wanted:
+                continue
+            result.append(info if with_cmdline else ProcessInfo(info.pid, info.name))
+        self.last_cmdline_source = self.name if with_cmdline else None
+        return result
+
+
+class PsutilProcessInspector(ProcessInspector):
+    name = "psutil"
+
+    def __init__(self, psutil_module) -> None:
+        super().__init__()
+        self._psutil = psutil_module
+
+    def list_processes(
+        self, names: Optional[Iterable[str]] = None, with_cmdline: bool = False
+    ) -> List[ProcessInfo]:
+        wanted = _normalize_names(names)
+        attrs = ["pid", "name"] + (["cmdline"] if with_cmdline else [])
+        result = []
+        for proc in self._psutil.process_iter(attrs):
+            info = proc.info
+            proc_name = info.get("name") or ""
+            if wanted is not None and proc_name.lower() not in wanted:
+                continue
+            cmdline = None
+            # None - psutil не смог прочитать командную строку (AccessDenied)
+            if with_cmdline and info.get("cmdline") is not None:
+                cmdline = subprocess.list2cmdline(info["cmdline"])
+            result.append(ProcessInfo(info["pid"], proc_name, cmdline))
+        if not with_cmdline:
+            self.last_cmdline_source = None
+            return result
+        return self._fill_missing_cmdlines(result)
+
+
+class _PROCESSENTRY32W(ctypes.Structure):
+    _fields_ = [
+        ("dwSize", ctypes.c_uint32),
+        ("cntUsage", ctypes.c_uint32),
+        ("th32ProcessID", ctypes.c_uint32),
+        ("th32DefaultHeapID", ctypes.c_size_t),
+        ("th32ModuleID", ctypes.c_uint32),
+        ("cntThreads", ctypes.c_uint32),
+        ("th32ParentProcessID", ctypes.c_uint32),
+        ("pcPriClassBase", ctypes.c_long),
+        ("dwFlags", ctypes.c_uint32),
+        ("szExeFile", ctypes.c_wchar * 260),
+    ]
+
+
+class _UNICODE_STRING(ctypes.Structure):
+    _fields_ = [
+        ("Length", ctypes.c_ushort),
+        ("MaximumLength", ctypes.c_ushort),
+        ("Buffer", ctypes.c_void_p),
+    ]
+
+
+TH32CS_SNAPPROCESS = 0x00000002
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+PROCESS_COMMAND_LINE_INFORMATION = 60  # Windows 8.1+
+STATUS_INFO_LENGTH_MISMATCH = 0xC0000004
+INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+
+class WindowsProcessInspector(ProcessInspector):
+    """
+    Имена и pid - снимок Toolhelp32, командные строки - NtQueryInformationProcess
+    без запуска внешних процессов. Если командную строку прочитать не удалось
+    (нет прав), берём её одним вызовом PowerShell/WMIC для всех нужных имён.
+    """
+
+    name = "toolhelp32"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self._ntdll = ctypes.WinDLL("ntdll")
+        self._kernel32.CreateToolhelp32Snapshot.restype = ctypes.c_void_p
+        self._kernel32.CreateToolhelp32Snapshot.argtypes = [ctypes.c_uint32, ctypes.c_uint32]
+        self._kernel32.Process32FirstW.argtypes = [
+            ctypes.c_void_p,
+            ctypes.POINTER(_PROCESSENTRY32W),
+        ]
+        self._kernel32.Process32NextW.argtypes = [
+            ctypes.c_void_p,
+            ctypes.POINTER(_PROCESSENTRY32W),
+        ]
+        self._kernel32.OpenProcess.restype = ctypes.c_void_p
+        self._kernel32.OpenProcess.argtypes = [ctypes.c_uint32, ctypes.c_int, ctypes.c_uint32]
+        self._kernel32.CloseHandle.argtypes = [ctypes.c_void_p]
+        self._ntdll.NtQueryInformationProcess.restype = ctypes.c_uint32
+        self._ntdll.NtQueryInformationProcess.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_uint32,
+            ctypes.c_void_p,
+            ctypes.c_uint32,
+            ctypes.POINTER(ctypes.c_uint32),
+        ]
+
+    def list_processes(
+        self, names: Optional[Iterable[str]] = None, with_cmdline: bool = False
+    ) -> List[ProcessInfo]:
+        wanted = _normalize_names(names)
+        entries = [
+            (pid, exe)
+            for pid, exe in self._snapshot()
+            if wanted is None or exe.lower() in wanted
+        ]
+        if not with_cmdline:
+            self.last_cmdline_source = None
+            return [ProcessInfo(pid, exe) for pid, exe in entries]
+
+        result = [
+            ProcessInfo(pid, exe, self._read_cmdline(pid)) for pid, exe in entries
+        ]
+        return self._fill_missing_cmdlines(result)
+
+    def _snapshot(self) -> List[tuple]:
+        snapshot = self._kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0)
+        if not snapshot or snapshot == INVALID_HANDLE_VALUE:
+            raise ctypes.WinError(ctypes.get_last_error())
+        try:
+            entry = _PROCESSENTRY32W()
+            entry.dwSize = ctypes.sizeof(_PROCESSENTRY32W)
+            processes = []
+            ok = self._kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+            while ok:
+                processes.append((int(entry.th32ProcessID), entry.szExeFile))
+                ok = self._kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+            return processes
+        finally:
+            self._kernel32.CloseHandle(snapshot)
+
+    def _read_cmdline(self, pid: int) -> Optional[str]:
+        handle = self._kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            size = ctypes.c_uint32(0)
+            status = self._ntdll.NtQueryInformationProcess(
+                handle, PROCESS_COMMAND_LINE_INFORMATION, None, 0, ctypes.byref(size)
+            )
+            if status != STATUS_INFO_LENGTH_MISMATCH or not size.value:
+                return None
+            buffer = ctypes.create_string_buffer(size.value)
+            status = self._ntdll.NtQueryInformationProcess(
+                handle,
+                PROCESS_COMMAND_LINE_INFORMATION,
+                buffer,
+                size,
+                ctypes.byref(size),
+            )
+            if status != 0:
+                return None
+            text = ctypes.cast(buffer, ctypes.POINTER(_UNICODE_STRING)).contents
+            if not text.Buffer or not text.Length:
+                return ""
+            return ctypes.wstring_at(text.Buffer, text.Length // 2)
+        except Exception:
+            return None
+        finally:
+            self._kernel32.CloseHandle(handle)
+
+
+class ShellProcessInspector(ProcessInspector):
+    """Прежний способ: tasklist для имён и PowerShell/WMIC для командных строк."""
+
+    name = "tasklist"
+
+    def list_processes(
+        self, names: Optional[Iterable[str]] = None, with_cmdline: bool = False
+    ) -> List[ProcessInfo]:
+        wanted = _normalize_names(names)
+        if with_cmdline and wanted:
+            source, result = query_cmdlines_via_shell(wanted)
+            self.last_cmdline_source = source
+            return result
+        self.last_cmdline_source = None
+        try:
+            output = subprocess.run(
+                ["tasklist", "/FO", "CSV", "/NH"],
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                errors="ignore",
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+                timeout=5,
+            ).stdout
+        except Exception:
+            return []
+        result = []
+        for row in csv.reader(io.StringIO(output or "")):
+            if len(row) < 2:
+                continue
+            exe, pid = row[0], row[1]
+            if wanted is not None and exe.lower() not in wanted:
+                continue
+            try:
+                result.append(ProcessInfo(int(pid), exe))
+            except ValueError:
+                continue
+        return result
+
+
+def query_cmdlines_via_shell(
+    names: Iterable[str],
+) -> Tuple[Optional[str], List[ProcessInfo]]:
+    """
+    Один вызов PowerShell (или WMIC) на все имена: pid, имя и командная строка.
+    Возвращает (источник, процессы).
+    """
+    names = sorted({name for name in names if name})
+    if not names:
+        return None, []
+    name_filter = " OR ".join(f"Name='{name}'" for name in names)
+    commands = [
+        (
+            "powershell",
+            [
+                "powershell",
+                "-NoProfile",
+                "-Command",
+                (
+                    f'Get-CimInstance Win32_Process -Filter "{name_filter}" '
+                    "| Where-Object { $_.CommandLine } "
+                    "| ForEach-Object { \"$($_.ProcessId)`t$($_.Name)`t$($_.CommandLine)\" }"
+                ),
+            ],
+        ),
+        (
+            "wmic",
+            [
+                "wmic",
+                "process",
+                "where",
+                " or ".join(f"name='{name}'" for name in names),
+                "get",
+                "Name,ProcessId,CommandLine",
+                "/FORMAT:LIST",
+            ],
+        ),
+    ]
+    for source, cmd in commands:
+        try:
+            output = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                errors="ignore",
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+                timeout=3,
+            ).stdout
+        except Exception:
+            continue
+        result = (
+            _parse_powershell_rows(output) if source == "powershell" else _parse_wmic_list(output)
+        )
+        if result:
+            return source, result
+    return None, []
+
+
+def _parse_powershell_rows(output: str) -> List[ProcessInfo]:
+    result = []
+    for line in (output or "").splitlines():
+        parts = line.strip().split("\t", 2)
+        if len(parts) != 3 or not parts[2]:
+            continue
+        try:
+            result.append(ProcessInfo(int(parts[0]), parts[1], parts[2]))
+        except ValueError:
+            continue
+    return result
+
+
+def _parse_wmic_list(output: str) -> List[ProcessInfo]:
+    result = []
+    record = {}
+
+    def _flush():
+        if record.get("commandline") and record.get("processid", "").isdigit():
+            result.append(
+                ProcessInfo(
+                    int(record["processid"]), record.get("name", ""), record["commandline"]
+                )
+            )
+        record.clear()
+
+    for line in (output or "").splitlines():
+        line = line.strip()
+        if not line:
+            if record:
+                _flush()
+            continue
+        if "=" in line:
+            key, value = line.split("=", 1)
+            record[key.strip().lower()] = value.strip()
+    if record:
+        _flush()
+    return result
+
+
+def create_process_inspector() -> ProcessInspector:
+    """psutil, если установлен; иначе Toolhelp32 через ctypes; иначе tasklist."""
+    try:
+        import psutil
+
+        return PsutilProcessInspector(psutil)
+    except Exception:
+        pass
+    if os.name == "nt":
+        try:
+            return WindowsProcessInspector()
+        except Exception:
+            pass
+    return ShellProcessInspector()
+
+
+# --- Сравнение бэкендов ---
+
+BENCHMARK_NAMES = ("Everything.exe", "Everything64.exe")
+
+
+def _legacy_per_exe_check(names: Iterable[str]) -> bool:
+    """Прежняя проверка: отдельный tasklist на каждое имя exe."""
+    found = False
+    for exe in names:
+        try:
+            output = subprocess.run(
+                ["tasklist", "/FI", f"IMAGENAME eq {exe}", "/FO", "CSV", "/NH"],
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                errors="ignore",
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+                timeout=5,
+            ).stdout
+        except Exception:
+            continue
+        found = found or exe.lower() in (output or "").lower()
+    return found
+
+
+def benchmark_process_inspectors(
+    names: Iterable[str] = BENCHMARK_NAMES, repeat: int = 5
+) -> Dict[str, Optional[float]]:
+    """
+    Медиана времени (мс) проверки <запущен ли Everything> и получения командных
+    строк для каждого доступного способа, включая прежний (tasklist на каждое
+    имя, затем PowerShell/WMIC). None - способ недоступен на этой машине.
+    """
+    names = list(names)
+    cases: Dict[str, Callable[[], object]] = {}
+    try:
+        import psutil
+
+        psutil_inspector = PsutilProcessInspector(psutil)
+        cases["psutil"] = lambda: psutil_inspector.list_processes(names, True)
+    except Exception:
+        cases["psutil"] = None
+    if os.name == "nt":
+        try:
+            native = WindowsProcessInspector()
+            cases["toolhelp32"] = lambda: native.list_processes(names, True)
+        except Exception:
+            cases["toolhelp32"] = None
+        shell = ShellProcessInspector()
+        cases["tasklist (один вызов)"] = lambda: shell.list_processes(names, True)
+        cases["прежний (tasklist на имя + PowerShell)"] = lambda: (
+            _legacy_per_exe_check(names),
+            query_cmdlines_via_shell(names),
+        )
+    else:
+        cases["toolhelp32"] = None
+        cases["прежний (tasklist на имя + PowerShell)"] = None
+
+    results: Dict[str, Optional[float]] = {}
+    for label, func in cases.items():
+        if func is None:
+            results[label] = None
+            continue
+        timings = []
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000.0)
+        timings.sort()
+        results[label] = timings[len(timings) // 2]
+    return results
+
+
+if __name__ == "__main__":
+    for label, ms in benchmark_process_inspectors().items():
+        print(f"{label:40} {'недоступен' if ms is None else f'{ms:8.1f} мс'}")
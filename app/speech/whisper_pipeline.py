@@ -2,17 +2,27 @@
 """Аудио и Whisper-пайплайн: запись, VAD и обработка сегментов."""
 
 import os
-import re
 import threading
 import time
-import traceback
 
 import numpy as np
 import pyaudio
 import pyperclip
 
+from app.commands.intent_router import (
+    ROLE_FLASH,
+    ROLE_PRO,
+    ROLE_PROFILE,
+    ROLE_SELECTION,
+)
 from app.core.app_config import COLORS, WHISPER_MODELS_DIR
-from app.utils.logging_utils import log_message, log_separator
+from app.utils.logging_utils import (
+    log_debug,
+    log_message,
+    log_separator,
+    log_traceback,
+    log_warning,
+)
 
 
 def setup_audio(assistant) -> None:
@@ -288,18 +298,22 @@ def process_continuous_segment(assistant, audio_np) -> None:
             # Ограничение размера буфера для предотвращения утечки памяти
             max_buffer_size = 100
             if len(assistant.audio_buffer) >= max_buffer_size:
-                log_message(
-                    "ПРЕДУПРЕЖДЕНИЕ: Буфер непрерывной записи "
+                log_warning(
+                    "Буфер непрерывной записи "
                     f"достиг предела ({max_buffer_size}). Старый сегмент удален."
                 )
                 assistant.audio_buffer.pop(0)
 
             assistant.audio_buffer.append(text)
-            log_message(
+            log_debug(
                 f"Добавлен сегмент в буфер ({len(text)} симв.): {text[:100]}..."
             )
+            # Команда могла прозвучать в этом сегменте: начинаем разрешать её
+            # заранее, пока пользователь не закончил запись
+            assistant.command_router.prefetch(text)
     except Exception as e:
-        log_message(f"Ошибка обработки сегмента: {e}\n{traceback.format_exc()}")
+        log_message(f"Ошибка обработки сегмента: {e}")
+        log_traceback()
 
 
 def process_audio_whisper(assistant, audio_np, is_final_segment=False) -> None:
@@ -336,8 +350,7 @@ def process_audio_whisper(assistant, audio_np, is_final_segment=False) -> None:
 
         log_message("==================== WHISPER ОБРАБОТКА ====================")
         log_message(f"Выбранная модель: {model_name}")
-        log_message(f"Путь к модели: {model_path}")
-        log_message(f"Модель активна: {assistant.whisper_engine.is_ready()}")
+        log_debug(f"Путь к модели: {model_path}")
         log_message("Начало распознавания...")
         whisper_start = time.time()
 
@@ -379,20 +392,27 @@ def process_audio_whisper(assistant, audio_np, is_final_segment=False) -> None:
             )
 
             # Команды проверяем сразу, чтобы "открой/найди/запусти" работали всегда.
+            # Классификация одна на всю фразу: диктовка проходит её за один проход.
             command_text = text if is_final_segment and text else final_text
+            router = assistant.command_router
+            command_intent = None
             if command_text:
-                if assistant.command_router.handle_website_command(command_text):
-                    return
-                if assistant.command_router.handle_launch_command(command_text):
-                    return
-                if assistant.command_router.handle_everything_search(command_text):
+                command_intent = router.classify(command_text)
+                if command_intent.is_command and router.dispatch(
+                    command_text, command_intent
+                ):
                     return
 
-            raw_words = final_text.strip().split()
-            tokens = [
-                (re.sub(r"[^\w]", "", w, flags=re.UNICODE).lower(), w)
-                for w in raw_words
-            ]
+            if (
+                command_intent is not None
+                and not command_intent.is_command
+                and command_text == final_text
+            ):
+                intent = command_intent
+            else:
+                intent = router.classify(final_text)
+            raw_words = [raw for _, raw in intent.tokens]
+            tokens = intent.tokens
 
             def _next_meaningful(start_index):
                 """Возвращает индекс и нормализованное слово, пропуская пустые токены."""
@@ -402,7 +422,10 @@ def process_audio_whisper(assistant, audio_np, is_final_segment=False) -> None:
                         return idx, norm
                 return None, ""
 
-            first_idx, first_word = _next_meaningful(0)
+            def _roles(word):
+                return router.intent_router.roles_of(word, assistant.settings)
+
+            first_idx = intent.first_index
             if first_idx is None:
                 log_message("ОШИБКА: не удалось найти первое слово после очистки.")
                 assistant.show_status("Не распознано", COLORS["btn_warning"], False)
@@ -416,18 +439,6 @@ def process_audio_whisper(assistant, audio_np, is_final_segment=False) -> None:
             prompt_override = None
             direct_model_trigger = False
 
-            pro_word = (assistant.settings.get("pro_word", "про") or "про").strip().lower()
-            flash_word = (
-                (assistant.settings.get("flash_word", "флеш") or "флеш")
-                .strip()
-                .lower()
-            )
-            selection_word = (
-                (assistant.settings.get("selection_word", "выделить") or "выделить")
-                .strip()
-                .lower()
-            )
-
             prompts = assistant.settings.get("gemini_prompts", {})
             if not isinstance(prompts, dict):
                 prompts = {}
@@ -439,17 +450,17 @@ def process_audio_whisper(assistant, audio_np, is_final_segment=False) -> None:
             selected_profile_name = profile_lookup.get(selected_profile_setting)
 
             # --- Обработка выделения (отдельный режим) ---
-            if first_word == selection_word:
+            if intent.first_role == ROLE_SELECTION:
                 use_selected_text = True
                 words_to_skip = first_idx + 1
                 next_idx, next_word = _next_meaningful(words_to_skip)
                 if next_idx is not None and next_word:
-                    if next_word == pro_word:
+                    if ROLE_PRO in _roles(next_word):
                         use_pro_model = True
                         direct_model_trigger = True
                         words_to_skip = next_idx + 1
                         log_message("Включено условие 'Выделить Pro'")
-                    elif next_word == flash_word:
+                    elif ROLE_FLASH in _roles(next_word):
                         use_flash_model = True
                         use_pro_model = False
                         direct_model_trigger = True
@@ -460,7 +471,11 @@ def process_audio_whisper(assistant, audio_np, is_final_segment=False) -> None:
                     log_message("Включено условие 'Выделить' (по умолчанию Pro)")
             else:
                 # --- Обработка профиля промпта ---
-                profile_match = profile_lookup.get(first_word)
+                profile_match = (
+                    intent.profile_name
+                    if intent.first_role == ROLE_PROFILE
+                    else None
+                )
                 if profile_match:
                     active_profile_name = profile_match
                     prompt_override = prompts.get(profile_match, "")
@@ -483,7 +498,7 @@ def process_audio_whisper(assistant, audio_np, is_final_segment=False) -> None:
                     # Ищем следующее значимое слово (пропуская знаки препинания) для выбора модели
                     next_idx, next_word = _next_meaningful(words_to_skip)
                     if next_idx is not None and next_word:
-                        if next_word == pro_word:
+                        if ROLE_PRO in _roles(next_word):
                             if profile_lower == "диктовка":
                                 log_message(
                                     "Профиль 'Диктовка' всегда использует Flash, команда Pro проигнорирована"
@@ -496,7 +511,7 @@ def process_audio_whisper(assistant, audio_np, is_final_segment=False) -> None:
                                     f"Профиль '{active_profile_name}' с командой Pro"
                                 )
                             words_to_skip = next_idx + 1
-                        elif next_word == flash_word:
+                        elif ROLE_FLASH in _roles(next_word):
                             use_flash_model = True
                             use_pro_model = False
                             direct_model_trigger = True
@@ -510,12 +525,12 @@ def process_audio_whisper(assistant, audio_np, is_final_segment=False) -> None:
                         use_pro_model = False
                 else:
                     # --- Прямые переключатели без профиля ---
-                    if first_word == pro_word:
+                    if intent.first_role == ROLE_PRO:
                         use_pro_model = True
                         direct_model_trigger = True
                         words_to_skip = first_idx + 1
                         log_message("Включено условие Gemini Pro")
-                    elif first_word == flash_word:
+                    elif intent.first_role == ROLE_FLASH:
                         use_flash_model = True
                         direct_model_trigger = True
                         words_to_skip = first_idx + 1
@@ -571,10 +586,8 @@ def process_audio_whisper(assistant, audio_np, is_final_segment=False) -> None:
                 ),
             ).start()
     except Exception as e:
-        log_message(
-            "КРИТИЧЕСКАЯ ОШИБКА обработки Whisper: "
-            f"{e}\n{traceback.format_exc()}"
-        )
+        log_message(f"КРИТИЧЕСКАЯ ОШИБКА обработки Whisper: {e}")
+        log_traceback()
         assistant.show_status("Ошибка Whisper", COLORS["btn_warning"], False)
         assistant.play_sound("error")
         threading.Timer(
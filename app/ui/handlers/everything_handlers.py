@@ -29,6 +29,8 @@ def on_everything_clear(window) -> None:
 
 
 def on_everything_check(window) -> None:
+    # Ручная проверка всегда опрашивает Everything заново
+    window.assistant.search_handler.invalidate_runtime_cache()
     refresh_everything_status(window, startup_check=True)
 
 
@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
 """Обработчики истории и логов."""
 
+import html
 import os
+import re
+import threading
 
-from PySide6.QtCore import QUrl
+from PySide6.QtCore import QTimer, QUrl
 from PySide6.QtGui import QDesktopServices, QFont
 
 from app.core.app_config import COLORS, HISTORY_FILE, LOG_FILE
-from app.utils.logging_utils import log_message
+from app.core.history_store import search_terms
+from app.utils.logging_utils import log_message, set_log_level
 from app.ui.ui_dialogs import HistoryViewerWindow, LogViewerWindow
 
 
@@ -20,7 +24,9 @@ def update_history_combo(window) -> None:
 
 def open_log_viewer(window) -> None:
     if window.log_viewer is None or not window.log_viewer.isVisible():
-        window.log_viewer = LogViewerWindow(LOG_FILE, window)
+        window.log_viewer = LogViewerWindow(
+            LOG_FILE, window, clear_log_func=window.assistant.clear_log_file
+        )
         width = window.assistant.settings.get("log_window_width")
         height = window.assistant.settings.get("log_window_height")
         font_size = window.assistant.settings.get("log_font_size")
@@ -32,6 +38,13 @@ def open_log_viewer(window) -> None:
     window.log_viewer.load_logs()
 
 
+def on_verbose_logs_changed(window, state) -> None:
+    level = set_log_level("debug" if state else "info")
+    window.assistant.save_setting("log_level", level)
+    status = "включены" if level == "debug" else "выключены"
+    window.assistant.show_status(f"Подробные логи {status}", COLORS["accent"], False)
+
+
 def clear_logs(window) -> None:
     window.assistant.clear_log_file()
     if window.log_viewer and window.log_viewer.isVisible():
@@ -42,21 +55,26 @@ def clear_logs(window) -> None:
 def show_selected_history(window) -> None:
     current_data = window.history_combo.currentData()
     if current_data:
-        if window.history_viewer is None or not window.history_viewer.isVisible():
-            window.history_viewer = HistoryViewerWindow(current_data, window)
-            width = window.assistant.settings.get("history_window_width")
-            height = window.assistant.settings.get("history_window_height")
-            font_size = window.assistant.settings.get("history_font_size", 10)
-            window.history_viewer.resize(width, height)
-            window.history_viewer.text_edit.setFont(QFont("Consolas", font_size))
-        else:
-            window.history_viewer.text_edit.setPlainText(current_data)
-        window.history_viewer.show()
+        _show_history_text(window, current_data)
+
+
+def _show_history_text(window, text: str) -> None:
+    if window.history_viewer is None or not window.history_viewer.isVisible():
+        window.history_viewer = HistoryViewerWindow(text, window)
+        width = window.assistant.settings.get("history_window_width")
+        height = window.assistant.settings.get("history_window_height")
+        font_size = window.assistant.settings.get("history_font_size", 10)
+        window.history_viewer.resize(width, height)
+        window.history_viewer.text_edit.setFont(QFont("Consolas", font_size))
+    else:
+        window.history_viewer.text_edit.setPlainText(text)
+    window.history_viewer.show()
 
 
 def clear_history(window) -> None:
     window.assistant.clear_history_file()
     update_history_combo(window)
+    run_history_search(window)
     window.assistant.show_status("История очищена", COLORS["accent"], False)
 
 
@@ -76,3 +94,156 @@ def open_history_file(window) -> None:
         window.assistant.show_status(
             "Не удалось открыть файл истории", COLORS["btn_warning"], False
         )
+
+
+# --- Поиск по истории ---
+
+HISTORY_SEARCH_PAGE = 50
+HISTORY_SEARCH_DEBOUNCE_MS = 250
+# Длина фрагмента записи в результатах: длинные диктовки показываются вокруг совпадения
+HISTORY_SNIPPET_CHARS = 200
+
+
+def schedule_history_search(window, _text=None) -> None:
+    if not hasattr(window, "_history_search_timer"):
+        window._history_search_timer = QTimer(window)
+        window._history_search_timer.setSingleShot(True)
+        window._history_search_timer.timeout.connect(window.run_history_search)
+    window._history_search_timer.start(HISTORY_SEARCH_DEBOUNCE_MS)
+
+
+def run_history_search(window) -> None:
+    """Начинает новый поиск: ответы прежних запросов отбрасываются по номеру поколения."""
+    if hasattr(window, "_history_search_timer"):
+        window._history_search_timer.stop()
+    query = window.history_search_edit.text().strip()
+    window._history_search_generation += 1
+    window._history_search_query = query
+    window._history_search_entries = {}
+    window._history_search_last_id = None
+    window._history_search_has_more = False
+    window._history_search_loading = False
+    window.history_search_results.clear()
+    window.history_search_more_btn.hide()
+    if not query:
+        window.history_search_results.hide()
+        window.history_search_status.setText("")
+        return
+    if not window.assistant.history_store.enabled:
+        window.history_search_results.hide()
+        window.history_search_status.setText("Поиск недоступен: индекс истории не открыт")
+        return
+    window.history_search_status.setText("Поиск...")
+    _request_history_page(window)
+
+
+def refresh_history_search(window) -> None:
+    """После новой записи в истории повторяет открытый поиск."""
+    if window._history_search_query:
+        schedule_history_search(window)
+
+
+def load_more_history_results(window) -> None:
+    if window._history_search_loading or not window._history_search_has_more:
+        return
+    _request_history_page(window)
+
+
+def on_history_results_scrolled(window, value: int) -> None:
+    # Следующая страница подгружается, когда список докручен до конца
+    scroll_bar = window.history_search_results.verticalScrollBar()
+    if scroll_bar.maximum() > 0 and value >= scroll_bar.maximum():
+        load_more_history_results(window)
+
+
+def _request_history_page(window) -> None:
+    store = window.assistant.history_store
+    signals = window.assistant.ui_signals
+    generation = window._history_search_generation
+    query = window._history_search_query
+    before_id = window._history_search_last_id
+    window._history_search_loading = True
+
+    def _task():
+        # Лишняя запись показывает, есть ли следующая страница
+        entries = store.search(query, HISTORY_SEARCH_PAGE + 1, before_id=before_id)
+        signals.history_search_finished.emit(generation, entries)
+
+    threading.Thread(target=_task, daemon=True).start()
+
+
+def on_history_search_finished(window, generation: int, entries) -> None:
+    if generation != window._history_search_generation:
+        return
+    window._history_search_loading = False
+    window._history_search_has_more = len(entries) > HISTORY_SEARCH_PAGE
+    entries = entries[:HISTORY_SEARCH_PAGE]
+
+    results = window.history_search_results
+    scroll_bar = results.verticalScrollBar()
+    first_page = window._history_search_last_id is None
+    position = scroll_bar.value()
+    pattern = _highlight_pattern(window._history_search_query)
+    for entry in entries:
+        window._history_search_entries[entry.id] = entry.text
+        results.append(_history_result_html(entry, pattern))
+    if entries:
+        window._history_search_last_id = entries[-1].id
+    # append() прокручивает вниз, если список был докручен до конца
+    scroll_bar.setValue(0 if first_page else position)
+
+    shown = len(window._history_search_entries)
+    results.setVisible(shown > 0)
+    window.history_search_more_btn.setVisible(window._history_search_has_more)
+    if shown == 0:
+        window.history_search_status.setText("Ничего не найдено")
+    else:
+        more = "+" if window._history_search_has_more else ""
+        window.history_search_status.setText(f"Найдено: {shown}{more}")
+
+
+def open_history_result(window, url: QUrl) -> None:
+    try:
+        entry_id = int(url.fragment())
+    except ValueError:
+        return
+    text = window._history_search_entries.get(entry_id)
+    if text:
+        _show_history_text(window, text)
+
+
+def _highlight_pattern(query: str):
+    terms = sorted(set(search_terms(query)), key=len, reverse=True)
+    if not terms:
+        return None
+    # Запрос приведён к "е", в записях может стоять "ё"
+    alternatives = [re.escape(term).replace("е", "[её]") for term in terms]
+    return re.compile("|".join(alternatives), flags=re.IGNORECASE)
+
+
+def _history_result_html(entry, pattern) -> str:
+    text = " ".join(entry.text.split())
+    if len(text) > HISTORY_SNIPPET_CHARS:
+        match = pattern.search(text) if pattern else None
+        start = max(0, match.start() - HISTORY_SNIPPET_CHARS // 3) if match else 0
+        end = start + HISTORY_SNIPPET_CHARS
+        text = (
+            ("..." if start > 0 else "")
+            + text[start:end]
+            + ("..." if end < len(text) else "")
+        )
+
+    parts = []
+    position = 0
+    for match in pattern.finditer(text) if pattern else ():
+        parts.append(html.escape(text[position : match.start()]))
+        parts.append(
+            f'<span style="background-color: {COLORS["btn_standard"]}; '
+            f'color: {COLORS["white"]};">{html.escape(match.group(0))}</span>'
+        )
+        position = match.end()
+    parts.append(html.escape(text[position:]))
+    return (
+        f'<p><a href="#{entry.id}" style="color: {COLORS["accent"]};">'
+        f"{html.escape(entry.ts)}</a> {''.join(parts)}</p>"
+    )
@@ -43,6 +43,7 @@ class UiSignals(QObject):
     request_hide_window = Signal()
     request_show_logs = Signal()
     request_refresh_everything = Signal()
+    history_search_finished = Signal(int, object)
 
 
 class ModernWindow(QMainWindow):
@@ -69,6 +70,12 @@ class ModernWindow(QMainWindow):
         self.settings_expanded = False
         self.log_viewer = None
         self.history_viewer = None
+        self._history_search_generation = 0
+        self._history_search_query = ""
+        self._history_search_entries = {}
+        self._history_search_last_id = None
+        self._history_search_has_more = False
+        self._history_search_loading = False
 
         self._create_widgets()
         self._create_layout()
@@ -440,6 +447,26 @@ class ModernWindow(QMainWindow):
                 self.assistant.search_handler.shutdown_assistant_instance()
         except Exception as e:
             log_message(f"Ошибка остановки Everything на выходе: {e}")
+        try:
+            local_index = getattr(self.assistant.search_handler, "local_index", None)
+            if local_index is not None:
+                local_index.close()
+        except Exception as e:
+            log_message(f"Ошибка остановки локального индекса на выходе: {e}")
+        try:
+            history_store = getattr(self.assistant, "history_store", None)
+            if history_store is not None:
+                history_store.close()
+        except Exception as e:
+            log_message(f"Ошибка закрытия индекса истории на выходе: {e}")
+        try:
+            self.assistant.command_router.alias_store.flush()
+        except Exception as e:
+            log_message(f"Ошибка сохранения алиасов на выходе: {e}")
+        try:
+            self.assistant.gemini_manager.shutdown()
+        except Exception as e:
+            log_message(f"Ошибка удаления кэшей Gemini на выходе: {e}")
         # Очищаем лог-файл перед выходом, чтобы не накапливался
         try:
             self.assistant.clear_log_file(silent=True)
@@ -509,6 +536,9 @@ class ModernWindow(QMainWindow):
     def clear_logs(self):
         return history_handlers.clear_logs(self)
 
+    def on_verbose_logs_changed(self, state):
+        return history_handlers.on_verbose_logs_changed(self, state)
+
     def show_selected_history(self):
         return history_handlers.show_selected_history(self)
 
@@ -518,6 +548,27 @@ class ModernWindow(QMainWindow):
     def open_history_file(self):
         return history_handlers.open_history_file(self)
 
+    def schedule_history_search(self, text=None):
+        return history_handlers.schedule_history_search(self, text)
+
+    def run_history_search(self):
+        return history_handlers.run_history_search(self)
+
+    def refresh_history_search(self):
+        return history_handlers.refresh_history_search(self)
+
+    def load_more_history_results(self):
+        return history_handlers.load_more_history_results(self)
+
+    def on_history_results_scrolled(self, value):
+        return history_handlers.on_history_results_scrolled(self, value)
+
+    def on_history_search_finished(self, generation, entries):
+        return history_handlers.on_history_search_finished(self, generation, entries)
+
+    def open_history_result(self, url):
+        return history_handlers.open_history_result(self, url)
+
     def refresh_microphone_list(self):
         return settings_handlers.refresh_microphone_list(self)
 
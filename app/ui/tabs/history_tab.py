@@ -6,8 +6,10 @@ from PySide6.QtWidgets import (
     QGroupBox,
     QHBoxLayout,
     QLabel,
+    QLineEdit,
     QPushButton,
     QSpinBox,
+    QTextBrowser,
     QVBoxLayout,
     QWidget,
 )
@@ -67,6 +69,27 @@ def create_history_tab(window) -> None:
     history_layout.addLayout(history_buttons_layout)
     layout.addWidget(history_group)
 
+    search_group = QGroupBox("Поиск по истории")
+    search_layout = QVBoxLayout(search_group)
+    window.history_search_edit = QLineEdit()
+    window.history_search_edit.setPlaceholderText("Слова из прошлых диктовок...")
+    window.history_search_edit.setClearButtonEnabled(True)
+    search_layout.addWidget(window.history_search_edit)
+    window.history_search_results = QTextBrowser()
+    window.history_search_results.setOpenLinks(False)
+    window.history_search_results.setMinimumHeight(200)
+    window.history_search_results.hide()
+    search_layout.addWidget(window.history_search_results)
+    search_status_layout = QHBoxLayout()
+    window.history_search_status = QLabel("")
+    window.history_search_more_btn = QPushButton("Показать ещё")
+    window.history_search_more_btn.hide()
+    search_status_layout.addWidget(window.history_search_status)
+    search_status_layout.addStretch()
+    search_status_layout.addWidget(window.history_search_more_btn)
+    search_layout.addLayout(search_status_layout)
+    layout.addWidget(search_group)
+
     window.update_history_combo()
 
     layout.addStretch()
@@ -2,6 +2,7 @@
 """Вкладка логов."""
 
 from PySide6.QtWidgets import (
+    QCheckBox,
     QGroupBox,
     QHBoxLayout,
     QLabel,
@@ -44,12 +45,19 @@ def create_logs_tab(window) -> None:
     layout.addWidget(size_group)
 
     logs_group = QGroupBox("Управление логами")
-    logs_layout = QHBoxLayout(logs_group)
+    logs_group_layout = QVBoxLayout(logs_group)
+    window.verbose_logs_check = QCheckBox("Подробные логи (DEBUG)")
+    window.verbose_logs_check.setChecked(
+        window.assistant.settings.get("log_level") == "debug"
+    )
+    logs_group_layout.addWidget(window.verbose_logs_check)
+    logs_layout = QHBoxLayout()
     window.view_logs_btn = QPushButton("Открыть логи")
     window.clear_logs_btn = QPushButton("Очистить логи")
     window.clear_logs_btn.setObjectName("warningButton")
     logs_layout.addWidget(window.view_logs_btn)
     logs_layout.addWidget(window.clear_logs_btn)
+    logs_group_layout.addLayout(logs_layout)
     layout.addWidget(logs_group)
 
     layout.addStretch()
@@ -3,6 +3,7 @@ import ctypes
 import os
 import subprocess
 import threading
+from collections import deque
 from ctypes import wintypes
 from typing import Optional
 
@@ -10,10 +11,12 @@ import pyperclip
 from PySide6.QtCore import Qt, QTimer
 from PySide6.QtWidgets import (
     QCheckBox,
+    QComboBox,
     QDialog,
     QHBoxLayout,
     QLabel,
     QLineEdit,
+    QPlainTextEdit,
     QPushButton,
     QStackedWidget,
     QStyledItemDelegate,
@@ -22,6 +25,8 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
+from app.utils.log_tail import LogTailReader
+
 
 class NoElidingDelegate(QStyledItemDelegate):
     """
@@ -48,17 +53,57 @@ class NoElidingDelegate(QStyledItemDelegate):
 
 
 class LogViewerWindow(QDialog):
-    def __init__(self, log_file: str, parent=None):
+    """
+    Просмотр логов в режиме tail -f: при открытии показывается хвост файла,
+    затем по таймеру дописываются только новые записи. Фильтр по уровню и
+    подстроке (например, id запроса) применяется к уже прочитанным записям.
+    """
+
+    POLL_INTERVAL_MS = 500
+    FILTER_DEBOUNCE_MS = 250
+    # Сколько записей держать в памяти для перефильтрации
+    MAX_RECORDS = 5000
+    # Сколько последних подходящих записей выводить при смене фильтра
+    MAX_RENDERED_RECORDS = 1000
+    LEVEL_FILTERS = (
+        ("Все уровни", ""),
+        ("DEBUG и выше", "DEBUG"),
+        ("INFO и выше", "INFO"),
+        ("WARNING и выше", "WARNING"),
+        ("Только ошибки", "ERROR"),
+    )
+    _LEVEL_ORDER = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+    def __init__(self, log_file: str, parent=None, clear_log_func=None):
         super().__init__(parent)
         self._log_file = log_file
+        # Очистка идёт через assistant.clear_log_file(): он останавливает
+        # QueueListener и пересоздаёт логгер
+        self._clear_log_func = clear_log_func
+        self._reader = LogTailReader(log_file)
+        self._records = deque(maxlen=self.MAX_RECORDS)
         self.setWindowTitle("Просмотр логов")
         self.setWindowFlags(Qt.WindowType.Window)
 
         layout = QVBoxLayout(self)
 
-        self.text_edit = QTextEdit()
+        filter_layout = QHBoxLayout()
+        self.level_combo = QComboBox()
+        for label, level in self.LEVEL_FILTERS:
+            self.level_combo.addItem(label, level)
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Фильтр: текст или id запроса")
+        self.follow_check = QCheckBox("Следить")
+        self.follow_check.setChecked(True)
+        filter_layout.addWidget(self.level_combo)
+        filter_layout.addWidget(self.filter_edit, 1)
+        filter_layout.addWidget(self.follow_check)
+        layout.addLayout(filter_layout)
+
+        self.text_edit = QPlainTextEdit()
         self.text_edit.setReadOnly(True)
-        self.text_edit.setLineWrapMode(QTextEdit.LineWrapMode.WidgetWidth)
+        self.text_edit.setLineWrapMode(QPlainTextEdit.LineWrapMode.WidgetWidth)
+        self.text_edit.setMaximumBlockCount(self.MAX_RENDERED_RECORDS * 4)
 
         layout.addWidget(self.text_edit)
 
@@ -71,6 +116,7 @@ class LogViewerWindow(QDialog):
         refresh_btn.clicked.connect(self.load_logs)
         copy_btn.clicked.connect(self.copy_logs)
         clear_btn.clicked.connect(self.clear_logs)
+        clear_btn.setEnabled(clear_log_func is not None)
         close_btn.clicked.connect(self.close)
 
         button_layout.addWidget(refresh_btn)
@@ -79,28 +125,108 @@ class LogViewerWindow(QDialog):
         button_layout.addWidget(close_btn)
         layout.addLayout(button_layout)
 
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(self.POLL_INTERVAL_MS)
+        self._poll_timer.timeout.connect(self.poll_logs)
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.timeout.connect(self._render_all)
+        self.level_combo.currentIndexChanged.connect(self._schedule_render)
+        self.filter_edit.textChanged.connect(self._schedule_render)
+
         self.load_logs()
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._poll_timer.start()
+
+    def hideEvent(self, event):
+        self._poll_timer.stop()
+        super().hideEvent(event)
+
     def load_logs(self):
+        """Перечитывает хвост файла (при открытии окна и после очистки)."""
         try:
-            if os.path.exists(self._log_file):
-                with open(self._log_file, "r", encoding="utf-8") as f:
-                    self.text_edit.setPlainText(f.read())
-                    cursor = self.text_edit.textCursor()
-                    cursor.movePosition(cursor.MoveOperation.End)
-                    self.text_edit.setTextCursor(cursor)
+            self._records.clear()
+            self._records.extend(self._reader.read_tail())
+            self._render_all()
         except Exception as e:
             self.text_edit.setPlainText(f"Ошибка загрузки логов: {e}")
 
+    def poll_logs(self):
+        """Дочитывает новые байты по сохранённому смещению."""
+        if not self.follow_check.isChecked():
+            return
+        try:
+            records, reset = self._reader.read_new()
+        except Exception as e:
+            self.text_edit.appendPlainText(f"Ошибка чтения логов: {e}")
+            return
+        if reset:
+            self._records.clear()
+            self.text_edit.clear()
+        if not records:
+            return
+        self._records.extend(records)
+        self._append(records)
+
+    def _matches(self, record, min_level, needle):
+        if min_level:
+            level = self._LEVEL_ORDER.get(record.level)
+            if level is None or level < self._LEVEL_ORDER[min_level]:
+                return False
+        return not needle or needle in record.text.lower()
+
+    def _filter_params(self):
+        return (
+            self.level_combo.currentData() or "",
+            self.filter_edit.text().strip().lower(),
+        )
+
+    def _schedule_render(self, *_args):
+        self._filter_timer.start(self.FILTER_DEBOUNCE_MS)
+
+    def _render_all(self, *_args):
+        self._filter_timer.stop()
+        min_level, needle = self._filter_params()
+        visible = []
+        for record in reversed(self._records):
+            if self._matches(record, min_level, needle):
+                visible.append(record.text)
+                if len(visible) >= self.MAX_RENDERED_RECORDS:
+                    break
+        visible.reverse()
+        self.text_edit.setPlainText("\n".join(visible))
+        self._scroll_to_end()
+
+    def _append(self, records):
+        min_level, needle = self._filter_params()
+        visible = [r.text for r in records if self._matches(r, min_level, needle)]
+        if not visible:
+            return
+        scrollbar = self.text_edit.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+        self.text_edit.appendPlainText("\n".join(visible))
+        if at_bottom:
+            self._scroll_to_end()
+
+    def _scroll_to_end(self):
+        cursor = self.text_edit.textCursor()
+        cursor.movePosition(cursor.MoveOperation.End)
+        self.text_edit.setTextCursor(cursor)
+
     def copy_logs(self):
         pyperclip.copy(self.text_edit.toPlainText())
 
     def clear_logs(self):
-        """Очищает окно и файл логов."""
+        """Очищает окно и файл логов; новые записи дочитываются с начала файла."""
+        if self._clear_log_func is None:
+            return
         try:
+            self._clear_log_func()
             self.text_edit.clear()
-            with open(self._log_file, "w", encoding="utf-8") as f:
-                f.write("")
+            self._records.clear()
+            self._reader.reset()
         except Exception as e:
             self.text_edit.setPlainText(f"Ошибка очистки логов: {e}")
 
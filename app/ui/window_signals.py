@@ -11,12 +11,16 @@ def connect_window_signals(window) -> None:
         window.on_recording_state_changed
     )
     window.assistant.ui_signals.history_updated.connect(window.update_history_combo)
+    window.assistant.ui_signals.history_updated.connect(window.refresh_history_search)
     window.assistant.ui_signals.request_show_window.connect(window.show_window)
     window.assistant.ui_signals.request_hide_window.connect(window.hide)
     window.assistant.ui_signals.request_show_logs.connect(window.open_log_viewer)
     window.assistant.ui_signals.request_refresh_everything.connect(
         window.on_request_refresh_everything
     )
+    window.assistant.ui_signals.history_search_finished.connect(
+        window.on_history_search_finished
+    )
     if hasattr(window, "tabs"):
         window.tabs.currentChanged.connect(window._schedule_expanded_autofit)
 
@@ -91,11 +95,19 @@ def connect_window_signals(window) -> None:
         lambda v: window.on_size_setting_changed("log_font_size", v)
     )
 
+    window.verbose_logs_check.stateChanged.connect(window.on_verbose_logs_changed)
     window.view_logs_btn.clicked.connect(window.open_log_viewer)
     window.clear_logs_btn.clicked.connect(window.clear_logs)
     window.view_history_btn.clicked.connect(window.show_selected_history)
     window.open_history_file_btn.clicked.connect(window.open_history_file)
     window.clear_history_btn.clicked.connect(window.clear_history)
+    window.history_search_edit.textChanged.connect(window.schedule_history_search)
+    window.history_search_edit.returnPressed.connect(window.run_history_search)
+    window.history_search_more_btn.clicked.connect(window.load_more_history_results)
+    window.history_search_results.verticalScrollBar().valueChanged.connect(
+        window.on_history_results_scrolled
+    )
+    window.history_search_results.anchorClicked.connect(window.open_history_result)
     window.gemini_prompt_edit.textChanged.connect(
         window.on_gemini_prompt_text_changed_profile
     )
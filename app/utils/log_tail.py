@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Чтение хвоста файла логов по смещению: окно просмотра дочитывает только
+новые байты и замечает ротацию RotatingFileHandler или очистку файла.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# Сколько последних килобайт показывать при открытии окна
+LOG_TAIL_KB = 256
+# Начало записи: "2025-01-01 12:00:00 [INFO] ..."
+_RECORD_START_RE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} \[(\w+)\]")
+
+
+@dataclass
+class LogRecordText:
+    level: str
+    text: str
+
+    def append_line(self, line: str) -> None:
+        self.text = f"{self.text}\n{line}"
+
+
+def record_level(line: str) -> Optional[str]:
+    match = _RECORD_START_RE.match(line)
+    return match.group(1).upper() if match else None
+
+
+class LogTailReader:
+    """
+    Хранит смещение прочитанного и идентификатор файла. read_new() возвращает
+    (записи, reset): reset=True означает, что файл очищен и показанное ранее
+    нужно начать заново. При ротации сначала дочитывается <файл>.1, поэтому
+    записи не теряются и reset не нужен.
+    Незавершённая последняя строка и незакрытая запись (трассировка)
+    придерживаются до следующего чтения.
+    """
+
+    def __init__(self, path: str, tail_bytes: int = LOG_TAIL_KB * 1024) -> None:
+        self.path = path
+        self.tail_bytes = tail_bytes
+        self._offset = 0
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._partial = b""
+        self._open_record: Optional[LogRecordText] = None
+
+    def reset(self) -> None:
+        """Забывает прочитанное: следующий read_new() начнёт файл с начала."""
+        self._offset = 0
+        self._file_id = None
+        self._partial = b""
+        self._open_record = None
+
+    def read_tail(self) -> List[LogRecordText]:
+        """Начинает чтение заново с последних tail_bytes байт файла."""
+        self.reset()
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return []
+        self._file_id = _file_id(st)
+        start = max(0, st.st_size - self.tail_bytes)
+        records = self._read_from(self.path, start, skip_first_line=start > 0)
+        return records + self._flush_open_record()
+
+    def read_new(self) -> Tuple[List[LogRecordText], bool]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return [], False
+        file_id = _file_id(st)
+        if self._file_id is not None and file_id != self._file_id:
+            # Ротация: дочитываем переименованный файл и продолжаем с нового
+            records = self._read_rotated_rest()
+            if records is not None:
+                self._file_id = file_id
+                self._offset = 0
+                records += self._read_from(self.path, 0, skip_first_line=False)
+                return records + self._flush_open_record(), False
+        if self._file_id is None or file_id != self._file_id or st.st_size < self._offset:
+            # Очистка или неизвестная замена файла: начинаем с начала
+            self._file_id = file_id
+            self._offset = 0
+            self._partial = b""
+            self._open_record = None
+            records = self._read_from(self.path, 0, skip_first_line=False)
+            return records + self._flush_open_record(), True
+        if st.st_size == self._offset:
+            return self._flush_open_record(), False
+        records = self._read_from(self.path, self._offset, skip_first_line=False)
+        return records + self._flush_open_record(), False
+
+    def _read_rotated_rest(self) -> Optional[List[LogRecordText]]:
+        rotated = f"{self.path}.1"
+        try:
+            if _file_id(os.stat(rotated)) != self._file_id:
+                return None
+        except OSError:
+            return None
+        return self._read_from(rotated, self._offset, skip_first_line=False)
+
+    def _read_from(
+        self, path: str, start: int, skip_first_line: bool
+    ) -> List[LogRecordText]:
+        try:
+            with open(path, "rb") as f:
+                f.seek(start)
+                data = f.read()
+        except OSError:
+            return []
+        self._offset = start + len(data)
+        data = self._partial + data
+        lines = data.split(b"\n")
+        self._partial = lines.pop()
+        if skip_first_line and lines:
+            # Начали читать с середины строки - она неполная
+            lines.pop(0)
+        records: List[LogRecordText] = []
+        for raw in lines:
+            line = raw.decode("utf-8", errors="replace").rstrip("\r")
+            level = record_level(line)
+            if level is not None:
+                if self._open_record is not None:
+                    records.append(self._open_record)
+                self._open_record = LogRecordText(level, line)
+            elif self._open_record is not None:
+                self._open_record.append_line(line)
+            else:
+                self._open_record = LogRecordText("", line)
+        return records
+
+    def _flush_open_record(self) -> List[LogRecordText]:
+        # Запись считается законченной, когда файл больше не растёт:
+        # продолжение трассировки пишется тем же вызовом обработчика
+        if self._partial or self._open_record is None:
+            return []
+        record = self._open_record
+        self._open_record = None
+        return [record]
+
+
+def _file_id(st) -> Tuple[int, int]:
+    return (st.st_dev, st.st_ino)
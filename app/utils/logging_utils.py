@@ -1,32 +1,144 @@
 # -*- coding: utf-8 -*-
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import traceback
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from app.core.app_config import HISTORY_FILE, LOG_FILE
 
+LOG_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+}
+DEFAULT_LOG_LEVEL = "info"
+
+# Ограничение очереди: при зависшем диске лишние записи отбрасываются,
+# а не копятся в памяти и не блокируют потоки записи звука и горячих клавиш
+LOG_QUEUE_MAXSIZE = 10000
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который никогда не ждёт: при переполнении считает потери."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self._drop_lock = threading.Lock()
+        self.dropped_total = 0
+        self._dropped_pending = 0
+
+    def enqueue(self, record):
+        with self._drop_lock:
+            pending = self._dropped_pending
+            self._dropped_pending = 0
+        if pending:
+            notice = logging.makeLogRecord(
+                {
+                    "name": record.name,
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": f"Очередь логов переполнена, пропущено записей: {pending}",
+                }
+            )
+            if not self._try_put(notice):
+                # Уведомление не поместилось: сообщим о потерях в следующий раз
+                with self._drop_lock:
+                    self._dropped_pending += pending
+        if not self._try_put(record):
+            with self._drop_lock:
+                self.dropped_total += 1
+                self._dropped_pending += 1
+
+    def _try_put(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+
+class _BoundedQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Сигнал остановки должен попасть даже в заполненную очередь
+        self.queue.put(self._sentinel, timeout=5.0)
+
+
+_file_handler = None
+_queue_handler = None
+_listener = None
+_listener_lock = threading.Lock()
+
 
 def setup_logging():
-    """Настройка логирования с автоматической ротацией"""
+    """
+    Настройка логирования с автоматической ротацией. Вызывающие потоки только
+    кладут запись в очередь; в файл пишет отдельный поток QueueListener.
+    """
+    global _file_handler, _queue_handler, _listener
     logger = logging.getLogger(__name__)
-    logger.setLevel(logging.DEBUG)
+    if logger.level == logging.NOTSET:
+        logger.setLevel(LOG_LEVELS[DEFAULT_LOG_LEVEL])
+
+    with _listener_lock:
+        _stop_listener_locked(logger)
+
+        # ИСПРАВЛЕНО: Явно указываем UTF-8 и errors='replace'
+        handler = RotatingFileHandler(
+            LOG_FILE,
+            maxBytes=200 * 1024,
+            backupCount=1,
+            encoding="utf-8",
+            errors="replace",  # Добавлено: заменяет некорректные символы
+        )
+
+        # ИСПРАВЛЕНО: Форматтер с явной поддержкой Unicode
+        formatter = logging.Formatter(
+            "%(asctime)s [%(levelname)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+        )
+        handler.setFormatter(formatter)
+
+        queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_MAXSIZE))
+        listener = _BoundedQueueListener(
+            queue_handler.queue, handler, respect_handler_level=True
+        )
+        listener.start()
+        logger.addHandler(queue_handler)
+
+        _file_handler = handler
+        _queue_handler = queue_handler
+        _listener = listener
 
-    # ИСПРАВЛЕНО: Явно указываем UTF-8 и errors='replace'
-    handler = RotatingFileHandler(
-        LOG_FILE,
-        maxBytes=200 * 1024,
-        backupCount=1,
-        encoding="utf-8",
-        errors="replace",  # Добавлено: заменяет некорректные символы
-    )
+    return logger
 
-    # ИСПРАВЛЕНО: Форматтер с явной поддержкой Unicode
-    formatter = logging.Formatter(
-        "%(asctime)s [%(levelname)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
-    )
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
 
-    return logger
+def stop_logging():
+    """Дописывает очередь в файл и закрывает его (перед очисткой или выходом)."""
+    with _listener_lock:
+        _stop_listener_locked(logging.getLogger(__name__))
+
+
+def _stop_listener_locked(logger):
+    global _file_handler, _queue_handler, _listener
+    if _queue_handler is not None:
+        logger.removeHandler(_queue_handler)
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except Exception:
+            pass
+    if _file_handler is not None:
+        _file_handler.close()
+    _file_handler = None
+    _queue_handler = None
+    _listener = None
+
+
+def get_dropped_log_count():
+    """Сколько записей отброшено из-за переполнения очереди с момента запуска логгера."""
+    handler = _queue_handler
+    return handler.dropped_total if handler is not None else 0
 
 
 def setup_history_logging():
@@ -45,8 +157,10 @@ def setup_history_logging():
     return history_logger
 
 
+_debug_enabled = False
 logger = setup_logging()
 history_logger = setup_history_logging()
+atexit.register(stop_logging)
 
 
 def log_message(msg):
@@ -57,6 +171,52 @@ def log_message(msg):
         pass
 
 
+def log_debug(msg, *args):
+    """
+    Отладочная запись. msg может быть функцией без аргументов: тяжёлое
+    форматирование (превью промптов, трассировки) выполняется только
+    при включённом уровне debug.
+    """
+    if not _debug_enabled:
+        return
+    try:
+        if callable(msg):
+            msg = msg()
+        logger.debug(msg, *args)
+    except Exception:
+        pass
+
+
+def log_warning(msg):
+    try:
+        logger.warning(msg)
+    except Exception:
+        pass
+
+
+def log_traceback():
+    """Трассировка текущего исключения на уровне ERROR: видна при любом уровне лога."""
+    try:
+        logger.error(traceback.format_exc())
+    except Exception:
+        pass
+
+
+def is_debug_enabled():
+    return _debug_enabled
+
+
+def set_log_level(level):
+    """Уровень логирования: debug | info | warning. Неизвестное значение - info."""
+    global _debug_enabled
+    name = str(level or "").strip().lower()
+    if name not in LOG_LEVELS:
+        name = DEFAULT_LOG_LEVEL
+    logging.getLogger(__name__).setLevel(LOG_LEVELS[name])
+    _debug_enabled = name == "debug"
+    return name
+
+
 def log_separator():
     """Добавляет разделитель в лог-файл"""
     try: